@@ -1,4 +1,7 @@
+__version__ = '0.0.1'
+
 from optconvert.const import Messages, Numbers, Solvers
+from optconvert.profiling import Profile
 from optconvert.model import Model
 from optconvert.mpl_with_ext_data import MplWithExtData
 from optconvert.converter import Converter
@@ -0,0 +1,168 @@
+import asyncio
+import os
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from optconvert.model import Model, _ENGINE_LOCK
+from optconvert.converter import _convert
+from optconvert.compression import split_name
+
+
+class AsyncConverter:
+    """
+    Runs the conversions for asyncio services in bounded worker pools, so the event loop is not blocked.
+
+    convert() runs Converter in a pool of worker processes, every process loads its own MPL engine.
+    load() and export() work with Model objects of this process, they run in a pool of threads
+    one by one under the engine lock (the engine of the process is not thread-safe), so the event loop is not blocked,
+    but only convert() runs in parallel.
+
+    At most max_concurrency calls run or wait in the pools, the others wait for a free slot in the event loop
+    (backpressure). A call that is cancelled or times out while waiting for a slot or in the queue of the pool
+    is dropped. A call that is already running cannot be interrupted: it keeps its slot until it finishes,
+    so the cores are never oversubscribed.
+
+    Attributes
+    ----------
+    max_workers : int
+        number of worker processes and of worker threads, the number of CPUs by default
+    max_concurrency : int
+        number of calls that run or wait in the pools at the same time, max_workers by default
+
+    Methods
+    -------
+    convert(file, out_format, name=None, timeout=None)
+        converts the file like Converter(file, out_format, name).run()
+    load(file, model_class=Model, timeout=None)
+        returns model_class(file)
+    export(model, file=None, timeout=None)
+        returns model.export(file)
+    close()
+        shuts down the pools, also called on exit from the async with block
+
+    Examples
+    -------
+    from optconvert.aio import AsyncConverter
+
+    async with AsyncConverter(max_workers=4, max_concurrency=16) as converter:
+        await converter.convert('Dakota_det.mpl', 'mps', timeout=60)
+        model = await converter.load(Path('Dakota_det.lp'))
+        await converter.export(model, Path('Dakota_det.gms'))
+    """
+
+    def __init__(self, max_workers: int = None, max_concurrency: int = None):
+        if max_workers is None:
+            max_workers = os.cpu_count() or 1
+        if max_concurrency is None:
+            max_concurrency = max_workers
+        if max_workers < 1 or max_concurrency < 1:
+            raise ValueError('max_workers and max_concurrency should be positive.')
+        self.max_workers = max_workers
+        self.max_concurrency = max_concurrency
+        self._processes = None # created on the first convert()
+        self._threads = None # created on the first load() or export()
+        self._semaphore = None # created in the event loop of the first call
+        self._loop = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    async def convert(self, file, out_format: str, name: str = None, timeout: float = None):
+        """Converts the file in a worker process. Raises the exception of the conversion, asyncio.TimeoutError
+        if the conversion takes longer than timeout seconds (including the wait for a free slot)."""
+
+        if name is None:
+            name = split_name(file)[0]
+        if self._processes is None:
+            self._processes = ProcessPoolExecutor(max_workers=self.max_workers)
+        result = await self._run(self._processes, timeout, _convert, str(file), out_format, name)
+        if isinstance(result, Exception): # _convert() returns the exception of the worker
+            raise result
+        return result
+
+    async def load(self, file: Path, model_class=Model, timeout: float = None):
+        """Returns model_class(file) read in a worker thread, e.g., Model or MplWithExtData."""
+        return await self._run(self._thread_pool(), timeout, _with_engine_lock, model_class, file)
+
+    async def export(self, model: Model, file: Path = None, timeout: float = None):
+        """Returns model.export(file) run in a worker thread."""
+        return await self._run(self._thread_pool(), timeout, _with_engine_lock, model.export, file)
+
+    def close(self):
+        for executor in (self._processes, self._threads):
+            if executor is not None:
+                executor.shutdown(wait=False)
+        self._processes = None
+        self._threads = None
+
+    def _thread_pool(self):
+        if self._threads is None:
+            self._threads = ThreadPoolExecutor(max_workers=self.max_workers)
+        return self._threads
+
+    def _get_semaphore(self, loop):
+        # asyncio.Semaphore is bound to the event loop (Python < 3.10)
+        if self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._loop = loop
+        return self._semaphore
+
+    async def _run(self, executor, timeout, function, *args):
+        loop = _get_running_loop()
+        semaphore = self._get_semaphore(loop)
+
+        async def run():
+            await semaphore.acquire()
+            try:
+                future = executor.submit(function, *args)
+            except BaseException:
+                semaphore.release()
+                raise
+            # the slot is freed when the work is done (or dropped from the queue), not when the caller stops waiting
+            future.add_done_callback(lambda _: loop.is_closed() or loop.call_soon_threadsafe(semaphore.release))
+            return await asyncio.wrap_future(future) # cancellation cancels the future if it is not running yet
+
+        return await asyncio.wait_for(run(), timeout)
+
+
+def _with_engine_lock(function, *args):
+    with _ENGINE_LOCK:
+        return function(*args)
+
+
+# asyncio.get_running_loop() is new in Python 3.7, in a coroutine of Python 3.6 get_event_loop() returns the running loop
+_get_running_loop = getattr(asyncio, 'get_running_loop', asyncio.get_event_loop)
+
+
+_converter = None # used by the module functions, created on the first call
+
+
+def configure(max_workers: int = None, max_concurrency: int = None):
+    """Sets the pool size and the concurrency limit of convert(), load() and export()."""
+    global _converter
+    if _converter is not None:
+        _converter.close()
+    _converter = AsyncConverter(max_workers, max_concurrency)
+
+
+def _default_converter() -> AsyncConverter:
+    if _converter is None:
+        configure()
+    return _converter
+
+
+async def convert(file, out_format: str, name: str = None, timeout: float = None):
+    """See AsyncConverter.convert()"""
+    return await _default_converter().convert(file, out_format, name, timeout)
+
+
+async def load(file: Path, model_class=Model, timeout: float = None):
+    """See AsyncConverter.load()"""
+    return await _default_converter().load(file, model_class, timeout)
+
+
+async def export(model: Model, file: Path = None, timeout: float = None):
+    """See AsyncConverter.export()"""
+    return await _default_converter().export(model, file, timeout)
@@ -0,0 +1,187 @@
+from pathlib import Path
+from collections import Counter
+import json
+import os
+import time
+from optconvert.model import Model
+from optconvert.converter import Converter
+from optconvert.cache import ConversionCache, referenced_files
+from optconvert.compression import COMPRESSIONS, split_name
+
+
+def find_files(input_dir: Path, pattern: str = None, recursive: bool = False) -> list:
+    """Returns the sorted files in input_dir matching the glob pattern,
+    the files of the supported input formats (also compressed, e.g., .mps.gz) by default."""
+
+    if not input_dir.is_dir():
+        raise FileNotFoundError(f'{input_dir} is not a directory.')
+    if pattern is not None:
+        patterns = [pattern]
+    else:
+        patterns = [f'*.{ext}{suffix}' for ext in Model.supported_in_formats for suffix in [''] + [f'.{c}' for c in COMPRESSIONS]]
+    files = set()
+    for pattern in patterns:
+        files.update(file for file in (input_dir.rglob(pattern) if recursive else input_dir.glob(pattern)) if file.is_file())
+    return sorted(files)
+
+
+class Manifest:
+    """
+    JSON lines file with a record per conversion of the batch, appended as soon as the conversion is finished.
+
+    A record is {'file': input file relative to the input folder, 'input_hash': ConversionCache.key() of the input,
+    'stamp': [size, mtime_ns] of the input and its .dat files, 'out_format': ..., 'outputs': output files relative
+    to the output folder, 'status': 'converted' or 'failed', 'seconds': ..., 'error': message or None}.
+    The last record of a file wins, so an interrupted run can be resumed.
+
+    Attributes
+    ----------
+    file : Path
+        manifest file
+    records : dict
+        {file: the last record of the file}
+
+    Methods
+    -------
+    is_converted(file, input_dir, output_dir, out_format)
+        True if the last conversion of the unchanged file succeeded and its outputs exist
+    append(record)
+        writes the record to the manifest
+    """
+
+    STR_CONVERTED = 'converted'
+    STR_FAILED = 'failed'
+    STR_SKIPPED = 'skipped' # returned by convert_directory(), not written to the manifest
+
+    def __init__(self, file: Path):
+        self.file = file
+        self.records = {}
+        if file.is_file():
+            with open(file) as manifest_file:
+                for line in manifest_file:
+                    try:
+                        record = json.loads(line)
+                    except ValueError: # the last line of the interrupted run may be incomplete
+                        continue
+                    self.records[record['file']] = record
+
+    def is_converted(self, file: str, input_dir: Path, output_dir: Path, out_format: str) -> bool:
+        record = self.records.get(file)
+        if record is None or record['status'] != Manifest.STR_CONVERTED or record['out_format'] != out_format:
+            return False
+        if not all((output_dir / output).is_file() for output in record['outputs']):
+            return False
+        if record['stamp'] == _stamp(input_dir / file): # the input is not changed, there is no need to read it
+            return True
+        return record['input_hash'] == ConversionCache.key(input_dir / file, out_format)
+
+    def append(self, record: dict):
+        self.file.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.file, 'a') as manifest_file:
+            manifest_file.write(json.dumps(record) + '\n')
+        self.records[record['file']] = record
+
+
+def _stamp(file: Path) -> list:
+    # size and modification time of the input and its .dat files
+    return [[input_file.stat().st_size, input_file.stat().st_mtime_ns]
+            for input_file in [file] + referenced_files(file) if input_file.is_file()]
+
+
+def _output_names(files: list, input_dir: Path, output_dir: Path) -> dict:
+    # output_dir / relative folder / stem, files with the same stem in a folder get the input format appended
+    stem_counts = Counter((file.parent, split_name(file)[0]) for file in files)
+    names = {}
+    for file in files:
+        stem, format, compression = split_name(file)
+        if stem_counts[(file.parent, stem)] > 1:
+            stem = '_'.join(filter(None, [stem, format, compression]))
+        names[file] = output_dir / file.parent.relative_to(input_dir) / stem
+    return names
+
+
+def _convert_file(file: Path, out_format: str, name: Path) -> dict:
+    # runs in a worker process if jobs are given, returns the part of the manifest record of the conversion
+    start = time.perf_counter()
+    try:
+        name.parent.mkdir(parents=True, exist_ok=True)
+        converter = Converter(str(file), out_format, str(name))
+        converter.run()
+        return {'status': Manifest.STR_CONVERTED, 'outputs': [str(output) for output in converter.exported_files],
+                'seconds': time.perf_counter() - start, 'error': None}
+    except Exception as e:
+        return {'status': Manifest.STR_FAILED, 'outputs': [], 'seconds': time.perf_counter() - start, 'error': str(e)}
+
+
+def convert_directory(input_dir: Path, out_format: str, output_dir: Path = None, pattern: str = None,
+                      recursive: bool = False, manifest: Path = None, resume: bool = False, jobs: int = None):
+    """Converts the files of the folder without interaction and records every conversion in the manifest.
+
+    Parameters
+    ----------
+    input_dir : Path
+        folder with the files to convert
+    out_format : str
+        output format
+    output_dir : Path
+        folder for the converted files, the subfolders of input_dir are recreated. input_dir / 'converted' by default.
+        The files in output_dir and the outputs recorded in the manifest are not converted
+    pattern : str
+        glob pattern of the files, e.g., 'siplib_*.mps'. The files of the supported input formats by default
+    recursive : bool
+        search the subfolders of input_dir
+    manifest : Path
+        manifest file, output_dir / optconvert_manifest.jsonl by default
+    resume : bool
+        skip the files converted by the previous runs with the same manifest if they and their outputs are unchanged
+    jobs : int
+        number of worker processes, convert one by one in this process by default
+
+    Returns
+    -------
+    generator of the manifest records in the order of completion. Skipped files have status 'skipped' and are not
+    written to the manifest
+    """
+
+    input_dir = input_dir.absolute()
+    output_dir = input_dir / 'converted' if output_dir is None else output_dir.absolute()
+    manifest = Manifest(output_dir / 'optconvert_manifest.jsonl' if manifest is None else manifest)
+    # the outputs of the previous runs are not inputs, even if output_dir is input_dir
+    outputs = {Path(os.path.normpath(output_dir / output)) for file_record in manifest.records.values()
+               for output in file_record['outputs']}
+    files = [file for file in find_files(input_dir, pattern, recursive)
+             if file not in outputs and (output_dir == input_dir or output_dir not in file.parents)]
+    names = _output_names(files, input_dir, output_dir)
+
+    pending = []
+    for file in files:
+        relative_file = file.relative_to(input_dir).as_posix()
+        if resume and manifest.is_converted(relative_file, input_dir, output_dir, out_format):
+            yield dict(manifest.records[relative_file], status=Manifest.STR_SKIPPED)
+        else:
+            pending.append(file)
+
+    def input_state(file):
+        # taken before the conversion, a file changed during the conversion does not match the manifest and is converted again
+        return {'input_hash': ConversionCache.key(file, out_format), 'stamp': _stamp(file)}
+
+    def record(file, state, result):
+        relative_file = file.relative_to(input_dir).as_posix()
+        result['outputs'] = [Path(os.path.relpath(output, output_dir)).as_posix() for output in result['outputs']]
+        file_record = {'file': relative_file, **state, 'out_format': out_format, **result}
+        manifest.append(file_record)
+        return file_record
+
+    if jobs is None:
+        for file in pending:
+            state = input_state(file)
+            yield record(file, state, _convert_file(file, out_format, names[file]))
+    else:
+        from concurrent.futures import ProcessPoolExecutor, as_completed # imported here to keep the import of optconvert fast
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = {}
+            for file in pending:
+                state = input_state(file)
+                futures[executor.submit(_convert_file, file, out_format, names[file])] = (file, state)
+            for future in as_completed(futures):
+                yield record(*futures[future], future.result())
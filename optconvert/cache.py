@@ -0,0 +1,169 @@
+from pathlib import Path
+import errno
+import hashlib
+import os
+import re
+import shutil
+import uuid
+import optconvert
+from optconvert.model import _engine_options
+from optconvert.compression import split_name, open_file
+
+
+def referenced_files(file: Path) -> list:
+    """Returns the files that .mpl reads the data from: DATAFILE("..."), SPARSEFILE("..."), INDEXFILE("...") etc.
+    relative to the .mpl file. Empty list for the other formats."""
+
+    if split_name(file)[1] != 'mpl' or not file.is_file():
+        return []
+    with open_file(file, 'rt') as mpl_file: # .mpl may be compressed
+        names = re.findall(r'\w*FILE\s*\(\s*"([^"]+)"', mpl_file.read(), flags=re.IGNORECASE)
+    return [file.parent / name for name in sorted(set(names))]
+
+
+class ConversionCache:
+    """
+    On-disk cache of conversion results keyed by the contents of the input.
+
+    Every entry is a folder named by the key with the output files of one conversion.
+    The key is a hash of the contents of the input file and of the .dat files referenced in .mpl, the input and
+    output formats, the MPL engine options and the optconvert version. The file names are not hashed, so the same
+    model under another name is a hit (the restored files get the requested name).
+    Entries are written to a temporary folder and renamed, so several processes may share the cache.
+    When the total size exceeds max_size, the least recently used entries are removed.
+
+    Attributes
+    ----------
+    folder : Path
+        cache folder
+    max_size : int
+        size limit in bytes
+    hits : int
+        number of get() calls that returned the cached files
+    misses : int
+        number of get() calls that did not find the entry
+
+    Methods
+    -------
+    key(file, out_format)
+        returns the cache key of the conversion
+    get(key, name, out_folder)
+        restores the cached output files as out_folder / name.*
+    put(key, files, name)
+        stores the output files of the conversion
+
+    Examples
+    -------
+    from optconvert import Converter
+    from optconvert.cache import ConversionCache
+
+    cache = ConversionCache()
+    Converter('Dakota_det.mpl', 'mps', cache=cache).run()  # miss, converts and stores the result
+    Converter('Dakota_det.mpl', 'mps', cache=cache).run()  # hit, copies Dakota_det.mps from the cache
+    """
+
+    STR_TEMP_PREFIX = '.tmp-'
+
+    def __init__(self, folder: Path = None, max_size: int = 1024 ** 3, hardlink: bool = False):
+        if folder is None:
+            folder = Path(os.environ.get('OPTCONVERT_CACHE_DIR', Path.home() / '.cache' / 'optconvert'))
+        self.folder = folder
+        self.max_size = max_size
+        self.hardlink = hardlink # hardlinked outputs share the data with the cache, do not modify them
+        self.hits = 0
+        self.misses = 0
+        self.folder.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def key(file: Path, out_format: str) -> str:
+        digest = hashlib.sha256()
+        digest.update(f'{optconvert.__version__}\n{out_format}\n'.encode())
+        for option, value in sorted(_engine_options().items()): # the options in effect, not the defaults
+            digest.update(f'{option}={value}\n'.encode())
+        digest.update(f'{split_name(file)[1]}\n'.encode())
+        # the names of the .dat files are in the .mpl, every file is hashed separately to keep the boundaries
+        for input_file in [file] + referenced_files(file):
+            file_digest = hashlib.sha256()
+            if input_file.is_file():
+                with open(input_file, 'rb') as f:
+                    for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                        file_digest.update(chunk)
+            digest.update(file_digest.digest() if input_file.is_file() else b'missing')
+        return digest.hexdigest()
+
+    def get(self, key: str, name: str, out_folder: Path = Path()) -> list:
+        """Restores the cached files of the conversion as out_folder / name.*
+
+        Returns
+        -------
+        list
+            Path of every restored file or None if the key is not in the cache
+        """
+
+        entry = self.folder / key
+        restored = []
+        try:
+            for cached_file in sorted(entry.iterdir()):
+                out_file = out_folder / (name + cached_file.name)
+                restored.append(out_file)
+                self._restore(cached_file, out_file)
+            os.utime(entry) # mark as recently used
+        except BaseException as e:
+            for out_file in restored: # no partial result is left
+                if out_file.is_file():
+                    out_file.unlink()
+            if not isinstance(e, FileNotFoundError): # not cached or evicted by another process
+                raise
+            self.misses += 1
+            return None
+        self.hits += 1
+        return restored
+
+    def _restore(self, cached_file: Path, out_file: Path):
+        if self.hardlink:
+            if out_file.exists():
+                out_file.unlink()
+            try:
+                os.link(cached_file, out_file)
+                return
+            except OSError as e:
+                if e.errno != errno.EXDEV: # cache and output are on different devices, the file is copied
+                    raise
+        shutil.copyfile(cached_file, out_file)
+
+    def put(self, key: str, files: list, name: str):
+        """Stores the output files of the conversion. Files are named name.* ; the part after name is kept in the cache."""
+
+        temp_entry = self.folder / f'{ConversionCache.STR_TEMP_PREFIX}{uuid.uuid4().hex}'
+        temp_entry.mkdir()
+        try:
+            for file in files:
+                shutil.copyfile(file, temp_entry / file.name[len(Path(name).name):])
+            os.rename(temp_entry, self.folder / key)
+        except OSError:
+            shutil.rmtree(temp_entry, ignore_errors=True)
+            if not (self.folder / key).is_dir(): # otherwise another process has stored the same key in the meantime
+                raise
+        self._evict()
+
+    @property
+    def size(self) -> int:
+        return sum(file.stat().st_size for file in self.folder.glob('*/*') if file.is_file())
+
+    def _evict(self):
+        entries = []
+        total_size = 0
+        for entry in self.folder.iterdir():
+            if entry.name.startswith(ConversionCache.STR_TEMP_PREFIX):
+                continue
+            try:
+                entry_size = sum(file.stat().st_size for file in entry.iterdir())
+                entries.append((entry.stat().st_mtime, entry_size, entry))
+            except FileNotFoundError: # evicted by another process
+                continue
+            total_size += entry_size
+        for _, entry_size, entry in sorted(entries, key=lambda item: item[0]):
+            if total_size <= self.max_size:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total_size -= entry_size
@@ -1,7 +1,9 @@
 import argparse
 import sys
 from pathlib import Path
-from optconvert import Converter, Messages, Model
+from optconvert import Converter, Messages, Model, Profile
+from optconvert.converter import convert_files, output_names
+from optconvert.compression import COMPRESSIONS, split_name
 
 def parse_args(args):
 
@@ -12,10 +14,45 @@ def parse_args(args):
 
     parser.add_argument('--file', default=[], type=str, action='append', dest='files',
                         help="Filename with the extension of the file to convert, e.g., siplib.lp. Default value: None (chose files interactively)")
-    parser.add_argument('--out_format', default=None, choices=[None] + supported_formats,
-                        help=f"Output format: {', '.join(supported_formats)}. Default value: None (choose format interactively)")
-
-    return parser.parse_args(args)
+    def out_formats(value):
+        # one or several comma-separated formats, e.g., mps,lp.gz,gms; the value is passed to Converter as is
+        formats = value.split(',')
+        unsupported = [format for format in formats
+                       if format.split('.')[0] not in supported_formats or len(format.split('.')) > 2
+                       or len(format.split('.')) == 2 and format.split('.')[1] not in COMPRESSIONS]
+        if unsupported or len(set(formats)) < len(formats):
+            raise argparse.ArgumentTypeError(f"invalid choice: '{value}' (choose one or several comma-separated formats from {', '.join(supported_formats)}, "
+                                             f"compressed formats end with .{', .'.join(COMPRESSIONS)}, e.g., mps.gz)")
+        return value
+
+    parser.add_argument('--out_format', default=None, type=out_formats,
+                        help=f"Output format: {', '.join(supported_formats)} or several comma-separated formats, e.g., mps,lp,gms. The file is read once for all formats. Append .{', .'.join(COMPRESSIONS)} for compressed output, e.g., mps.gz. Default value: None (choose format interactively)")
+    parser.add_argument('--jobs', default=None, type=int,
+                        help="Number of files converted in parallel processes. The program exits after the conversion without asking. Default value: None (convert one by one)")
+    parser.add_argument('--profile', default=None, nargs='?', const='-', type=str,
+                        help="Write the time, file sizes and peak memory of the conversion stages as a JSON line per file to the given file or, without the filename, to stderr. Default value: None (do not measure)")
+    parser.add_argument('--input-dir', default=None, type=Path,
+                        help="Convert the files of this folder without interaction. Requires --out_format. Default value: None (use --file or choose files interactively)")
+    parser.add_argument('--glob', default=None, type=str,
+                        help="Glob pattern of the files in --input-dir, e.g., 'siplib_*.mps'. Default value: None (all files of the supported input formats)")
+    parser.add_argument('--recursive', action='store_true',
+                        help="Search the files in the subfolders of --input-dir too")
+    parser.add_argument('--output-dir', default=None, type=Path,
+                        help="Folder for the files converted from --input-dir, the subfolders are recreated. Default value: None (the converted subfolder of --input-dir)")
+    parser.add_argument('--manifest', default=None, type=Path,
+                        help="JSON lines file with the input hash, outputs, status and time of every conversion from --input-dir. Default value: None (optconvert_manifest.jsonl in --output-dir)")
+    parser.add_argument('--resume', action='store_true',
+                        help="Skip the files of --input-dir that the manifest records as converted if the files and their outputs are unchanged")
+
+    parsed = parser.parse_args(args)
+    if parsed.input_dir is not None:
+        if parsed.out_format is None:
+            parser.error('--input-dir requires --out_format')
+        if parsed.files:
+            parser.error('--input-dir and --file cannot be combined')
+    elif parsed.glob is not None or parsed.recursive or parsed.output_dir is not None or parsed.manifest is not None or parsed.resume:
+        parser.error('--glob, --recursive, --output-dir, --manifest and --resume require --input-dir')
+    return parsed
 
 def command_line():
 
@@ -30,6 +67,11 @@ def command_line():
     parsed = parse_args(sys.argv[1:])
     files = parsed.files
     out_format = parsed.out_format
+    jobs = parsed.jobs
+    profile_file = parsed.profile
+
+    if parsed.input_dir is not None:
+        return _convert_directory(parsed)
 
     result = False  # for testing
     quit = False
@@ -38,9 +80,10 @@ def command_line():
         if not files:
 
             supported_files = []
-            for ext in Model.supported_in_formats:
-                pathes = cwd.glob(f'*.{ext}')
-                supported_files.extend([path.relative_to(cwd) for path in pathes])
+            for ext in Model.supported_in_formats: # also compressed, e.g., .mps.gz
+                for suffix in [''] + [f'.{compression}' for compression in COMPRESSIONS]:
+                    pathes = cwd.glob(f'*.{ext}{suffix}')
+                    supported_files.extend([path.relative_to(cwd) for path in pathes])
 
             n_supported_files = len(supported_files)
             files_by_ext = {key: [] for key in Model.supported_in_formats}
@@ -51,7 +94,7 @@ def command_line():
                 return result
             for i, file in enumerate(supported_files):
                 print(f'{i} - {file}')
-                file_ext = file.suffix[1:]
+                file_ext = split_name(file)[1] # mps for Dakota_det.mps.gz
                 files_by_ext[file_ext].append(file)
             for ext, instances in files_by_ext.items():
                 if instances:
@@ -88,12 +131,19 @@ def command_line():
                 except:
                     print(Messages.MSG_INPUT_WRONG_INDEX)
 
+        if jobs is not None:
+            return _convert_parallel(files, out_format, jobs, profile_file)
+
         result = None
+        names = output_names(files) # the same names as with --jobs
         for file in files:
-            converter = Converter(file, out_format)
+            profile = Profile(memory=True) if profile_file is not None else None
+            converter = Converter(file, out_format, names[file], profile=profile)
             try:
                 result = converter.run()
                 print(f'File {file} converted to format {out_format}.')
+                if profile is not None:
+                    _write_profile(profile_file, profile, file, out_format)
             except (FileNotFoundError, RuntimeError) as e:
                 result = e
                 print(file, e)
@@ -110,4 +160,43 @@ def command_line():
             files = []
             out_format = None
 
-    return result
\ No newline at end of file
+    return result
+
+def _convert_parallel(files, out_format, jobs, profile_file=None):
+    result = True
+    n_converted = 0
+    for file, file_result in convert_files(files, out_format, jobs, profile_file is not None):
+        if not isinstance(file_result, Exception):
+            n_converted += 1
+            print(f'File {file} converted to format {out_format}.')
+            if profile_file is not None:
+                _write_profile(profile_file, file_result, file, out_format)
+        else:
+            result = file_result
+            print(file, file_result)
+    print(f'{n_converted} of {len(files)} files converted to format {out_format}.')
+    return result
+
+def _convert_directory(parsed):
+    from optconvert.batch import Manifest, convert_directory # imported here to keep the import of optconvert fast
+    result = True
+    counts = {}
+    records = convert_directory(parsed.input_dir, parsed.out_format, parsed.output_dir, parsed.glob, parsed.recursive,
+                                parsed.manifest, parsed.resume, parsed.jobs)
+    for record in records:
+        counts[record['status']] = counts.get(record['status'], 0) + 1
+        if record['status'] == Manifest.STR_FAILED:
+            result = RuntimeError(record['error'])
+            print(record['file'], record['error'])
+        elif record['status'] == Manifest.STR_CONVERTED:
+            print(f'File {record["file"]} converted to format {parsed.out_format}.')
+    print(', '.join(f'{n} {status}' for status, n in counts.items()) or 'No files found.')
+    return result
+
+def _write_profile(profile_file, profile, file, out_format):
+    line = profile.to_json(file=str(file), out_format=out_format)
+    if profile_file == '-':
+        print(line, file=sys.stderr) # stdout has the status lines of the conversion
+    else:
+        with open(profile_file, 'a') as out:
+            out.write(line + '\n')
@@ -0,0 +1,55 @@
+from pathlib import Path
+import shutil
+from optconvert import Messages
+
+COMPRESSIONS = ['gz', 'xz', 'zst'] # the last suffix of a compressed file, e.g., Dakota_det.mps.gz
+
+
+def split_name(file) -> tuple:
+    """Returns (stem, format, compression) of the file name.
+
+    Dakota_det.mps.gz -> ('Dakota_det', 'mps', 'gz'), Dakota_det.mps -> ('Dakota_det', 'mps', None)
+    """
+
+    file = Path(file)
+    compression = file.suffix[1:]
+    if compression in COMPRESSIONS:
+        file = Path(file.stem)
+    else:
+        compression = None
+    return file.stem, file.suffix[1:], compression
+
+
+def open_file(file: Path, mode: str = 'rt', compression: str = None):
+    """Opens the file like open(file, mode), (de)compressing the stream according to compression or,
+    if it is None, to the last suffix of the file. The data is decompressed while it is read."""
+
+    if compression is None:
+        compression = split_name(file)[2]
+    if compression is None:
+        return open(file, mode, buffering=1024 * 1024)
+    # the codecs are imported here to keep the import of optconvert fast
+    if compression == 'gz':
+        import gzip
+        return gzip.open(file, mode)
+    if compression == 'xz':
+        import lzma
+        return lzma.open(file, mode)
+    if compression == 'zst':
+        try:
+            import zstandard
+        except ImportError:
+            raise RuntimeError(Messages.MSG_ZSTD_NOT_INSTALLED)
+        return zstandard.open(file, mode)
+    raise ValueError(f'{compression} compression is not supported.')
+
+
+def compress_file(source: Path, target: Path, compression: str = None):
+    """Writes the compressed copy of the source, the compression is taken from the suffix of the target by default."""
+    with open(source, 'rb') as source_file, open_file(target, 'wb', compression) as target_file:
+        shutil.copyfileobj(source_file, target_file, 1024 * 1024)
+
+
+def decompress_file(source: Path, target: Path):
+    with open_file(source, 'rb') as source_file, open(target, 'wb') as target_file:
+        shutil.copyfileobj(source_file, target_file, 1024 * 1024)
@@ -8,8 +8,12 @@ class Messages:
     MSG_MODEL_NO_PARSING_FOR_FORMAT = 'Parsing for the format is not implemented.'
     MSG_NO_MPL_MODEL_CANNOT_SOLVE = 'Model cannot be solved because mpl_model does not exist (see which files were used as input).'
     MSG_NO_MPL_MODEL_CANNOT_SAVE = 'Model cannot be saved because mpl_model does not exist (see which files were used as input).'
+    MSG_ZSTD_NOT_INSTALLED = 'Install the zstandard package to read and write .zst files.'
+    MSG_MODEL_CLOSED = 'The Model is closed, its mpl_model was returned to the engine.'
     MSG_FILE_SHOULD_BE_PATH = 'The file attribute should have type Path().'
     MSG_STOCH_ONLY_TO_MPS = 'Stochastic models are to be converted only to .cor, .sto, .tim (SMPS)'
+    MSG_MPS_CHANGED = 'The .mps file ended before its SMPS sections, it was changed during the conversion.'
+    MSG_STOCH_NOT_IN_MEMORY = 'Stochastic models (SMPS) cannot be read from or exported to a single stream.'
     MSG_EXPLICIT_IN_MPS = '''
     The model formulated in .mpl / .mps file is not compatible with the PNB solver.\n
     First stage constraints in .mpl should be defined before the second stage constraints.\n
@@ -1,25 +1,134 @@
 from pathlib import Path
+from collections import Counter
 from optconvert import Messages, Model
+from optconvert.sparse_model import SparseModel
+from optconvert.profiling import Profile, NO_PROFILE
+from optconvert.compression import split_name
 
 class Converter:
 
     debug = False
 
-    def __init__(self, file: str, out_format: str, name=None):
+    def __init__(self, file: str, out_format: str, name=None, cache=None, profile: Profile = None):
         self.file = file
-        self.in_format = Path(file).suffix[1:]
-        self.out_format = out_format
+        self.in_format = split_name(file)[1] # mps for Dakota_det.mps.gz
+        self.out_format = out_format # one format or several comma-separated formats, e.g., mps,lp.gz,gms
+        self.out_formats = out_format.split(',') if isinstance(out_format, str) else list(out_format)
         if name is None:
-            name = Path(file).stem
+            name = split_name(file)[0]
         self.name = name
+        self.cache = cache # optional ConversionCache
+        self.profile = profile # optional Profile, records the stages of run()
+        self.exported_files = None # assigned in run()
 
 
     def run(self):
+        """Converts the file to every output format. The file is read once for all formats that are not cached."""
 
+        profile = self.profile if self.profile is not None else NO_PROFILE
         try:
-            model = Model(Path(self.file))
-            model.export(Path(f'{self.name}.{self.out_format}'))
+            exported_files = {} # {out_format: files}
+            keys = {}
+            if self.cache is not None:
+                for out_format in self.out_formats:
+                    with profile.stage('cache_lookup', read=[Path(self.file)]) as written:
+                        keys[out_format] = self.cache.key(Path(self.file), out_format)
+                        restored_files = self.cache.get(keys[out_format], self.name, Path().absolute())
+                        written.extend(restored_files or [])
+                    if restored_files is not None:
+                        exported_files[out_format] = restored_files
+            pending_formats = [out_format for out_format in self.out_formats if out_format not in exported_files]
+            converted_files = self._run_native(pending_formats, profile)
+            engine_formats = [out_format for out_format in pending_formats if out_format not in converted_files]
+            if engine_formats:
+                with Model(Path(self.file), profile=self.profile) as model:
+                    files = model.export_many([Path(f'{self.name}.{out_format}').absolute() for out_format in engine_formats])
+                converted_files.update(zip(engine_formats, files))
+            exported_files.update(converted_files)
+            self.exported_files = [file for out_format in self.out_formats for file in exported_files[out_format]]
+            if self.cache is not None:
+                for out_format, files in converted_files.items():
+                    with profile.stage('cache_store', read=files):
+                        self.cache.put(keys[out_format], files, self.name)
         except Exception as e:
             raise e
 
-        return True
\ No newline at end of file
+        return True
+
+    def _run_native(self, out_formats, profile=NO_PROFILE):
+        # deterministic mps and lp are converted to mps / lp without the MPL engine, returns {out_format: files}
+        out_formats = [out_format for out_format in out_formats if split_name(f'_.{out_format}')[1] in SparseModel.supported_out_formats]
+        if self.in_format not in SparseModel.supported_in_formats or not out_formats:
+            return {}
+        try:
+            with profile.stage('native_read', read=[Path(self.file)]):
+                if self.in_format == 'mps':
+                    model = SparseModel.read_mps(Path(self.file))
+                else:
+                    model = SparseModel.read_lp(Path(self.file))
+        except ValueError: # not supported by SparseModel, e.g., fixed MPS or SOS, the engine reads the file
+            return {}
+        if model.is_stochastic: # SMPS sections are split by Model.export()
+            return {}
+        converted_files = {}
+        for out_format in out_formats:
+            out_file = Path(f'{self.name}.{out_format}').absolute() # like the files of Model.export()
+            with profile.stage('native_write') as written: # compressed according to the suffix, e.g., .mps.gz
+                if split_name(out_file)[1] == 'mps':
+                    model.write_mps(out_file)
+                else:
+                    model.write_lp(out_file)
+                written.append(out_file)
+            converted_files[out_format] = [out_file]
+        return converted_files
+
+
+def _convert(file, out_format, name, profile=False):
+    # runs in a worker process: every worker loads its own MPL engine
+    try:
+        if not profile:
+            return Converter(file, out_format, name).run()
+        converter = Converter(file, out_format, name, profile=Profile(memory=True))
+        converter.run()
+        return converter.profile
+    except Exception as e:
+        return e
+
+
+def output_names(files):
+    """Returns {file: output name}. Files with the same stem get the input format appended, e.g., inst_mps, inst_lp, inst_mps_gz."""
+    stem_counts = Counter(split_name(file)[0] for file in files)
+    names = {}
+    for file in files:
+        stem, format, compression = split_name(file)
+        names[file] = '_'.join(filter(None, [stem, format, compression])) if stem_counts[stem] > 1 else stem
+    return names
+
+
+def convert_files(files, out_format: str, jobs: int = 1, profile: bool = False):
+    """Converts the files in a pool of jobs processes.
+
+    Parameters
+    ----------
+    files : list
+        filenames to convert
+    out_format : str
+        output format
+    jobs : int
+        number of worker processes
+    profile : bool
+        measure the stages of the conversions
+
+    Returns
+    -------
+    generator of (file, result) in the order of completion. result is True (the Profile of the conversion if profile is True)
+    or the exception raised during the conversion
+    """
+
+    from concurrent.futures import ProcessPoolExecutor, as_completed # imported here to keep the import of optconvert fast
+
+    names = output_names(files)
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = {executor.submit(_convert, str(file), out_format, names[file], profile): file for file in files}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
@@ -0,0 +1,105 @@
+from pathlib import Path
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from itertools import islice
+from optconvert.mpl_with_ext_data import MplWithExtData
+from optconvert.cache import referenced_files
+
+# state of the worker process: its private copy of the template model and the template data
+_worker = {}
+
+
+def _template_files(template: Path) -> list:
+    # the .mpl file and every file it reads the data from
+    return [template] + [file for file in referenced_files(template) if file.is_file()]
+
+
+def _init_worker(template: Path, work_folder: str):
+    # every worker owns a copy of the template, set_ext_data() writes the .dat files only there
+    folder = Path(tempfile.mkdtemp(dir=work_folder))
+    for file in _template_files(template):
+        worker_file = folder / file.relative_to(template.parent)
+        worker_file.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(file, worker_file)
+    _worker['model'] = MplWithExtData(folder / template.name)
+    _worker['folder'] = folder
+    _worker['template_folder'] = template.parent
+    _worker['changed'] = set()
+
+
+def _generate(template: Path, work_folder: str, data: dict, out_file: Path):
+    # runs in a worker process, returns the list of exported files or the exception
+    try:
+        if not _worker: # first instance of this worker
+            _init_worker(template, work_folder)
+        model = _worker['model']
+        # the data files changed by the previous instance of this worker are restored from the template
+        dat_files = model.ext_data_files()
+        for dat_file in {dat_files[name] for name in _worker['changed']}:
+            # copy2 keeps the mtime of the template file, so the restored file is parsed again
+            shutil.copy2(_worker['template_folder'] / dat_file.relative_to(_worker['folder']), dat_file)
+        _worker['changed'] = set(data) & set(dat_files)
+        model.set_ext_data(data)
+        return model.export(out_file)
+    except Exception as e:
+        return e
+
+
+def generate_instances(template: Path, data, out_format: str = 'mpl', out_folder: Path = None, name: str = None, jobs: int = 1):
+    """Generates the instances of the template model with external data in a pool of jobs processes.
+
+    Instance i is the template with the data of the i-th dict in data, the data items missing in the dict
+    keep the template values. The template and its .dat files are not modified.
+
+    Parameters
+    ----------
+    template : Path
+        .mpl file of the MplWithExtData model
+    data : iterable
+        dicts {data_item_name: new_value}, see MplWithExtData.set_ext_data(). May be a generator
+    out_format : str
+        format of the instances
+    out_folder : Path
+        folder for the instances, the folder of the template by default
+    name : str
+        instances are named name_i.out_format, the name of the template by default
+    jobs : int
+        number of worker processes
+
+    Returns
+    -------
+    generator of (i, result) in the order of completion. result is the list of the exported files or the exception raised
+
+    Examples
+    -------
+    from optconvert.instances import generate_instances
+
+    demands = ({'Demand': [{'SCEN': 1, 'value': demand}]} for demand in range(1000, 2000, 100))
+    for i, result in generate_instances(Path('SNDP_default.mpl'), demands, 'mps', jobs=4):
+        print(i, result)
+    """
+
+    template = template.absolute()
+    if not template.is_file():
+        raise FileNotFoundError(f'{template} does not exist.')
+    if out_folder is None:
+        out_folder = template.parent
+    out_folder = out_folder.absolute()
+    if name is None:
+        name = template.stem
+
+    data = enumerate(data)
+    max_pending = 2 * jobs # data is taken from the iterable only when a worker is about to be free
+    with tempfile.TemporaryDirectory() as work_folder, \
+            ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = {}
+        while True:
+            for i, instance_data in islice(data, max_pending - len(futures)):
+                out_file = out_folder / f'{name}_{i}.{out_format}'
+                futures[executor.submit(_generate, template, work_folder, instance_data, out_file)] = i
+            if not futures:
+                break
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield futures.pop(future), future.result()
@@ -2,12 +2,206 @@ from pathlib import Path
 import os
 import shutil
 import re
+import tempfile
+import io
+import threading
+import weakref
+from contextlib import contextmanager
+from typing import NamedTuple
 from optconvert import Messages, Numbers, Solvers
-from mplpy import mpl, ResultType, ModelResultException, InputFileType
+from optconvert.sparse_model import SparseModel
+from optconvert.compression import split_name, open_file, compress_file, decompress_file
+from optconvert.profiling import Profile, NO_PROFILE
 
-mpl.Options['MpsCreateAsMin'].Value = 1  # always transform the obj function to min before mps gen
-mpl.Options['MpsIntMarkers'].Value = 0  # use UI bound entries (instead of integer markers), otherwise, BUG: all ints/bins are assigned to the 1st stage and all integers w/o UB are considered to be bins in SmiScnData
-mpl.Options['MpsDefUIBound'].Value = Numbers.INT_BIG_NUMBER # UB to use for int var with inf UB
+ENGINE_OPTIONS = {
+    'MpsCreateAsMin': 1,  # always transform the obj function to min before mps gen
+    'MpsIntMarkers': 0,  # use UI bound entries (instead of integer markers), otherwise, BUG: all ints/bins are assigned to the 1st stage and all integers w/o UB are considered to be bins in SmiScnData
+    'MpsDefUIBound': Numbers.INT_BIG_NUMBER  # UB to use for int var with inf UB
+}
+
+_ENGINE_LOCK = threading.RLock()
+
+# mplpy is imported and configured by _load_engine() on the first Model construction,
+# so importing optconvert (e.g., for optconvert --help) does not load the engine
+mpl = None
+InputFileType = None
+ModelResultException = None
+
+
+def _load_engine():
+    global mpl, InputFileType, ModelResultException
+    if mpl is not None:
+        return
+    with _ENGINE_LOCK:
+        if mpl is None:
+            import mplpy
+            for option, value in ENGINE_OPTIONS.items():
+                mplpy.mpl.Options[option].Value = value
+            InputFileType = mplpy.InputFileType
+            ModelResultException = mplpy.ModelResultException
+            mpl = mplpy.mpl
+
+
+def _engine_options() -> dict:
+    """Returns the ENGINE_OPTIONS values of the engine: set in the loaded engine, ENGINE_OPTIONS if it is not loaded yet"""
+    if mpl is None:
+        return dict(ENGINE_OPTIONS)
+    with _ENGINE_LOCK:
+        return {option: mpl.Options[option].Value for option in ENGINE_OPTIONS}
+
+
+class _EnginePool:
+    """
+    MPL models of the closed Models kept for reuse, so a long-running process does not accumulate mpl.Models entries.
+
+    A released MPL model is reused by the next Model with the same name, e.g., by the reload of MplWithExtData
+    or by the next conversion of the same file: ReadModel() and ParseModel() replace its contents. When more than
+    max_free released models are kept, the oldest ones that are not in use under the same name are deleted
+    from mpl.Models.
+
+    Attributes
+    ----------
+    max_free : int
+        number of released MPL models kept for reuse
+    in_use : int
+        number of MPL models used by the open Models
+    free : int
+        number of released MPL models kept for reuse
+
+    Methods
+    -------
+    acquire(name)
+        returns an MPL model named name, reused if possible
+    release(name, mpl_model)
+        returns the MPL model to the pool
+    """
+
+    def __init__(self, max_free: int = 8):
+        self.max_free = max_free
+        self._free = [] # (name, mpl model), oldest first
+        self._in_use = {} # name: number of MPL models with this name used by the open Models
+
+    @property
+    def in_use(self) -> int:
+        return sum(self._in_use.values())
+
+    @property
+    def free(self) -> int:
+        return len(self._free)
+
+    def acquire(self, name: str):
+        with _ENGINE_LOCK:
+            for i, (free_name, mpl_model) in enumerate(self._free):
+                if free_name == name:
+                    del self._free[i]
+                    break
+            else:
+                mpl_model = mpl.Models.Add(name)
+            self._in_use[name] = self._in_use.get(name, 0) + 1
+            return mpl_model
+
+    def release(self, name: str, mpl_model):
+        with _ENGINE_LOCK:
+            self._in_use[name] -= 1
+            if not self._in_use[name]:
+                del self._in_use[name]
+            self._free.append((name, mpl_model))
+            # the models are deleted by name, so a name used by an open Model is kept
+            deletable = [i for i, (free_name, _) in enumerate(self._free) if free_name not in self._in_use]
+            for i in reversed(deletable[:max(0, len(self._free) - self.max_free)]):
+                free_name, _ = self._free.pop(i)
+                mpl.Models.Delete(free_name)
+
+
+_ENGINE_POOL = _EnginePool()
+
+
+class _InMemory(NamedTuple):
+    # contents of the model file passed by Model.from_string() to the constructor
+    text: str
+    format: str
+    name: str
+
+
+class SolutionArrays:
+    """
+    Solution of the model: names and values of the variables and constraints in the order of the MPL matrix.
+
+    Every field is read from the engine on its first access, so only the requested values are extracted.
+    Read the fields before the next solve() of the model, later they return the values of the new solution.
+
+    Attributes
+    ----------
+    var_names : list
+    activity, reduced_cost, lower_bound, upper_bound : numpy.ndarray
+        values of the variables
+    con_names : list
+    con_activity, dual, slack : numpy.ndarray
+        values of the constraints
+    """
+
+    def __init__(self, variables: list, constraints: list):
+        self._variables = variables
+        self._constraints = constraints
+        self._fields = {} # field: names or values, filled on the first access
+
+    def _field(self, field: str, items: list, attribute: str, as_array: bool = True):
+        if field not in self._fields:
+            if as_array:
+                import numpy as np # imported here to keep the import of optconvert fast
+                self._fields[field] = np.fromiter((getattr(item, attribute) for item in items), dtype=float, count=len(items))
+            else:
+                self._fields[field] = [getattr(item, attribute) for item in items]
+        return self._fields[field]
+
+    @property
+    def var_names(self) -> list:
+        return self._field('var_names', self._variables, 'Name', as_array=False)
+
+    @property
+    def activity(self):
+        return self._field('activity', self._variables, 'Activity')
+
+    @property
+    def reduced_cost(self):
+        return self._field('reduced_cost', self._variables, 'ReducedCost')
+
+    @property
+    def lower_bound(self):
+        return self._field('lower_bound', self._variables, 'LowerBound')
+
+    @property
+    def upper_bound(self):
+        return self._field('upper_bound', self._variables, 'UpperBound')
+
+    @property
+    def con_names(self) -> list:
+        return self._field('con_names', self._constraints, 'Name', as_array=False)
+
+    @property
+    def con_activity(self):
+        return self._field('con_activity', self._constraints, 'Activity')
+
+    @property
+    def dual(self):
+        return self._field('dual', self._constraints, 'ShadowPrice')
+
+    @property
+    def slack(self):
+        return self._field('slack', self._constraints, 'Slack')
+
+
+@contextmanager
+def _engine_guard():
+    """Serializes the engine calls that change the process cwd (ReadModel, ParseModel, WriteInputFile) and restores the cwd.
+
+    The library itself works with absolute paths only, so it does not depend on the cwd."""
+    with _ENGINE_LOCK:
+        old_cwd = os.getcwd()
+        try:
+            yield
+        finally:
+            os.chdir(old_cwd)
 
 
 class Model:
@@ -18,8 +212,12 @@ class Model:
     ----------
     format : str
         an initial file extension of the model: mps, lp, xa, sim, mpl, gms, mod, xml, mat or c
+    compression : str
+        gz, xz or zst if the model is read from a compressed file, e.g., Dakota_det.mps.gz, otherwise None
     obj_value : float
         optimal objective value. Defined after Solve() call. Call it if Solve() was never called
+    solution : dict
+        {variable name: activity}. Built on the first access after solve() from the names and activities only
     is_stochastic : bool
         is True if model is stochastic
     data_as_dict : dict
@@ -27,28 +225,71 @@ class Model:
 
     Methods
     -------
+    from_string(text, format, name='model'), from_bytes(data, format, name='model'), from_stream(stream, format, name='model')
+        Create the model from the contents of the file in memory
     export(file=None)
-        Converts the model and saves to file. File extensions defines the output format.
+        Converts the model and saves to file. File extensions defines the output format, e.g., .lp or compressed .lp.gz
+    export_many(files)
+        Exports the model to several files from one load
+    export_to_stream(stream, format), to_bytes(format)
+        Converts the model and writes it to a stream / returns as bytes
     solve
         Solves the model and returns the objective value
+    solution_arrays()
+        Returns SolutionArrays with the solution values as NumPy arrays
+    aload(file, timeout=None), aexport(file=None, timeout=None)
+        Coroutines that read / export the model in the worker threads of optconvert.aio
+    close()
+        Returns the MPL model to the engine pool, also called on exit from the with block and when the Model is garbage collected
 
     Private Attributes
     -------
     _file : Path
-        path to the file from which model was loaded. For some formats the model formulation is first loaded to memory and then passed to MPL
+        path to the file from which model was loaded. For some formats the model formulation is first loaded to memory and then passed to MPL.
+        For models created from memory: Path(name.format) that does not exist
     _mpl_model : MPL Model
         intrinsic model
+    _is_stochastic : bool
+        cached result of the stochasticity check, None for .mps until the file is scanned for the SMPS sections
+    _smps_sections : dict
+        byte offsets of the TIME, STOCH, SCENARIOS lines in stochastic .mps file, None if unknown
+    _solution_arrays : SolutionArrays
+        cached result of solution_arrays(), reset by solve()
+    _solution : dict
+        cached result of solution, reset by solve()
+    _profile : Profile
+        records the stages of reading and export, NO_PROFILE if the profile is not requested
+    _bin_vars : list
+        cached result of _binary_variables(), reset when the MPL model is loaded
+    _finalizer : weakref.finalize
+        returns _mpl_model to the engine pool when the Model is garbage collected
+    _closed : bool
+        is True after close()
 
     Private Methods
     -------
     _read_file(file)
         guts of initialization that reads the file and loads it to MPL model
+    _ensure_loaded()
+        hook called before every use of the MPL model
+    _binary_variables()
+        names of the binary variables for the .lp binary fix
+    _acquire_mpl_model(name), _release_mpl_model()
+        take the MPL model from the engine pool / return it to the pool
+    _read_compressed()
+        _read_file() for compressed .mpl and .mps
+    _write_input_file(file, format)
+        writes the model with the engine
+    _read_string(text, format, name)
+        guts of initialization from memory that parses the text and loads it to MPL model
     _parse_file(file)
         called from _read_file() if necessary. Loads file contents to memory, processes it and loads to MPL model
     _read_lp(file)
         _parse_file() for LP
-    _mps2three(temp_file, filename)
-        creates three files .cor, .sto, .tim from .mps temp_file. The later is deleted
+    _scan_smps_sections()
+        finds the SMPS sections in .mps file
+    _mps2three(source, filename, delete_source=False, compress=False, sections=None)
+        creates three files .cor, .sto, .tim from .mps source in a single pass
 
     Examples
     -------
@@ -56,26 +297,97 @@ class Model:
     from pathlib import Path
 
     in_file = Path('Dakota_det.mpl')
-    model = Model(in_file)
-    print('Solution: ' + str(model.solve()))
-    out_file = in_file.with_suffix('lp')
-    model.export(out_file)
+    with Model(in_file) as model:
+        print('Solution: ' + str(model.solve()))
+        out_file = in_file.with_suffix('lp')
+        model.export(out_file)
     """
 
     supported_in_formats = ['mpl', 'mps', 'lp']
     supported_out_formats = ['mps', 'lp', 'xa', 'sim', 'mpl', 'gms', 'mod', 'xml', 'mat', 'c']
 
-    def __init__(self, file: Path):
+    def __init__(self, file: Path, profile: Profile = None):
+        _load_engine()
+        self._profile = profile if profile is not None else NO_PROFILE
         self._file = None # assigned in read_file()
         self._mpl_model = None  # assigned in read_file()
-        self._read_file(file)
+        self._finalizer = None # assigned in _acquire_mpl_model()
+        self._closed = False
+        self._is_stochastic = False  # assigned in read_file()
+        self._smps_sections = None  # assigned in read_file()
+        self._solution_arrays = None  # assigned in solution_arrays()
+        self._solution = None  # assigned in solution
+        self._bin_vars = None # assigned in _binary_variables()
+        if isinstance(file, _InMemory): # passed by from_string()
+            self._read_string(*file)
+        else:
+            self._read_file(file)
+
+    @classmethod
+    def from_string(cls, text: str, format: str, name: str = 'model'):
+        """Creates the model from the contents of the file.
+
+        Parameters
+        ----------
+        text : str
+            model formulation in mpl, lp or mps format
+        format : str
+            mpl, lp or mps
+        name : str
+            model name, used as default name for export
+
+        Returns
+        -------
+        Model
+            instance of the class the method is called on
+        """
+
+        return cls(_InMemory(text, format, name))
+
+    @classmethod
+    def from_bytes(cls, data: bytes, format: str, name: str = 'model', encoding: str = 'utf-8'):
+        return cls.from_string(data.decode(encoding), format, name)
+
+    @classmethod
+    def from_stream(cls, stream, format: str, name: str = 'model', encoding: str = 'utf-8'):
+        data = stream.read()
+        if isinstance(data, bytes):
+            data = data.decode(encoding)
+        return cls.from_string(data, format, name)
+
+    @classmethod
+    async def aload(cls, file: Path, timeout: float = None):
+        """Reads the model in a worker thread without blocking the event loop, see optconvert.aio."""
+        from optconvert import aio # imported here to keep the import of optconvert fast
+        return await aio.load(file, cls, timeout)
+
+    async def aexport(self, file: Path = None, timeout: float = None):
+        """Exports the model in a worker thread without blocking the event loop, see optconvert.aio."""
+        from optconvert import aio
+        return await aio.export(self, file, timeout)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Returns the MPL model to the engine pool. The model cannot be solved or exported after close()."""
+        self._release_mpl_model()
+        self._closed = True
 
     @property
     def format(self):
-        return self._file.suffix[1:]
+        return split_name(self._file)[1]
+
+    @property
+    def compression(self):
+        return split_name(self._file)[2]
 
     @property
     def obj_value(self):
+        self._ensure_loaded()
         solution = self._mpl_model.Solution
         if not solution.IsAvailable:
             self.solve()
@@ -84,49 +396,116 @@ class Model:
 
     @property
     def solution(self) -> dict:
-        result = {}
-        solution = self._mpl_model.Solution
-        if not solution.IsAvailable:
+        if self._solution is None: # only the names and activities are read from the engine
+            self._ensure_loaded()
+            if not self._mpl_model.Solution.IsAvailable:
+                self.solve()
+            self._solution = {variable.Name: variable.Activity for variable in self._mpl_model.Matrix.Variables}
+        return self._solution
+
+    def solution_arrays(self) -> SolutionArrays:
+        """Returns the solution as NumPy arrays. Every array is read from the engine on its first access after solve().
+
+        Returns
+        -------
+        SolutionArrays
+        """
+
+        self._ensure_loaded()
+        if self._solution_arrays is not None:
+            return self._solution_arrays
+
+        if not self._mpl_model.Solution.IsAvailable:
             self.solve()
 
-        return {variable.Name: variable.Activity for variable in self._mpl_model.Matrix.Variables}
+        matrix = self._mpl_model.Matrix
+        self._solution_arrays = SolutionArrays(list(matrix.Variables), list(matrix.Constraints))
+        return self._solution_arrays
 
     @property
     def is_stochastic(self):
-        if self._mpl_model.Matrix.ConStageCount:
-            return True
-        if self.format == 'mps':
-            text = self._file.read_text()
-            lines = text.split('\n')
-            n_stoch_keywords = 0
-            for line in lines:
-                if any(keyword in line for keyword in ['STOCH', 'TIME', 'SCENARIOS']):
-                    n_stoch_keywords += 1
-                if n_stoch_keywords >= 3:
-                    return True
+        self._ensure_loaded()
+        if self._is_stochastic is None:
+            scanned = [] # the scan stops at the SCENARIOS line, so the file is read only up to it
+            with self._profile.stage('detect_stochastic', read=scanned):
+                self._smps_sections = self._scan_smps_sections(scanned)
+                self._is_stochastic = self._smps_sections is not None
+        return self._is_stochastic
 
     @property
     def data_as_dict(self):
         raise NotImplementedError() # see MplWithExtData set_ext_data() for format and SndpGraph()
 
-    def export(self, file: Path = None):
+    def export(self, file: Path = None, compress: bool = False):
         """Exports, i.e., saves the model into the file.
         Output file extension defines the output model format.
         smps means three files: .cor, .tim, .sto
         Stochastic .mpl can be transformed to .sto, .cor, .tim only
-        Stochastic .mps can be transformed to .sto, .cor, .tim only
+        Stochastic .mps can be transformed to .sto, .cor, .tim only. The .mps input is searched for the SMPS sections
+        on the first export (or is_stochastic), not when it is read
         .sto, .cor, .tim cannot be transformed
 
         Parameters
         ----------
         file : Path
             the output file
+        compress : bool or str
+            write .cor, .tim, .sto of stochastic models compressed: True or 'gz' (.cor.gz, .tim.gz, .sto.gz), 'xz' or 'zst'.
+            If the file is compressed, e.g., model.mps.xz, its compression is used
 
         Returns
         -------
-        None
+        list
+            Path of every written file
         """
 
+        if file == None:
+            file = self._file
+        else:
+            file = file.absolute()
+        name, format, compression = split_name(file)
+
+        if not format in Model.supported_out_formats:
+            raise RuntimeError(Messages.MSG_OUT_FORMAT_NOT_SUPPORTED)
+
+        if compression is not None:
+            compress = compression
+
+        self._ensure_loaded()
+        if self.is_stochastic:
+            if format not in ['mps']:
+                raise RuntimeError(Messages.MSG_STOCH_ONLY_TO_MPS)
+            elif self.format == 'mpl':
+                with tempfile.TemporaryDirectory() as temp_dir:
+                    temp_file = Path(temp_dir) / (split_name(self._file)[0] + '_temp.mps')
+                    with self._profile.stage('write') as written, _engine_guard():
+                        self._mpl_model.WriteInputFile(str(temp_file.with_suffix('')), InputFileType.Mps) # export temp .mps file
+                        written.append(temp_file)
+                    with self._profile.stage('mps2three', read=[temp_file]) as written:
+                        exported_files = self._mps2three(temp_file, file.parent / name, delete_source=False, compress=compress)
+                        written.extend(exported_files)
+            elif self.format == 'mps': # stochastic mps is not parsed as mpl_model bust still can be converted
+                with self._profile.stage('mps2three', read=[self._file]) as written:
+                    exported_files = self._mps2three(self._file, file.parent / name, compress=compress, sections=self._smps_sections)
+                    written.extend(exported_files)
+        elif not self._mpl_model:
+            raise RuntimeError(Messages.MSG_NO_MPL_MODEL_CANNOT_SAVE)
+        elif compression is None:
+            self._write_input_file(file, format)
+            exported_files = [file]
+        else: # the engine writes only plain files
+            with tempfile.TemporaryDirectory() as temp_dir:
+                temp_file = Path(temp_dir) / f'{name}.{format}'
+                self._write_input_file(temp_file, format)
+                with self._profile.stage('compress', read=[temp_file]) as written:
+                    compress_file(temp_file, file)
+                    written.append(file)
+            exported_files = [file]
+
+        return exported_files
+
+    def _write_input_file(self, file: Path, format: str):
+        """Writes the model with the engine to the plain file and fixes the binary variables of .lp"""
 
         format_dict = {
             'mps': InputFileType.Mps,
@@ -141,65 +520,176 @@ class Model:
             'c': InputFileType.CDef
         }
 
-        if file == None:
-            format = self.format
-            name = self._file.stem
-        else:
-            format = file.suffix[1:]
-            name = file.stem
-
-        if not format in Model.supported_out_formats:
-            raise RuntimeError(Messages.MSG_OUT_FORMAT_NOT_SUPPORTED)
-
-        if self.is_stochastic:
-            temp_file = Path(str(self._file.stem) + '_temp.mps')
-            if format not in ['mps']:
-                raise RuntimeError(Messages.MSG_STOCH_ONLY_TO_MPS)
-            elif self.format == 'mpl':
-                self._mpl_model.WriteInputFile(str(self._file.stem) + '_temp', format_dict['mps']) # export temp .mps file
-            elif self.format == 'mps': # stochastic mps is not parsed as mpl_model bust still can be converted
-                shutil.copy(self._file, temp_file)
-            self._mps2three(temp_file, name)
-        elif not self._mpl_model:
-            raise RuntimeError(Messages.MSG_NO_MPL_MODEL_CANNOT_SAVE)
-        else:
+        with self._profile.stage('write') as written, _engine_guard():
             self._mpl_model.WriteInputFile(str(file), format_dict[format])
+            written.append(file)
 
         # Bug in MPL with binary vars (added to INTEGERS block)
         if format == 'lp':
-            lines = file.read_text().splitlines()
-            processed_lines = []
-            vector_bins = []
-            for vector in self._mpl_model.VariableVectors: # vector.Type is often None (not set) and can't be used
-                vector_bins.extend([var.Name for var in vector if var.IsBinary])
-            plain_bins = [var.Name for var in self._mpl_model.PlainVariables if var.IsBinary]
-            bin_vars = vector_bins + plain_bins
-            if bin_vars:
-                end_line_index = None
-                for line in lines:
-                    if 'END' == line.strip().upper():
-                        end_line_index = len(processed_lines)
-                    if not any([var_name == line.strip() for var_name in bin_vars]):
-                        processed_lines.append(line)
-                processed_lines.insert(end_line_index, 'BINARY')
-                i = 0
-                for i, var in enumerate(bin_vars, 1):
-                    processed_lines.insert(end_line_index + i, var)
-                processed_lines.insert(end_line_index + i + 1, '') # blank line after BINARY block
-                file.write_text('\n'.join(processed_lines))
-
-        return True
+            with self._profile.stage('fix_lp_binaries', read=[file]) as written:
+                bin_vars = self._binary_variables()
+                if bin_vars:
+                    Model._fix_lp_binaries(file, bin_vars)
+                    written.append(file)
+
+    def export_many(self, files: list, compress: bool = False) -> list:
+        """Exports the model to several files, e.g., of different formats, from one load.
+
+        The engine writes the files one by one under the engine lock, the post-processing of a written file
+        (SMPS split, binary fix) runs in a thread while the engine writes the next one. The binary variables and the
+        SMPS sections are read before the threads start. The stages of a profiled export run one by one.
+
+        Parameters
+        ----------
+        files : list
+            the output files, see export()
+        compress : bool
+            see export()
+
+        Returns
+        -------
+        list with the list of the exported files of every output file
+        """
+
+        from concurrent.futures import ThreadPoolExecutor # imported here to keep the import of optconvert fast
+
+        # resolved before the threads start, the cwd may be changed by the engine call of another thread
+        files = [Path(file).absolute() for file in files]
+        if any(file.suffix != '.mpl' for file in files): # MplWithExtData writes .mpl without the MPL model
+            self._ensure_loaded() # reload once, not in every thread
+            self.is_stochastic # the .mps input is scanned once, not by every thread
+            if any(split_name(file)[1] == 'lp' for file in files) and self._mpl_model:
+                self._binary_variables() # read from the engine once, the threads use the cached names
+        max_workers = len(files) if self._profile is NO_PROFILE else 1 # the profile measures nested stages
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            futures = [executor.submit(self.export, file, compress) for file in files]
+            return [future.result() for future in futures]
+
+    def export_to_stream(self, stream, format: str):
+        """Converts the model to the format and writes it to the stream.
+
+        MPL writes models only to files, so the output goes through a private temporary folder.
+
+        Parameters
+        ----------
+        stream : file-like
+            binary or text stream
+        format : str
+            output format
+
+        Returns
+        -------
+        None
+        """
+
+        if self.is_stochastic:
+            raise RuntimeError(Messages.MSG_STOCH_NOT_IN_MEMORY)
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            file = Path(temp_dir) / f'{split_name(self._file)[0]}.{format}'
+            self.export(file)
+            if isinstance(stream, io.TextIOBase):
+                with open(file, 'r') as f:
+                    shutil.copyfileobj(f, stream)
+            else:
+                with open(file, 'rb') as f:
+                    shutil.copyfileobj(f, stream)
+
+    def to_bytes(self, format: str) -> bytes:
+        stream = io.BytesIO()
+        self.export_to_stream(stream, format)
+        return stream.getvalue()
 
     def solve(self, solver: str = None):
 
         if solver is None:
             solver = Solvers.COIN_MP
+        self._ensure_loaded()
         if self._mpl_model:
+            self._solution_arrays = None
+            self._solution = None
             self._mpl_model.Solve(mpl.Solvers[solver])
             return self.obj_value
         else:
             raise RuntimeError(Messages.MSG_NO_MPL_MODEL_CANNOT_SOLVE)
 
+    def _ensure_loaded(self):
+        """Called before every use of the MPL model. Subclasses reload the model here if its input has changed."""
+        if self._closed:
+            raise RuntimeError(Messages.MSG_MODEL_CLOSED)
+
+    def _binary_variables(self) -> list:
+        # names of the binary variables, shared by the exports of the loaded model
+        with _ENGINE_LOCK:
+            if self._bin_vars is None:
+                vector_bins = []
+                for vector in self._mpl_model.VariableVectors: # vector.Type is often None (not set) and can't be used
+                    vector_bins.extend([var.Name for var in vector if var.IsBinary])
+                plain_bins = [var.Name for var in self._mpl_model.PlainVariables if var.IsBinary]
+                self._bin_vars = vector_bins + plain_bins
+            return self._bin_vars
+
+    def _acquire_mpl_model(self, name: str):
+        # the previous MPL model (reload of the model) is returned to the pool first, so it can be reused
+        self._release_mpl_model()
+        self._bin_vars = None
+        self._mpl_model = _ENGINE_POOL.acquire(name)
+        # the MPL model is returned to the pool by close() or when the Model is garbage collected
+        self._finalizer = weakref.finalize(self, _ENGINE_POOL.release, name, self._mpl_model)
+        self._finalizer.atexit = False # the engine may be unloaded at exit
+
+    def _release_mpl_model(self):
+        if self._finalizer is not None:
+            self._finalizer() # calls _ENGINE_POOL.release() only once
+            self._finalizer = None
+        self._mpl_model = None
+
+    @staticmethod
+    def _fix_lp_binaries(file: Path, bin_vars: list):
+        """Moves binary variables from INTEGERS to BINARY block of .lp file.
+
+        The file is rewritten in a single pass: lines are checked against a set of names and
+        the BINARY block is written right before END. If END is missing, the block and END are appended.
+
+        Parameters
+        ----------
+        file : Path
+            .lp file written by MPL
+        bin_vars : list
+            names of the binary variables
+
+        Returns
+        -------
+        None
+        """
+
+        bin_set = set(bin_vars)
+        temp_file = file.with_name(file.name + '.tmp')
+        with open(file, 'r') as lp_file, open(temp_file, 'w', buffering=1024 * 1024) as out:
+            # lines are joined with '\n' as separator, i.e., no newline after the last line of the file
+            separator = ''
+            binary_block_written = False
+            for line in lp_file:
+                line = line.rstrip('\r\n')
+                stripped_line = line.strip()
+                if stripped_line in bin_set:
+                    continue
+                if not binary_block_written and 'END' == stripped_line.upper():
+                    out.write(separator + 'BINARY')
+                    for var in bin_vars:
+                        out.write('\n' + var)
+                    out.write('\n') # blank line after BINARY block
+                    separator = '\n'
+                    binary_block_written = True
+                out.write(separator + line)
+                separator = '\n'
+            if not binary_block_written:
+                out.write(separator + 'BINARY')
+                for var in bin_vars:
+                    out.write('\n' + var)
+                out.write('\n\nEND')
+        os.replace(temp_file, file)
+
     def _read_file(self, file: Path):
 
         if self._file is not None:
@@ -208,7 +698,7 @@ class Model:
         if not isinstance(file, Path):
             raise ValueError(Messages.MSG_FILE_SHOULD_BE_PATH)
 
-        self._file = file
+        self._file = file.absolute() # the cwd may change during the work with the model
 
         if not self._file.is_file():
             raise FileNotFoundError(Messages.MSG_INSTANCE_FILE_NOT_FOUND)
@@ -217,155 +707,395 @@ class Model:
             raise RuntimeError(Messages.MSG_INPUT_FORMAT_NOT_SUPPORTED)
 
         try:
-            if self.format in ['mpl', 'mps']: # these formats can be natively read with mpl.Model.ReadModel()
-                self._mpl_model = mpl.Models.Add(str(self._file))
-                old_cwd = Path(__file__).cwd()
-                file_path = str(file.parent).replace('\\', '//')
-                self._mpl_model.WorkingDirectory = file_path  # .dat file locations in .mpl file are defined relative to file location, ReadModel searches .dat files relative to cwd
-                self._mpl_model.ReadModel(file.name)
-                os.chdir(old_cwd)  # ReadModel() changes the cwd to model working directory, set it back
+            if self.format in ['mpl', 'mps'] and self.compression is not None:
+                self._read_compressed()
+            elif self.format in ['mpl', 'mps']: # these formats can be natively read with mpl.Model.ReadModel()
+                # ReadModel() changes the cwd to model working directory, the guard sets it back
+                with self._profile.stage('read', read=[self._file]), _engine_guard():
+                    self._acquire_mpl_model(str(self._file))
+                    file_path = str(self._file.parent).replace('\\', '//')
+                    self._mpl_model.WorkingDirectory = file_path  # .dat file locations in .mpl file are defined relative to file location, ReadModel searches .dat files relative to cwd
+                    self._mpl_model.ReadModel(self._file.name)
             elif self.format in ['lp']: # these formats are first tansformed to mpl as text and then read by mpl.Model with ParseModel()
                 self._parse_file()
         except ModelResultException as e:
             raise RuntimeError(e)
 
+        with self._profile.stage('detect_stochastic'):
+            self._smps_sections = None
+            if self._mpl_model.Matrix.ConStageCount:
+                self._is_stochastic = True
+            elif self.format == 'mps': # the file is scanned for the SMPS sections only when needed, see is_stochastic
+                self._is_stochastic = None
+            else:
+                self._is_stochastic = False
+
+    def _read_compressed(self):
+        file_path = str(self._file.parent).replace('\\', '//')
+        if self.format == 'mpl': # the formulation is decompressed into memory and parsed
+            with self._profile.stage('decompress', read=[self._file]):
+                with open_file(self._file, 'rt') as mpl_file:
+                    text = mpl_file.read()
+            with self._profile.stage('read'), _engine_guard(): # ParseModel() changes the cwd
+                self._acquire_mpl_model(str(self._file))
+                self._mpl_model.WorkingDirectory = file_path # .dat files are relative to the .mpl file
+                self._mpl_model.ParseModel(text)
+        else: # MPL cannot parse mps from memory, the file is decompressed to a temporary folder
+            with tempfile.TemporaryDirectory() as temp_dir:
+                mps_file = Path(temp_dir) / f'{split_name(self._file)[0]}.mps'
+                with self._profile.stage('decompress', read=[self._file]) as written:
+                    decompress_file(self._file, mps_file)
+                    written.append(mps_file)
+                with self._profile.stage('read', read=[mps_file]), _engine_guard(): # ReadModel() changes the cwd
+                    self._acquire_mpl_model(str(self._file))
+                    self._mpl_model.WorkingDirectory = temp_dir
+                    self._mpl_model.ReadModel(mps_file.name)
+
+    def _read_string(self, text: str, format: str, name: str):
+
+        if self._file is not None:
+            raise RuntimeError(Messages.MSG_MODEL_READ_FILE_ONLY_ONCE)
+
+        if not format in Model.supported_in_formats:
+            raise RuntimeError(Messages.MSG_INPUT_FORMAT_NOT_SUPPORTED)
+
+        self._file = Path(f'{name}.{format}')
+
+        if format == 'mps': # MPL cannot parse mps from memory, it is translated to lp first
+            sparse_model = SparseModel.read_mps(io.StringIO(text))
+            if sparse_model.is_stochastic:
+                raise RuntimeError(Messages.MSG_STOCH_NOT_IN_MEMORY)
+            lp_text = io.StringIO()
+            sparse_model.write_lp(lp_text)
+            text = lp_text.getvalue()
+            format = 'lp'
+        if format == 'lp':
+            mpl_text = io.StringIO()
+            Model._parse_lp(io.StringIO(text), mpl_text)
+            text = mpl_text.getvalue()
+
+        try:
+            with _engine_guard(): # ParseModel() changes the cwd
+                self._acquire_mpl_model(name)
+                self._mpl_model.ParseModel(text)
+        except ModelResultException as e:
+            raise RuntimeError(e)
+
+        self._is_stochastic = bool(self._mpl_model.Matrix.ConStageCount)
+
+    def _scan_smps_sections(self, scanned: list = None):
+        """Looks for the TIME, STOCH and SCENARIOS lines (in this order) in .mps file.
+
+        The scan stops as soon as all three are found. The number of scanned bytes (of the decompressed file
+        if it is compressed) is appended to scanned.
+
+        Returns
+        -------
+        dict {section: byte offset of the line} or None if the model is not stochastic
+        """
+
+        sections = {}
+        keywords = [b'TIME', b'STOCH', b'SCENARIOS']
+        offset = 0
+        with open_file(self._file, 'rb') as mps_file: # offsets in the decompressed file if it is compressed
+            for line in mps_file:
+                keyword = keywords[len(sections)]
+                offset += len(line)
+                if keyword in line:
+                    sections[keyword.decode()] = offset - len(line)
+                    if len(sections) == len(keywords):
+                        break
+        if scanned is not None:
+            scanned.append(offset)
+        return sections if len(sections) == len(keywords) else None
+
     def _parse_file(self):
 
-        if self.format == 'lp':
-            mpl_string = self._parse_lp()
-        else:
+        if self.format != 'lp':
             raise NotImplementedError(Messages.MSG_MODEL_NO_PARSING_FOR_FORMAT)
 
-        self._mpl_model = mpl.Models.Add(str(self._file))
-        old_cwd = Path(__file__).cwd()
-        self._mpl_model.ParseModel(mpl_string)
-        os.chdir(old_cwd) # ParseModel() changes the cwd
-
-    def _parse_lp(self):
-        # This is cplex format
-        # About CPLEX lp format: http://lpsolve.sourceforge.net/5.1/CPLEX-format.htm
-        lp_string = self._file.read_text()
-        lines = lp_string.split('\n')
-        processed_lines = []
-        counter = {'constraints': 0, 'not_free_bounds': 0}
-        current_label = ''
-        current_mpl_block = None
-        vars = {'FREE': [], 'BINARY': [], 'INTEGER': []} # we do not need to track continuous vars
-        final_comments = []
-        infinity_substitution = False
-        # MPL: [lp block names]
-        blocks_dict = {'MAXIMIZE': ['MAXIMIZE', 'MAXIMUM', 'MAX'],
-                       'MINIMIZE': ['MINIMIZE', 'MINIMUM', 'MIN'],
-                       'SUBJECT TO': ['SUBJECT TO', 'SUCH THAT', 'ST', 'S.T.'],
-                       'BOUNDS': ['BOUNDS', 'BOUND'],
-                       'INTEGER': ['INTEGERS', 'GENERAL'],
-                       'BINARY': ['BINARY', 'BINARIES']}
-        for line in lines:
-
-            # skip empty lines
-            if len(line) == 0:
-                continue
-
-            # transform comments
-            if line[0] == '\\':
-                line = line.replace('\\', '! ', 1)
-                processed_lines.append(line)
-                continue
-
-            updated_current_mpl_block = False
-            for mpl_block in blocks_dict.keys():
-                if any(lp_block == line.upper() for lp_block in blocks_dict[mpl_block]):
-                    current_mpl_block = mpl_block
-                    if current_mpl_block not in ['INTEGER', 'BINARY']: # these two will be added at the end before END
-                        processed_lines.append(2 * '\n' + current_mpl_block + '\n')
-                    updated_current_mpl_block = True
-                    break
-            else:
-                if any(s == line.upper() for s in ['END']):
-
-                    # append FREE, BINARY, INTEGER
-                    for var_category in ['FREE', 'BINARY', 'INTEGER']:
-                        if len(vars[var_category]): processed_lines.append(2*'\n' + var_category + '\n')
-                        for variable in vars[var_category]:
-                            processed_lines.append(variable + ';')
-
-                    # append final comments
-                    processed_lines.append('\n')
-                    if infinity_substitution: final_comments.append('infinity was substituted with a big number in BOUNDS')
-                    for comment in final_comments:
-                        processed_lines.append(f'! {comment}')
-
-                    processed_lines.append('\nEND')
-                    updated_current_mpl_block = True
-
-            if updated_current_mpl_block: continue
-
-            if current_mpl_block in ['MAXIMIZE', 'MINIMIZE']:
-                line = line.replace(': ', ' = ')
-                processed_lines.append(line)
-                continue
-            elif current_mpl_block == 'SUBJECT TO':
-                if current_label == '':
-                    counter['constraints'] += 1
-                    if ':' in line:
-                        current_label = line.split(':')[0].strip()
-                    else:
-                        current_label = f"c{counter['constraints']}"
-                        line = f"{current_label}: {line}"
-                # Add ';' to constraints definition
-                # "The right-hand side coefficient must be typed on the same line as the sense indicator. Acceptable sense indicators are <, <=, =<, >, >=, =>, and ='
-                if any(sign in line for sign in ['<', '<=', '=<', '>', '>=', '=>', '=']):
-                    line += ' ;'
-                    current_label = ''
-                processed_lines.append(line)
-                continue
-            elif current_mpl_block == 'BOUNDS':
-                if ' FREE' in line.upper():
-                    var_name = line.split()[0].strip()
-                    vars['FREE'].append(var_name)
-                    final_comments.append(f'FREE var {var_name} moved from BOUNDS in lp to FREE block in mpl')
-                else:
-                    counter['not_free_bounds'] += 1
-                    # Substitute infinity with a big number
-                    if any(s in line.lower() for s in ['+infinity', '+inf', '-infinity', '-inf']):
-                        infinity_substitution = True
-                        for word in ['infinity', 'inf']:
-                            line = re.sub(word, str(Numbers.INT_BIG_NUMBER), line, flags=re.IGNORECASE)
-                    processed_lines.append(line + ' ;')
-                continue
-            elif current_mpl_block in ['INTEGER', 'BINARY']:
-                vars[current_mpl_block].append(line.strip())
-                continue
-            else:
-                assert(False)
+        # the translated model is streamed to a temporary .mpl file and read from disk by the engine,
+        # so the memory footprint does not depend on the size of the .lp file
+        with tempfile.TemporaryDirectory() as temp_dir:
+            mpl_file = Path(temp_dir) / f'{split_name(self._file)[0]}.mpl'
+            with self._profile.stage('parse_lp', read=[self._file]) as written:
+                with open_file(self._file, 'rt') as lp_file, open(mpl_file, 'w') as out: # .lp.gz etc. is decompressed while read
+                    Model._parse_lp(lp_file, out)
+                written.append(mpl_file)
+            with self._profile.stage('read', read=[mpl_file]), _engine_guard(): # ReadModel() changes the cwd
+                self._acquire_mpl_model(str(self._file))
+                self._mpl_model.WorkingDirectory = temp_dir
+                self._mpl_model.ReadModel(mpl_file.name)
+
+    @staticmethod
+    def _parse_lp(lines, out):
+        """Translates the model in CPLEX .lp format into .mpl in a single pass.
+
+        Lines are consumed one by one and the translation is written to out as soon as possible.
+        FREE, BINARY and INTEGER variables are collected in temporary spool files because
+        MPL expects them right before END.
+
+        Parameters
+        ----------
+        lines : iterable of str
+            lines of the .lp file, e.g., an open file object
+        out : file-like
+            object with write() that receives the .mpl text
+
+        Returns
+        -------
+        None
+        """
+
+        _LpTranslator(out).translate(lines)
+
+    def _mps2three(self, source: Path, filename, delete_source: bool = False, compress: bool = False, sections: dict = None):
+        """Splits stochastic .mps into .cor, .tim, .sto files.
+
+        The source is read once line by line and every line goes directly to the output file of the current section,
+        so the memory footprint does not depend on the number of scenarios.
+
+        Parameters
+        ----------
+        source : Path
+            stochastic .mps file, may be compressed, e.g., .mps.gz
+        filename : Path
+            output files without extension
+        delete_source : bool
+            delete the source after the split (for temporary files)
+        compress : bool or str
+            write compressed files: True or 'gz' (.cor.gz, .tim.gz, .sto.gz), 'xz' or 'zst'
+        sections : dict
+            byte offsets of the sections found by _scan_smps_sections(). If given, .cor and .tim are copied as byte ranges
+
+        Returns
+        -------
+        list
+            Path of .cor, .tim, .sto files
+        """
 
-        mpl_string = ''.join([line + '\n' for line in processed_lines])
+        if sections is not None:
+            out_files = self._mps2three_by_offsets(source, filename, compress, sections)
+            if delete_source:
+                source.unlink()
+            return out_files
 
-        return mpl_string
+        out_files = Model._smps_files(filename, compress)
+        out_handles = {}
+        try:
+            for extension, file in out_files.items():
+                out_handles[extension] = open_file(file, 'wt') # compressed according to the suffix
+            # lines are joined with '\n' as separator, i.e., no newline after the last line of the file
+            started = {extension: False for extension in out_handles}
+
+            def write_line(extension, line):
+                if started[extension]:
+                    out_handles[extension].write('\n')
+                out_handles[extension].write(line)
+                started[extension] = True
+
+            current_file_lines = 'cor'
+            ends_with_newline = False
+            with open_file(source, 'rt') as mps_file:
+                for line in mps_file:
+                    ends_with_newline = line.endswith('\n')
+                    line = line.rstrip('\n')
+                    if current_file_lines == 'cor' and 'TIME' in line: # TIME block should go after COR
+                        current_file_lines = 'tim'
+                    elif current_file_lines == 'tim' and 'STOCH' in line:  # STOCH block should go after TIME
+                        current_file_lines = 'sto'
+                    elif 'EXPLICIT' in line and current_file_lines == 'sto':
+                        raise RuntimeError(Messages.MSG_EXPLICIT_IN_MPS)
+                    write_line(current_file_lines, line)
+            if ends_with_newline:
+                write_line(current_file_lines, '')
+
+            for extension in ['cor', 'tim']:
+                write_line(extension, 'ENDATA')
+        except Exception:
+            for extension, handle in out_handles.items():
+                handle.close()
+                out_files[extension].unlink()
+            raise
+        finally:
+            for handle in out_handles.values():
+                handle.close()
+
+        if delete_source:
+            source.unlink()
+
+        return list(out_files.values())
+
+    def _mps2three_by_offsets(self, source: Path, filename, compress: bool, sections: dict):
+        out_files = Model._smps_files(filename, compress)
+        ranges = {'cor': (0, sections['TIME']), 'tim': (sections['TIME'], sections['STOCH']), 'sto': (sections['STOCH'], None)}
+        created = []
+        try:
+            with open_file(source, 'rb') as mps_file: # a compressed source is only seeked forward
+                for extension, (start, end) in ranges.items():
+                    created.append(out_files[extension])
+                    with open_file(out_files[extension], 'wb') as out:
+                        mps_file.seek(start)
+                        if extension == 'sto': # the only section that should be checked line by line
+                            for line in mps_file:
+                                if b'EXPLICIT' in line:
+                                    raise RuntimeError(Messages.MSG_EXPLICIT_IN_MPS)
+                                out.write(line)
+                            continue
+                        remaining = end - start
+                        while remaining:
+                            chunk = mps_file.read(min(remaining, 1024 * 1024))
+                            if not chunk: # the file is changed after _scan_smps_sections()
+                                raise RuntimeError(Messages.MSG_MPS_CHANGED)
+                            out.write(chunk)
+                            remaining -= len(chunk)
+                        out.write(b'ENDATA')
+        except Exception:
+            for file in created:
+                file.unlink()
+            raise
+
+        return list(out_files.values())
+
+    @staticmethod
+    def _smps_files(filename, compress) -> dict:
+        # {extension: file} of .cor, .tim, .sto; compress is True (gzip), False / None or the compression suffix
+        compression = 'gz' if compress is True else compress
+        suffix = f'.{compression}' if compression else ''
+        return {extension: Path(f'{filename}.{extension}{suffix}') for extension in ['cor', 'tim', 'sto']}
+
+
+class _LpTranslator:
+    """
+    Translator of CPLEX .lp into .mpl used by Model._parse_lp().
+
+    About CPLEX lp format: http://lpsolve.sourceforge.net/5.1/CPLEX-format.htm
+    Every line is classified with the precompiled patterns below and passed to the handler of the current section.
+
+    Private Methods
+    -------
+    _objective(line), _constraint(line), _bound(line), _var(line)
+        handlers of the sections
+    _end()
+        writes FREE, BINARY, INTEGER variables and the final comments
+    """
+
+    # lp section keyword: MPL block
+    SECTIONS = {lp_block: mpl_block
+                for mpl_block, lp_blocks in {'MAXIMIZE': ['MAXIMIZE', 'MAXIMUM', 'MAX'],
+                                             'MINIMIZE': ['MINIMIZE', 'MINIMUM', 'MIN'],
+                                             'SUBJECT TO': ['SUBJECT TO', 'SUCH THAT', 'ST', 'S.T.'],
+                                             'BOUNDS': ['BOUNDS', 'BOUND'],
+                                             'INTEGER': ['INTEGERS', 'GENERAL'],
+                                             'BINARY': ['BINARY', 'BINARIES'],
+                                             'END': ['END']}.items()
+                for lp_block in lp_blocks}
+    MAX_SECTION_LENGTH = max(map(len, SECTIONS))
+    # "The right-hand side coefficient must be typed on the same line as the sense indicator.
+    # Acceptable sense indicators are <, <=, =<, >, >=, =>, and ="
+    SENSE = re.compile(r'[<>=]')
+    FREE = re.compile(r' FREE', flags=re.IGNORECASE)
+    INFINITY = re.compile(r'[+-](?:infinity|inf)\b', flags=re.IGNORECASE)
+    INFINITY_WORD = re.compile(r'\b(?:infinity|inf)\b', flags=re.IGNORECASE) # not in names, e.g., x_inf1 or info
+
+    def __init__(self, out):
+        self._out = out
+        self._write = out.write
+        self._handlers = {'MAXIMIZE': self._objective, 'MINIMIZE': self._objective, 'SUBJECT TO': self._constraint,
+                          'BOUNDS': self._bound, 'INTEGER': self._var, 'BINARY': self._var}
+        self._n_constraints = 0
+        self._current_label = ''
+        self._current_mpl_block = None
+        # we do not need to track continuous vars
+        self._vars = {'FREE': tempfile.TemporaryFile('w+'), 'BINARY': tempfile.TemporaryFile('w+'),
+                      'INTEGER': tempfile.TemporaryFile('w+')}
+        self._n_vars = {var_category: 0 for var_category in self._vars}
+        self._final_comments = tempfile.TemporaryFile('w+')
+        self._infinity_substitution = False
+        self._big_number = str(Numbers.INT_BIG_NUMBER)
+
+    def translate(self, lines):
+        write = self._write
+        sections = _LpTranslator.SECTIONS
+        max_section_length = _LpTranslator.MAX_SECTION_LENGTH
+        handler = None
+        try:
+            for line in lines:
+                line = line.rstrip('\n')
 
-    def _mps2three(self, temp_file: Path, filename):
-        lines_in_files = {'cor': [], 'tim': [], 'sto': []}
-        text = temp_file.read_text()
-        lines = text.split('\n')
+                # skip empty lines
+                if not line:
+                    continue
 
-        current_file_lines = 'cor'
-        for line in lines:
-            if current_file_lines == 'cor' and 'TIME' in line: # TIME block should go after COR
-                current_file_lines = 'tim'
-            elif current_file_lines == 'tim' and 'STOCH' in line:  # STOCH block should go after TIME
-                current_file_lines = 'sto'
-            elif 'EXPLICIT' in line and current_file_lines == 'sto':
-                raise RuntimeError(Messages.MSG_EXPLICIT_IN_MPS)
+                # transform comments
+                if line[0] == '\\':
+                    write(line.replace('\\', '! ', 1) + '\n')
+                    continue
+
+                if len(line) <= max_section_length:
+                    mpl_block = sections.get(line.upper())
+                    if mpl_block == 'END':
+                        self._end()
+                        continue
+                    if mpl_block is not None:
+                        self._current_mpl_block = mpl_block
+                        handler = self._handlers[mpl_block]
+                        if mpl_block not in ['INTEGER', 'BINARY']: # these two will be added at the end before END
+                            write(f'\n\n{mpl_block}\n\n')
+                        continue
+
+                assert handler is not None
+                handler(line)
+        finally:
+            for spool in list(self._vars.values()) + [self._final_comments]:
+                spool.close()
+
+    def _objective(self, line):
+        self._write(line.replace(': ', ' = ') + '\n')
+
+    def _constraint(self, line):
+        if self._current_label == '':
+            self._n_constraints += 1
+            if ':' in line:
+                self._current_label = line.split(':', 1)[0].strip()
+            else:
+                self._current_label = f'c{self._n_constraints}'
+                line = f'{self._current_label}: {line}'
+        # Add ';' to constraints definition
+        if _LpTranslator.SENSE.search(line):
+            line += ' ;'
+            self._current_label = ''
+        self._write(line + '\n')
+
+    def _bound(self, line):
+        if _LpTranslator.FREE.search(line):
+            var_name = line.split()[0].strip()
+            self._vars['FREE'].write(var_name + ';\n')
+            self._n_vars['FREE'] += 1
+            self._final_comments.write(f'! FREE var {var_name} moved from BOUNDS in lp to FREE block in mpl\n')
+        else:
+            # Substitute infinity with a big number
+            if _LpTranslator.INFINITY.search(line):
+                self._infinity_substitution = True
+                line = _LpTranslator.INFINITY_WORD.sub(self._big_number, line)
+            self._write(line + ' ;\n')
 
-            lines_in_files[current_file_lines].append(line)
+    def _var(self, line):
+        self._vars[self._current_mpl_block].write(line.strip() + ';\n')
+        self._n_vars[self._current_mpl_block] += 1
 
-        for extension in ['cor', 'tim', 'sto']:
-            contents = lines_in_files[extension]
-            if extension in ['cor', 'tim']:
-                contents.append('ENDATA')
+    def _end(self):
+        write = self._write
+        # append FREE, BINARY, INTEGER
+        for var_category in ['FREE', 'BINARY', 'INTEGER']:
+            if self._n_vars[var_category]: write(f'\n\n{var_category}\n\n')
+            self._vars[var_category].seek(0)
+            shutil.copyfileobj(self._vars[var_category], self._out)
 
-            file = Path(f'{filename}.{extension}')
-            file.write_text('\n'.join(contents))
+        # append final comments
+        write('\n\n')
+        if self._infinity_substitution: self._final_comments.write('! infinity was substituted with a big number in BOUNDS\n')
+        self._final_comments.seek(0)
+        shutil.copyfileobj(self._final_comments, self._out)
 
-        # Delete the file
-        temp_file.unlink()
+        write('\nEND\n')
@@ -1,41 +1,150 @@
 from pathlib import Path
+from array import array
+import csv
+import shutil
+import io
+import os
+import re
+import optconvert.model
 from optconvert import Model
+from optconvert.model import _InMemory, _engine_guard
+
+
+class _ScalarData():
+    """
+    Data constants (scalars) of the model stored in one .dat file: '!name' line followed by the value line.
+
+    The file is parsed once into the index {name: line of the value} and again only if it has been changed since.
+    set() writes all new values in one atomic rewrite of the file.
+    """
+
+    def __init__(self, file: Path):
+        self.file = file
+        self._lines = []
+        self._rows = {} # {name: index of the value line}
+        self._file_stamp = None
+
+    def _load(self):
+        file_stamp = _stamp(self.file)
+        if file_stamp == self._file_stamp:
+            return
+        self._lines = self.file.read_text().split('\n')
+        self._rows = {line[1:].strip(): row + 1 for row, line in enumerate(self._lines) if line.startswith('!')}
+        self._file_stamp = file_stamp
+
+    @property
+    def names(self) -> list:
+        self._load()
+        return list(self._rows)
+
+    def get(self, name: str) -> str:
+        self._load()
+        return self._lines[self._rows[name]].strip()
+
+    @property
+    def values(self) -> list:
+        """Values in the order of the file, MPL reads them one by one for the DATAFILE() references to the file"""
+        self._load()
+        return [line.strip() for line in self._lines if line.strip() and not line.startswith('!')]
+
+    def set(self, new_values: dict):
+        """Writes {name: new_value} to the file"""
+        self._load()
+        for name, new_value in new_values.items():
+            self._lines[self._rows[name]] = str(new_value)
+        temp_file = self.file.with_name(self.file.name + '.tmp')
+        temp_file.write_text('\n'.join(self._lines))
+        os.replace(temp_file, self.file)
+        self._file_stamp = _stamp(self.file)
 
 
 class _DataItem():
-    def __init__(self, model, name, data_type, filename_prefix):
+    """
+    Data constant (scalar), sparse data vector or sparse index set stored in the .dat file.
+
+    Sparse data is stored column-wise. Index columns are lists of str, the labels are kept as written, e.g., '02139'.
+    The value column of a vector is array('q') of integers, array('d') of numbers or list of str otherwise.
+    The data file is parsed on the first access to the value and again if the file has been changed since.
+    The data file is always in sync with the value: set() writes it and export() copies it.
+    """
+
+    ROWS_PER_WRITE = 100000
+
+    def __init__(self, model, name, data_type, filename_prefix, scalar_data: _ScalarData = None):
         self._model = model
         self._name = name
         self._data_type = data_type
         self._filename_prefix = filename_prefix
-        self._value = None
-
-        file_contents = self.file.read_text()
-        data = file_contents.split('\n')
-        if data_type == 'scalar':
-            row = data.index('!' + self._name) + 1
-            self._value = data[row].strip()
-        else: # vector_sparse or index_sparse
-            # check the formatting
-            first_line = data[0].strip()
-            second_line = data[1].strip()
-            if first_line[0] != '!' or second_line[0] != '!' or first_line[1:] != name:
-                raise ValueError(
-                    f'File {str(self.parse_filename())} formatted not correct: first two lines should be data name and indices as comments')
-
-            keys = second_line[1:].split(',')
-            value_data = data[2:]
-            self._value = []
-            # {index_1: ..., ...index_n: ..., value}
-            for line in value_data:
-                indices_and_value = line.split(',')
-                record = dict(zip(keys, indices_and_value))  # {index_1: ..., ...index_n: ..., value}
-                self._value.append(record)
+        self._value = None # scalar value
+        self._keys = [] # column names of sparse data
+        self._columns = {} # {key: column} of sparse data
+        self._file_stamp = None # (mtime, size) of the data file when it was parsed, None if not parsed
+        if data_type == 'scalar' and scalar_data is None:
+            scalar_data = _ScalarData(self.file)
+        self._scalar_data = scalar_data # scalars of the model share the store
+
+    def _load(self):
+        if self._data_type == 'scalar': # the store checks whether the file has been changed
+            self._value = self._scalar_data.get(self._name)
+            return
+        file_stamp = _stamp(self.file)
+        if file_stamp == self._file_stamp:
+            return
+        self._read_sparse()
+        self._file_stamp = file_stamp
+
+    def _read_header(self, dat_file) -> list:
+        # check the formatting and return the column names
+        first_line = dat_file.readline().strip()
+        second_line = dat_file.readline().strip()
+        if not first_line or not second_line or first_line[0] != '!' or second_line[0] != '!' or first_line[1:] != self._name:
+            raise ValueError(
+                f'File {str(self.parse_filename())} formatted not correct: first two lines should be data name and indices as comments')
+        return second_line[1:].split(',')
+
+    def _read_sparse(self):
+        with open(self.file, 'r', newline='') as dat_file:
+            self._keys = self._read_header(dat_file)
+            raw_columns = [[] for _ in self._keys]
+            appends = [column.append for column in raw_columns]
+            n_columns = len(self._keys)
+            for line_number, row in enumerate(csv.reader(dat_file), 3):
+                if not row:
+                    continue
+                if len(row) != n_columns:
+                    raise ValueError(f'File {str(self.file)} line {line_number}: {len(row)} values instead of {n_columns}.')
+                for append, item in zip(appends, row):
+                    append(item)
+        self._columns = self._typed_columns(self._keys, raw_columns)
+
+    def _typed_columns(self, keys: list, columns: list) -> dict:
+        # only the value column of a vector is typed, the index labels are kept as str
+        n_indices = len(keys) - 1 if self._data_type == 'vector_sparse' else len(keys)
+        return {key: _label_column(column) if i < n_indices else _typed_column(column)
+                for i, (key, column) in enumerate(zip(keys, columns))}
 
     @property
     def file(self) -> Path:
         return self.parse_filename()
 
+    @property
+    def columns(self) -> dict:
+        """{key: column} of sparse data"""
+        self._load()
+        return self._columns
+
+    @property
+    def value(self):
+        """Scalar value or {key: column} of sparse data, accepted by set()"""
+        self._load()
+        if self._data_type == 'scalar':
+            return self._value
+        return dict(self._columns)
+
+    @property
+    def is_scalar(self) -> bool:
+        return self._data_type == 'scalar'
+
     def parse_filename(self, filename_prefix: str = None, out_folder: Path = None) -> Path:
         if filename_prefix is None:
             filename_prefix = self._filename_prefix
@@ -46,51 +155,121 @@ class _DataItem():
         else:
             return (out_folder / Path(filename_prefix + self._name)).with_suffix('.dat')
 
-    def set(self, new_value):
-        # Will change the data file if necessary
-        # The model should be reloaded after data is changed!
-        self._value = new_value
-        self.export()
+    def set(self, new_value, write: bool = True):
+        """Sets the new value and writes it to the data file. The model should be reloaded after data is changed!
 
-    def export(self, filename_prefix: str = None, out_folder: Path = None) -> None:
-        if filename_prefix is None:
-            filename_prefix = self._filename_prefix
-        if out_folder is None:
-            out_folder = self._model._file.parent
-        data = ''
-        # load and modify the data from the current data file
+        write=False leaves the writing of the scalar value to the caller, see MplWithExtData.set_ext_data()
+
+        new_value of sparse data is one of:
+            list of dicts [{index_1: ..., ...index_n: ..., value: ...}, ...]
+            dict of columns {index_1: [...], ...index_n: [...], value: [...]}, e.g., dict of NumPy arrays or pandas.DataFrame
+            2-D array with the columns in the order of the data file
+        """
         if self._data_type == 'scalar':
-            with open(self.parse_filename(), 'r') as dat_file:
-                data = dat_file.readlines()
-                data_starts_from = data.index('!' + self._name + '\n')
-                del data[data_starts_from + 1]  # delete the next row with data (we will write it now)
-                data[data_starts_from] = str(self)
-        elif self._data_type == 'vector_sparse' or self._data_type == 'index_sparse':  # but for sparse vector we write the whole new file
-            data = str(self)
-
-        # and write to the new file
-        with open(self.parse_filename(filename_prefix, out_folder), 'w') as dat_file:
-            dat_file.writelines(data)
+            self._value = new_value
+            if write:
+                self._scalar_data.set({self._name: new_value})
+        else:
+            self._set_columns(new_value)
+            with open(self.file, 'w') as dat_file:
+                self._write_sparse(dat_file)
+            self._file_stamp = _stamp(self.file)
+
+    def _set_columns(self, new_value):
+        if self._file_stamp is None: # the old data is replaced, the column names are enough
+            with open(self.file, 'r', newline='') as dat_file:
+                self._keys = self._read_header(dat_file)
+        if hasattr(new_value, 'columns') and not isinstance(new_value, dict): # DataFrame-like
+            new_value = {key: new_value[key] for key in new_value.columns}
+        if isinstance(new_value, dict):
+            keys = list(new_value.keys())
+            columns = [new_value[key] for key in keys]
+        elif hasattr(new_value, 'ndim') and new_value.ndim == 2: # NumPy array
+            keys = self._keys
+            columns = [new_value[:, i] for i in range(new_value.shape[1])]
+        else: # list of records
+            keys = list(new_value[0].keys()) if len(new_value) else self._keys
+            columns = [[record[key] for record in new_value] for key in keys]
+        if len(keys) != len(self._keys):
+            raise ValueError(f'{self._name} should have the columns: {", ".join(self._keys)}')
+        if len(set(map(len, columns))) > 1:
+            raise ValueError(f'{self._name}: the columns should have the same length.')
+        self._keys = keys
+        self._columns = self._typed_columns(keys, columns)
+
+    def export(self, filename_prefix: str = None, out_folder: Path = None) -> Path:
+        """Copies the data file as the data file of the model filename_prefix in out_folder"""
+        out_file = self.parse_filename(filename_prefix, out_folder)
+        if out_file.absolute() != self.file.absolute():
+            shutil.copyfile(self.file, out_file)
+        return out_file
+
+    def _write_sparse(self, out):
+        '''
+        !name
+        !index_1,...index_n,value
+        1,1
+        '''
+        out.write('!{}\n!{}\n'.format(self._name, ','.join(self._keys)))
+        columns = [self._columns[key] for key in self._keys]
+        n_rows = len(columns[0]) if columns else 0
+        for start in range(0, n_rows, _DataItem.ROWS_PER_WRITE):
+            end = min(start + _DataItem.ROWS_PER_WRITE, n_rows)
+            formatted = [_format_column(column[start:end]) for column in columns]
+            if start:
+                out.write('\n')
+            out.write('\n'.join(map(','.join, zip(*formatted))))
 
     def __str__(self):
+        self._load()
         if self._data_type == 'scalar':
             return str('!{}\n{}\n'.format(self._name, self._value))
         elif self._data_type == 'vector_sparse' or self._data_type == 'index_sparse':
-            '''
-            !
-            1, 1\n
-            '''
-            keys = self._value[0].keys()
-            first_two_lines = '!{}\n!{}\n'.format(self._name, ','.join(keys))
-            data_lines = ''
-            i = len(self._value)
-            for record in self._value:
-                next_line = ','.join([str(record[key]) for key in keys])
-                if i > 1: # we are not on the last element
-                    next_line += '\n'
-                    i -= 1
-                data_lines += next_line
-            return first_two_lines + data_lines
+            out = io.StringIO()
+            self._write_sparse(out)
+            return out.getvalue()
+
+
+def _stamp(file: Path):
+    # (mtime, size) tells whether the file has been changed since it was parsed
+    stat = file.stat()
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _typed_column(column):
+    # array('q') for integers, array('d') for numbers, list of str otherwise
+    if hasattr(column, 'dtype') and column.dtype.kind in 'iub':
+        return array('q', column.astype('int64').tobytes())
+    if hasattr(column, 'dtype') and column.dtype.kind == 'f':
+        return array('d', column.astype('float64').tobytes())
+    try:
+        return array('q', map(_strict_int, column))
+    except (ValueError, TypeError, OverflowError):
+        pass
+    try:
+        return array('d', map(float, column))
+    except (ValueError, TypeError):
+        return [str(item) for item in column]
+
+
+def _label_column(column):
+    # index labels: str as is, numbers of NumPy columns (e.g., of a 2-D array) like the values, e.g., 1.0 -> '1'
+    if hasattr(column, 'dtype') and column.dtype.kind in 'iubf':
+        return _format_column(_typed_column(column))
+    return [str(item) for item in column]
+
+
+def _strict_int(item):
+    # int() would truncate 0.25 to 0
+    if isinstance(item, float) and not item.is_integer():
+        raise ValueError(f'{item} is not integer')
+    return int(item)
+
+
+def _format_column(column):
+    if isinstance(column, array) and column.typecode == 'd':
+        return [str(int(value)) if value.is_integer() else repr(value) for value in column]
+    return list(map(str, column))
 
 
 class MplWithExtData(Model):
@@ -105,26 +284,43 @@ class MplWithExtData(Model):
 
     Methods
     -------
-    set_ext_data(new_data_dict)
+    set_ext_data(new_data_dict, reload=False)
         changes the data in .dat files according to the new_data_dict
+    ext_data_files()
+        returns {data_item_name: .dat file} of the external data
 
     Private Attributes
     -------
     _external_data : list
         list of _DataItem instances
+    _scalar_data : _ScalarData
+        data constants of the .dat file shared by the scalar _DataItem instances, None if there is no such file
+    _formulation : str
+        contents of the .mpl file, read once
+    _needs_reload : bool
+        True if the data was changed after the MPL model was loaded
 
     Private Methods
     -------
     _populate_ext_data
         fills _external_data attribute with _DataItem instances
+    _reparse()
+        parses _formulation with the current data into the MPL model of the instance
+    _formulation_with_data()
+        _formulation with the values of the scalars in place of their DATAFILE() references
     """
 
     STR_SCALAR_DATA_TYPE_SUFFIX = 'ScalarData' # file_STR_SCALAR_DATA_TYPE_SUFFIX.dat
 
     def __init__(self, file: Path):
+        if isinstance(file, _InMemory): # from_string(): the .dat files are relative to the .mpl file
+            raise RuntimeError('mpl model with external data should be read from .mpl file')
+        self._needs_reload = False
+        self._scalar_data = None
         super().__init__(file)
-        if self.format != 'mpl':
+        if self.format != 'mpl' or self.compression is not None:
             raise RuntimeError('mpl model with external data should be read from .mpl file')
+        self._formulation = self._file.read_text()
         self._external_data = self._populate_ext_data()
 
     def _populate_ext_data(self):
@@ -132,19 +328,19 @@ class MplWithExtData(Model):
         data_type = 'scalar'
         dat_file_prefix = self._file.stem + '_'
         # we assume that .dat files or in the same folder as the .mpl file
-        dat_file_path = Path(self._mpl_model.WorkingDirectory) / f'{dat_file_prefix}{MplWithExtData.STR_SCALAR_DATA_TYPE_SUFFIX}.dat'
+        dat_file_path = self._file.parent / f'{dat_file_prefix}{MplWithExtData.STR_SCALAR_DATA_TYPE_SUFFIX}.dat'
         data_items_in_file = []
         if dat_file_path.is_file(): # if data file exists
-            with open(str(dat_file_path), 'r') as dat_file:
-                # !Demand -> Demand
-                data_items_in_file = [line.strip()[1:] for line in dat_file if line.startswith('!')]
+            self._scalar_data = _ScalarData(dat_file_path)
+            # !Demand -> Demand
+            data_items_in_file = self._scalar_data.names
 
         for constant in self._mpl_model.DataConstants:
             # check whether data is taken from the data file edited according to requirement.
             name = constant.Name
             if name not in data_items_in_file:
                 continue
-            data_item = _DataItem(self, name, data_type, self._file.stem + '_')
+            data_item = _DataItem(self, name, data_type, self._file.stem + '_', self._scalar_data)
             data_list[name] = data_item
 
         for string in self._mpl_model.DataStrings:
@@ -177,30 +373,81 @@ class MplWithExtData(Model):
 
         return data_list
 
-    def set_ext_data(self, new_data_dict):
-        """Updates the data in the .dat files (if any) and reparses the model to include this data.
+    def set_ext_data(self, new_data_dict, reload: bool = False):
+        """Updates the data in the .dat files (if any). The model is reparsed to include this data
+        on the next solve() or export() to a format other than .mpl, so several changes in a row
+        and exports of .mpl instances cost only the .dat writes. The reparse takes the formulation from memory
+        with the scalar values inlined and reuses the MPL model, only the sparse .dat files are read from disk.
 
         Parameters
         ----------
         new_data_dict : dict
             {data_item_name: new_value}
+        reload : bool
+            reparse the model immediately
 
         Returns
         -------
         None
         """
 
+        new_scalars = {}
         for data_item_name, new_value in new_data_dict.items():
             data_item = self._external_data.get(data_item_name)
             if data_item is None:
                 raise ValueError(f'{data_item_name} is unknown data item. Check the name provided.')
-            data_item.set(new_value)
-        # we need to reload the model with updated data file
-        old_file = self._file
-        self._file = None # we can read the file only once. Do this to overcome the issue
-        self._read_file(old_file)
+            if data_item.is_scalar:
+                data_item.set(new_value, write=False)
+                new_scalars[data_item_name] = new_value
+            else:
+                data_item.set(new_value)
+        if new_scalars: # all scalars are written at once
+            self._scalar_data.set(new_scalars)
+        self._needs_reload = True
+        if reload:
+            self._ensure_loaded()
+
+    def ext_data_files(self) -> dict:
+        """Returns {data_item_name: .dat file} of the external data, the scalars share one file"""
+        return {name: data_item.file for name, data_item in self._external_data.items()}
+
+    def _ensure_loaded(self):
+        super()._ensure_loaded()
+        if not self._needs_reload:
+            return
+        self._reparse()
+        self._needs_reload = False # only after the successful reparse, a failed one is retried on the next use
+
+    def _formulation_with_data(self) -> str:
+        # _formulation with DATAFILE() of the scalars replaced by their values, e.g., NrOfScen := 1;
+        # every reference to the scalar file is replaced, MPL reads the next value of the file for each of them
+        if self._scalar_data is None:
+            return self._formulation
+        values = iter(self._scalar_data.values)
+
+        def value(match):
+            if Path(match.group(1)).name != self._scalar_data.file.name:
+                return match.group(0)
+            return next(values)
+
+        return re.sub(r'DATAFILE\s*\(\s*"([^"]*)"\s*\)', value, self._formulation)
+
+    def _reparse(self):
+        # the formulation is taken from memory, the engine reads only the sparse .dat files;
+        # the MPL model is reused and the file is not checked for the SMPS sections again
+        formulation = self._formulation_with_data()
+        try:
+            with self._profile.stage('read'), _engine_guard(): # ParseModel() changes the cwd
+                self._mpl_model.WorkingDirectory = str(self._file.parent).replace('\\', '//') # .dat files are relative to the .mpl file
+                self._mpl_model.ParseModel(formulation)
+        except optconvert.model.ModelResultException as e:
+            raise RuntimeError(e)
+        self._bin_vars = None
+        self._solution_arrays = None
+        self._solution = None
+        self._is_stochastic = bool(self._mpl_model.Matrix.ConStageCount)
 
-    def export(self, file: Path = None):
+    def export(self, file: Path = None, compress: bool = False):
         if file == None:
             format = self.format
             name = self._file.stem
@@ -208,14 +455,18 @@ class MplWithExtData(Model):
             format = file.suffix[1:]
             name = file.stem
 
-        if format == 'mpl':
-            model_formulation = self._file.read_text()
+        if format == 'mpl': # the MPL model is not needed, it is not reloaded after set_ext_data()
+            model_formulation = self._formulation
             # update links in the model formulation
             model_formulation = model_formulation.replace(self._file.stem, name)
             file.write_text(model_formulation)
+            exported_files = [file]
             # export .dat files
             for data_item in self._external_data.values():
                 dat_filename_prefix = name+'_'
-                data_item.export(dat_filename_prefix, file.parent)
+                if data_item.parse_filename(dat_filename_prefix, file.parent) in exported_files: # scalars share one file
+                    continue
+                exported_files.append(data_item.export(dat_filename_prefix, file.parent))
+            return exported_files
         else:
-            super().export(file)
+            return super().export(file, compress)
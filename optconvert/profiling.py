@@ -0,0 +1,134 @@
+from pathlib import Path
+from contextlib import contextmanager
+from typing import NamedTuple
+import json
+import time
+
+
+class StageRecord(NamedTuple):
+    """Measurements of one stage of the conversion"""
+    stage: str
+    seconds: float
+    bytes_read: int
+    bytes_written: int
+    peak_memory: int # peak of the memory traced by tracemalloc in bytes, None if the memory is not traced
+
+
+class Profile:
+    """
+    Report of the time, file sizes and memory of the conversion stages.
+
+    Pass the profile to Model or Converter and every stage of the work (reading, parsing, stochastic detection,
+    writing, post-processing) is appended to records. Stages of Model: decompress, parse_lp, read, detect_stochastic,
+    write, fix_lp_binaries, compress, mps2three. Stages of Converter: cache_lookup, cache_store, native_read, native_write.
+
+    Peak memory is the peak of the Python allocations (tracemalloc) during the stage, so the memory
+    allocated by the MPL engine itself is not included. On Python < 3.9 it is the peak since the tracing started.
+
+    Attributes
+    ----------
+    memory : bool
+        trace the peak memory (slows down the conversion)
+    records : list
+        StageRecord of every finished stage in the order of completion
+
+    Methods
+    -------
+    stage(name, read=())
+        context manager that measures the stage
+    to_dict(**extra)
+        the report as dict
+    to_json(**extra)
+        the report as a JSON line
+
+    Examples
+    -------
+    from optconvert import Converter, Profile
+
+    profile = Profile(memory=True)
+    Converter('Dakota_det.lp', 'mps', profile=profile).run()
+    for record in profile.records:
+        print(record.stage, record.seconds)
+    """
+
+    def __init__(self, memory: bool = False):
+        self.memory = memory
+        self.records = []
+        self._open_peaks = [] # peak memory of the open (outer) stages so far
+        self._depth = 0 # number of the open stages
+        self._top_level_seconds = 0.0 # the nested stages are part of their outer stage
+
+    @contextmanager
+    def stage(self, name: str, read=()):
+        """Measures the stage. read are the files read in the stage or the numbers of bytes read, e.g., of a partial scan,
+        the list may be appended to in the stage; append the written files to the yielded list."""
+        written = []
+        if self.memory:
+            import tracemalloc # imported here to keep the import of optconvert fast
+        start_tracing = self.memory and not tracemalloc.is_tracing()
+        if start_tracing:
+            tracemalloc.start()
+        if self.memory:
+            self._enter_peak()
+        self._depth += 1
+        start = time.perf_counter()
+        try:
+            yield written
+        finally:
+            seconds = time.perf_counter() - start
+            self._depth -= 1
+            if not self._depth:
+                self._top_level_seconds += seconds
+            peak_memory = self._exit_peak() if self.memory else None
+            if start_tracing:
+                tracemalloc.stop()
+            self.records.append(StageRecord(name, seconds, _size(read), _size(written), peak_memory))
+
+    def _enter_peak(self):
+        # the peak is reset for the new stage, the outer stages keep the peak reached so far
+        import tracemalloc
+        peak = tracemalloc.get_traced_memory()[1]
+        self._open_peaks = [max(open_peak, peak) for open_peak in self._open_peaks]
+        if hasattr(tracemalloc, 'reset_peak'): # Python 3.9+
+            tracemalloc.reset_peak()
+        self._open_peaks.append(0)
+
+    def _exit_peak(self):
+        import tracemalloc
+        return max(self._open_peaks.pop(), tracemalloc.get_traced_memory()[1])
+
+    @property
+    def total_seconds(self) -> float:
+        """Seconds of the top-level stages, the nested stages are not counted twice"""
+        return self._top_level_seconds
+
+    def to_dict(self, **extra) -> dict:
+        """Returns {**extra, 'total_seconds': ..., 'stages': [{stage, seconds, ...}, ...]}"""
+        return {**extra, 'total_seconds': self.total_seconds, 'stages': [record._asdict() for record in self.records]}
+
+    def to_json(self, **extra) -> str:
+        return json.dumps(self.to_dict(**extra))
+
+    def __str__(self):
+        lines = []
+        for record in self.records:
+            peak = '' if record.peak_memory is None else f' {record.peak_memory / 1024 ** 2:.1f} MiB'
+            lines.append(f'{record.stage}: {record.seconds:.3f} s, read {record.bytes_read} B, written {record.bytes_written} B{peak}')
+        return '\n'.join(lines)
+
+
+class _NoProfile:
+    # used when the profile is not requested, the stages are not measured
+
+    @contextmanager
+    def stage(self, name: str, read=()):
+        yield []
+
+
+NO_PROFILE = _NoProfile()
+
+
+def _size(files) -> int:
+    # files or numbers of bytes
+    return sum(file if isinstance(file, int) else Path(file).stat().st_size
+               for file in files if isinstance(file, int) or Path(file).is_file())
@@ -0,0 +1,768 @@
+from array import array
+from contextlib import contextmanager
+from pathlib import Path
+import math
+import re
+from optconvert import Messages, Numbers
+from optconvert.compression import split_name, open_file
+
+INF = math.inf
+
+
+class SparseModel:
+    """
+    Engine-free representation of a linear (mixed-integer) model.
+
+    The constraint matrix is stored column-wise (compressed sparse column) in typed arrays:
+    for column j its nonzeros are row_indices[col_starts[j]:col_starts[j + 1]] with coefficients
+    values[col_starts[j]:col_starts[j + 1]]. Per-row and per-column data is kept in parallel arrays as well,
+    so a nonzero costs 16 bytes instead of a dict entry.
+
+    Attributes
+    ----------
+    name : str
+        model name (NAME section in .mps)
+    sense : str
+        MIN or MAX
+    obj_name : str
+        name of the objective row
+    obj_constant : float
+        constant term of the objective
+    row_names : list
+        constraint names
+    row_senses : list
+        constraint senses: L, G or E
+    rhs : array
+        right-hand sides of the constraints
+    ranges : array
+        RANGES values of the constraints, nan if the constraint has no range
+    col_names : list
+        variable names
+    objective : array
+        objective coefficients of the variables
+    col_starts, row_indices, values : array
+        constraint matrix in compressed sparse column form
+    lower, upper : array
+        variable bounds, +-inf for unbounded
+    is_integer : bytearray
+        1 for integer (incl. binary) variables
+    is_stochastic : bool
+        True if read_mps() stopped at SMPS sections (TIME, STOCH) of the file
+
+    Methods
+    -------
+    read_mps(file, fixed=False)
+        reads the model from fixed or free .mps file
+    read_lp(file)
+        reads the model from .lp file (CPLEX format)
+    write_mps(file, as_min=True)
+        writes the model to .mps file
+    write_lp(file)
+        writes the model to .lp file (CPLEX format)
+
+    Examples
+    -------
+    from optconvert.sparse_model import SparseModel
+    from pathlib import Path
+
+    model = SparseModel.read_mps(Path('Dakota_det.mps'))
+    model.write_lp(Path('Dakota_det.lp'))
+    """
+
+    supported_in_formats = ['mps', 'lp']
+    supported_out_formats = ['mps', 'lp']
+
+    def __init__(self, name: str = ''):
+        self.name = name
+        self.sense = 'MIN'
+        self.obj_name = 'obj'
+        self.obj_constant = 0.0
+        self.row_names = []
+        self.row_senses = []
+        self.rhs = array('d')
+        self.ranges = array('d')
+        self.col_names = []
+        self.objective = array('d')
+        self.col_starts = array('q', [0])
+        self.row_indices = array('q')
+        self.values = array('d')
+        self.lower = array('d')
+        self.upper = array('d')
+        self.is_integer = bytearray()
+        self.is_stochastic = False  # True if the .mps file has SMPS sections, these are not read
+
+    @property
+    def n_rows(self):
+        return len(self.row_names)
+
+    @property
+    def n_cols(self):
+        return len(self.col_names)
+
+    @property
+    def n_nonzeros(self):
+        return len(self.values)
+
+    def add_row(self, name: str, sense: str):
+        self.row_names.append(name)
+        self.row_senses.append(sense)
+        self.rhs.append(0.0)
+        self.ranges.append(math.nan)
+        return len(self.row_names) - 1
+
+    def add_col(self, name: str, is_integer: bool = False):
+        """Starts a new column. Nonzeros of the column are appended with add_nonzero() until the next add_col()."""
+        self.col_names.append(name)
+        self.objective.append(0.0)
+        self.lower.append(0.0)
+        self.upper.append(INF)
+        self.is_integer.append(1 if is_integer else 0)
+        if len(self.col_names) > 1:
+            self.col_starts.append(len(self.values))
+        return len(self.col_names) - 1
+
+    def add_nonzero(self, row: int, value: float):
+        self.row_indices.append(row)
+        self.values.append(value)
+
+    def row_major(self):
+        """Returns the constraint matrix in compressed sparse row form: (row_starts, col_indices, values)."""
+        n_rows = self.n_rows
+        row_starts = array('q', bytes(8 * (n_rows + 1)))
+        for row in self.row_indices:
+            row_starts[row + 1] += 1
+        for i in range(n_rows):
+            row_starts[i + 1] += row_starts[i]
+        next_position = array('q', row_starts[:-1])
+        col_indices = array('q', bytes(8 * self.n_nonzeros))
+        values = array('d', bytes(8 * self.n_nonzeros))
+        for j in range(self.n_cols):
+            for k in range(self.col_starts[j], self._col_end(j)):
+                row = self.row_indices[k]
+                position = next_position[row]
+                col_indices[position] = j
+                values[position] = self.values[k]
+                next_position[row] = position + 1
+        return row_starts, col_indices, values
+
+    def _col_end(self, j):
+        return self.col_starts[j + 1] if j + 1 < len(self.col_starts) else len(self.values)
+
+    def _is_binary(self, j):
+        return self.is_integer[j] and self.lower[j] == 0 and self.upper[j] == 1
+
+    @classmethod
+    def read_mps(cls, file: Path, fixed: bool = False):
+        """Reads the model from .mps file.
+
+        Supports ROWS, COLUMNS (incl. MARKER integer sections), RHS, RANGES, BOUNDS and OBJSENSE sections.
+        Reading stops at ENDATA or at the first SMPS section (TIME, STOCH); in the latter case
+        is_stochastic of the returned model is True.
+
+        Parameters
+        ----------
+        file : Path or text stream
+            .mps file (may be compressed: .mps.gz, .mps.xz, .mps.zst) or a file-like object with its contents
+        fixed : bool
+            True for fixed MPS: fields are taken from the fixed positions and names may contain spaces
+
+        Returns
+        -------
+        SparseModel
+        """
+
+        if isinstance(file, Path) and not file.is_file():
+            raise FileNotFoundError(Messages.MSG_INSTANCE_FILE_NOT_FOUND)
+
+        model = cls(split_name(file)[0] if isinstance(file, Path) else '')
+        rows = {}  # row name: row index, -1 for the objective, -2 for the other free rows
+        cols = {}  # col name: col index
+        section = None
+        objective_found = False
+        integer_section = False
+
+        with _open(file, 'r') as mps_file:
+            for line in mps_file:
+                line = line.rstrip('\r\n')
+                if not line.strip() or line[0] == '*':
+                    continue
+
+                if not line[0].isspace():  # section header
+                    fields = line.split()
+                    section = fields[0].upper()
+                    if section == 'NAME':
+                        model.name = line[4:].strip()
+                    elif section == 'OBJSENSE' and len(fields) > 1:
+                        model.sense = 'MAX' if fields[1].upper().startswith('MAX') else 'MIN'
+                    elif section == 'ENDATA':
+                        break
+                    elif section in ['TIME', 'STOCH', 'SCENARIOS']:
+                        model.is_stochastic = True
+                        break
+                    elif section not in ['ROWS', 'COLUMNS', 'RHS', 'RANGES', 'BOUNDS', 'OBJSENSE']:
+                        raise ValueError(f'File {str(file)}: section {section} is not supported.')
+                    continue
+
+                if section == 'COLUMNS' and "'MARKER'" in line:
+                    integer_section = "'INTORG'" in line
+                    continue
+
+                fields = cls._split_fixed(line) if fixed else line.split()
+
+                if section == 'ROWS':
+                    sense, name = fields[0].upper(), fields[1]
+                    if sense == 'N' and objective_found:
+                        rows[name] = -2
+                    elif sense == 'N':
+                        model.obj_name = name
+                        rows[name] = -1
+                        objective_found = True
+                    elif sense in ['L', 'G', 'E']:
+                        rows[name] = model.add_row(name, sense)
+                    else:
+                        raise ValueError(f'File {str(file)}: unknown row type {sense} of row {name}.')
+
+                elif section == 'COLUMNS':
+                    name = fields[0]
+                    j = cols.get(name)
+                    if j is None:
+                        j = model.add_col(name, integer_section)
+                        cols[name] = j
+                    elif j != model.n_cols - 1:
+                        raise ValueError(f'File {str(file)}: entries of column {name} are not contiguous.')
+                    for row_name, value in zip(fields[1::2], fields[2::2]):
+                        row, value = cls._row(rows, row_name, file), float(value)
+                        if row == -1:
+                            model.objective[j] = value
+                        elif row >= 0:
+                            model.add_nonzero(row, value)
+
+                elif section in ['RHS', 'RANGES']:
+                    pairs = fields[1:] if len(fields) % 2 else fields  # set name is optional in free MPS
+                    for row_name, value in zip(pairs[0::2], pairs[1::2]):
+                        row, value = cls._row(rows, row_name, file), float(value)
+                        if section == 'RHS' and row == -1:
+                            model.obj_constant = -value
+                        elif section == 'RHS' and row >= 0:
+                            model.rhs[row] = value
+                        elif row >= 0:
+                            model.ranges[row] = value
+
+                elif section == 'BOUNDS':
+                    model._read_bound(fields, cols)
+
+                elif section == 'OBJSENSE':
+                    model.sense = 'MAX' if fields[0].upper().startswith('MAX') else 'MIN'
+
+        return model
+
+    @classmethod
+    def read_lp(cls, file: Path):
+        """Reads the model from .lp file (CPLEX format).
+
+        Supports objective, constraints (one sense per constraint), BOUNDS, GENERAL and BINARY sections.
+        Constraints without a name are named c1, c2, ... by their position, like Model._parse_lp() does.
+
+        Parameters
+        ----------
+        file : Path or text stream
+            .lp file (may be compressed: .lp.gz, .lp.xz, .lp.zst) or a file-like object with its contents
+
+        Returns
+        -------
+        SparseModel
+        """
+
+        if isinstance(file, Path) and not file.is_file():
+            raise FileNotFoundError(Messages.MSG_INSTANCE_FILE_NOT_FOUND)
+
+        model = cls(split_name(file)[0] if isinstance(file, Path) else '')
+        with _open(file, 'r') as lp_file:
+            _LpReader(model, str(file)).read(lp_file)
+        return model
+
+    @staticmethod
+    def _row(rows: dict, name: str, file) -> int:
+        row = rows.get(name)
+        if row is None:
+            raise ValueError(f'File {str(file)}: row {name} is not defined in ROWS.')
+        return row
+
+    def _read_bound(self, fields, cols):
+        bound_type = fields[0].upper()
+        # bound set name is optional in free MPS, value is optional for FR, MI, PL, BV
+        if bound_type in ['FR', 'MI', 'PL', 'BV'] and fields[-1] in cols:
+            col_name, value = fields[-1], None
+        else:
+            col_name, value = fields[-2], float(fields[-1])
+        j = cols[col_name]
+
+        if bound_type == 'UP':
+            if value < 0 and self.lower[j] == 0:
+                self.lower[j] = -INF
+            self.upper[j] = value
+        elif bound_type == 'LO':
+            self.lower[j] = value
+        elif bound_type == 'FX':
+            self.lower[j] = self.upper[j] = value
+        elif bound_type == 'FR':
+            self.lower[j], self.upper[j] = -INF, INF
+        elif bound_type == 'MI':
+            self.lower[j] = -INF
+        elif bound_type == 'PL':
+            self.upper[j] = INF
+        elif bound_type == 'BV':
+            self.lower[j], self.upper[j] = 0.0, 1.0
+            self.is_integer[j] = 1
+        elif bound_type == 'LI':
+            self.lower[j] = value
+            self.is_integer[j] = 1
+        elif bound_type == 'UI':
+            self.upper[j] = value
+            self.is_integer[j] = 1
+        else:
+            raise ValueError(f'Bound type {bound_type} of column {col_name} is not supported.')
+
+    @staticmethod
+    def _split_fixed(line):
+        # fields of fixed MPS: 2-3, 5-12, 15-22, 25-36, 40-47, 50-61
+        fields = [line[1:3], line[4:12], line[14:22], line[24:36], line[39:47], line[49:61]]
+        return [field.strip() for field in fields if field.strip()]
+
+    def write_mps(self, file: Path, as_min: bool = True):
+        """Writes the model to .mps file.
+
+        Integer variables are written with UI / LI / BV bounds instead of integer markers,
+        like the MPL engine does (see MpsIntMarkers, MpsDefUIBound options in model.py).
+
+        Parameters
+        ----------
+        file : Path or text stream
+            the output file, compressed if its name ends with .gz, .xz or .zst, or a file-like object to write to
+        as_min : bool
+            transform MAX objective to MIN (like MpsCreateAsMin option of MPL)
+
+        Returns
+        -------
+        None
+        """
+
+        negate = as_min and self.sense == 'MAX'
+        with _open(file, 'w') as out:
+            out.write(f'NAME          {self.name}\n')
+            if self.sense == 'MAX' and not as_min:
+                out.write('OBJSENSE\n    MAX\n')
+            out.write(f'ROWS\n N  {self.obj_name}\n')
+            for name, sense in zip(self.row_names, self.row_senses):
+                out.write(f' {sense}  {name}\n')
+
+            out.write('COLUMNS\n')
+            for j, col_name in enumerate(self.col_names):
+                obj_coef = -self.objective[j] if negate else self.objective[j]
+                if obj_coef:
+                    out.write(f'    {col_name:<8}  {self.obj_name:<8}  {_num(obj_coef):>12}\n')
+                for k in range(self.col_starts[j], self._col_end(j)):
+                    out.write(f'    {col_name:<8}  {self.row_names[self.row_indices[k]]:<8}  {_num(self.values[k]):>12}\n')
+
+            out.write('RHS\n')
+            obj_constant = -self.obj_constant if negate else self.obj_constant
+            if obj_constant:
+                out.write(f'    RHS1      {self.obj_name:<8}  {_num(-obj_constant):>12}\n')
+            for name, value in zip(self.row_names, self.rhs):
+                if value:
+                    out.write(f'    RHS1      {name:<8}  {_num(value):>12}\n')
+
+            if any(not math.isnan(value) for value in self.ranges):
+                out.write('RANGES\n')
+                for name, value in zip(self.row_names, self.ranges):
+                    if not math.isnan(value):
+                        out.write(f'    RNG1      {name:<8}  {_num(value):>12}\n')
+
+            out.write('BOUNDS\n')
+            for j, col_name in enumerate(self.col_names):
+                for bound_type, value in self._mps_bounds(j):
+                    value = '' if value is None else f'  {_num(value):>12}'
+                    out.write(f' {bound_type} BOUND1    {col_name:<8}{value}\n')
+            out.write('ENDATA\n')
+
+    def _mps_bounds(self, j):
+        lower, upper = self.lower[j], self.upper[j]
+        if self._is_binary(j):
+            return [('BV', 1.0)]
+        if self.is_integer[j]:
+            bounds = [('UI', upper if upper != INF else float(Numbers.INT_BIG_NUMBER))]
+            if lower != 0:
+                bounds.insert(0, ('LI', lower) if lower != -INF else ('MI', None))
+            return bounds
+        if lower == upper:
+            return [('FX', lower)]
+        if lower == -INF and upper == INF:
+            return [('FR', None)]
+        bounds = []
+        if lower == -INF:
+            bounds.append(('MI', None))
+        elif lower != 0:
+            bounds.append(('LO', lower))
+        if upper != INF:
+            bounds.append(('UP', upper))
+        return bounds
+
+    def write_lp(self, file: Path):
+        """Writes the model to .lp file (CPLEX format).
+
+        Ranged constraints are written as two constraints: name (lower side) and name_rng (upper side).
+        Constraints without nonzeros are written with the zero coefficient of the first column, e.g., c2: 0 x >= 5.
+
+        Parameters
+        ----------
+        file : Path or text stream
+            the output file, compressed if its name ends with .gz, .xz or .zst, or a file-like object to write to
+
+        Returns
+        -------
+        None
+        """
+
+        with _open(file, 'w') as out:
+            out.write('MAXIMIZE\n' if self.sense == 'MAX' else 'MINIMIZE\n')
+            terms = [(self.objective[j], name) for j, name in enumerate(self.col_names) if self.objective[j]]
+            if self.obj_constant:
+                terms.append((self.obj_constant, ''))
+            _write_lp_expression(out, f'  {self.obj_name}:', terms, '')
+
+            out.write('\nSUBJECT TO\n')
+            row_starts, col_indices, values = self.row_major()
+            signs = {'L': '<=', 'G': '>=', 'E': '='}
+            for i, name in enumerate(self.row_names):
+                terms = [(values[k], self.col_names[col_indices[k]]) for k in range(row_starts[i], row_starts[i + 1])]
+                if not terms: # the row is kept, it may be infeasible
+                    if not self.col_names:
+                        raise ValueError(f'Constraint {name} has no nonzeros and the model has no columns.')
+                    terms = [(0.0, self.col_names[0])]
+                sense, rhs, rng = self.row_senses[i], self.rhs[i], self.ranges[i]
+                if math.isnan(rng):
+                    _write_lp_expression(out, f'  {name}:', terms, f'  {signs[sense]}  {_num(rhs)}')
+                    continue
+                if sense == 'E':
+                    low, up = (rhs, rhs + rng) if rng > 0 else (rhs + rng, rhs)
+                elif sense == 'L':
+                    low, up = rhs - abs(rng), rhs
+                else:
+                    low, up = rhs, rhs + abs(rng)
+                _write_lp_expression(out, f'  {name}:', terms, f'  >=  {_num(low)}')
+                _write_lp_expression(out, f'  {name}_rng:', terms, f'  <=  {_num(up)}')
+
+            out.write('\nBOUNDS\n')
+            for j, name in enumerate(self.col_names):
+                if self._is_binary(j):
+                    continue
+                lower, upper = self.lower[j], self.upper[j]
+                if lower == -INF and upper == INF:
+                    out.write(f'    {name} FREE\n')
+                elif upper == INF:
+                    if lower != 0:
+                        out.write(f'    {name} >= {_num(lower)}\n')
+                elif lower == 0:
+                    out.write(f'    {name} <= {_num(upper)}\n')
+                else:
+                    out.write(f'    {_num(lower)} <= {name} <= {_num(upper)}\n')
+
+            general = [name for j, name in enumerate(self.col_names) if self.is_integer[j] and not self._is_binary(j)]
+            if general:
+                out.write('\nGENERAL\n')
+                for name in general:
+                    out.write(f'    {name}\n')
+            binary = [name for j, name in enumerate(self.col_names) if self._is_binary(j)]
+            if binary:
+                out.write('\nBINARY\n')
+                for name in binary:
+                    out.write(f'    {name}\n')
+            out.write('\nEND\n')
+
+
+class _LpReader:
+    """
+    Reader of CPLEX .lp into SparseModel used by SparseModel.read_lp().
+
+    Every line is split into tokens with the precompiled TOKEN pattern and passed to the handler of the current section.
+    Nonzeros are collected row by row and sorted into compressed sparse columns at the end.
+
+    Private Methods
+    -------
+    _objective(tokens), _constraint(tokens), _bound(tokens), _general(tokens), _binary(tokens)
+        handlers of the sections
+    _term(kind, text)
+        adds the token to the linear expression being read
+    _to_columns()
+        fills the constraint matrix of the model
+    """
+
+    # lp section keyword: handler name
+    SECTIONS = {lp_block: section
+                for section, lp_blocks in {'_objective': ['MAXIMIZE', 'MAXIMUM', 'MAX', 'MINIMIZE', 'MINIMUM', 'MIN'],
+                                           '_constraint': ['SUBJECT TO', 'SUCH THAT', 'ST', 'S.T.', 'ST.'],
+                                           '_bound': ['BOUNDS', 'BOUND'],
+                                           '_general': ['GENERAL', 'GENERALS', 'GEN', 'INTEGERS'],
+                                           '_binary': ['BINARY', 'BINARIES', 'BIN'],
+                                           'END': ['END']}.items()
+                for lp_block in lp_blocks}
+    # sections of CPLEX .lp that are not supported, they would be read as a part of the previous section otherwise
+    UNSUPPORTED_SECTIONS = {'SEMI-CONTINUOUS', 'SEMI CONTINUOUS', 'SEMI', 'SEMIS', 'SOS', 'SOS1', 'SOS2', 'PWL', 'PWLOBJ',
+                            'USER CUTS', 'LAZY CONSTRAINTS', 'GENERAL INTEGER', 'QUADOBJ', 'QMATRIX', 'QCMATRIX'}
+    TOKEN = re.compile(r"""\s*(?:
+        (?P<label>[^\s:+\-<>=\d.\[\]*^][^\s:+\-<>=\[\]*^]*)\s*:
+        |(?P<sense><=|=<|>=|=>|<|>|=)
+        |(?P<sign>[+-])
+        |(?P<number>(?:\d+\.?\d*|\.\d+)(?:e[+-]?\d+)?|inf(?:inity)?(?![^\s:+\-<>=\[\]*^]))
+        |(?P<name>[^\s:+\-<>=\d.\[\]*^][^\s:+\-<>=\[\]*^]*)
+        |(?P<error>\S))""", flags=re.VERBOSE | re.IGNORECASE)
+    SENSES = {'<': 'L', '<=': 'L', '=<': 'L', '>': 'G', '>=': 'G', '=>': 'G', '=': 'E'}
+
+    def __init__(self, model: SparseModel, source: str):
+        self._model = model
+        self._source = source
+        self._cols = {} # col name: col index
+        self._n_constraints = 0
+        # nonzeros in the order of rows
+        self._nonzero_cols = array('q')
+        self._nonzero_rows = array('q')
+        self._nonzero_values = array('d')
+        self._reset_expression()
+
+    def _reset_expression(self):
+        self._label = None
+        self._terms = {} # col index: coefficient
+        self._constant = 0.0
+        self._sign = 1.0
+        self._coefficient = None # number waiting for its variable
+        self._sense = None
+        self._rhs_sign = 1.0
+
+    def read(self, lines):
+        handler = None
+        for line in lines:
+            line = line.split('\\', 1)[0] # comments
+            stripped = line.strip()
+            if not stripped:
+                continue
+            section = _LpReader.SECTIONS.get(stripped.upper())
+            if stripped.upper() in _LpReader.UNSUPPORTED_SECTIONS:
+                raise ValueError(f'File {self._source}: section {stripped} is not supported.')
+            if section is not None:
+                if handler == self._objective:
+                    self._end_objective()
+                if section == 'END':
+                    break
+                if section == '_objective':
+                    self._model.sense = 'MAX' if stripped.upper().startswith('MAX') else 'MIN'
+                handler = getattr(self, section)
+                continue
+            if handler is None:
+                raise ValueError(f'File {self._source}: {stripped} is outside of the sections.')
+            tokens = [(match.lastgroup, match.group(match.lastgroup)) for match in _LpReader.TOKEN.finditer(line)]
+            for kind, text in tokens:
+                if kind == 'error':
+                    raise ValueError(f'File {self._source}: {text} in {stripped} is not supported.')
+            handler(tokens)
+        else:
+            if handler == self._objective:
+                self._end_objective()
+        if self._terms or self._sense is not None:
+            raise ValueError(f'File {self._source}: the last constraint is incomplete.')
+        self._to_columns()
+
+    def _col(self, name: str) -> int:
+        j = self._cols.get(name)
+        if j is None:
+            j = self._model.add_col(name)
+            self._cols[name] = j
+        return j
+
+    def _term(self, kind: str, text: str):
+        if kind == 'label' and self._label is None and not self._terms and self._coefficient is None:
+            self._label = text
+        elif kind == 'sign':
+            self._flush_constant()
+            if text == '-':
+                self._sign = -self._sign
+        elif kind == 'number':
+            self._coefficient = _lp_number(text) if self._coefficient is None else self._coefficient * _lp_number(text)
+        elif kind == 'name':
+            j = self._col(text)
+            coefficient = self._sign * (1.0 if self._coefficient is None else self._coefficient)
+            self._terms[j] = self._terms.get(j, 0.0) + coefficient
+            self._sign, self._coefficient = 1.0, None
+        else:
+            raise ValueError(f'File {self._source}: unexpected {text}.')
+
+    def _flush_constant(self):
+        if self._coefficient is not None:
+            self._constant += self._sign * self._coefficient
+            self._sign, self._coefficient = 1.0, None
+
+    def _objective(self, tokens):
+        for kind, text in tokens:
+            self._term(kind, text)
+
+    def _end_objective(self):
+        self._flush_constant()
+        model = self._model
+        if self._label is not None:
+            model.obj_name = self._label
+        for j, coefficient in self._terms.items():
+            model.objective[j] = coefficient
+        model.obj_constant = self._constant
+        self._reset_expression()
+
+    def _constraint(self, tokens):
+        for kind, text in tokens:
+            if self._sense is None:
+                if kind == 'sense':
+                    self._flush_constant()
+                    self._sense = _LpReader.SENSES[text]
+                else:
+                    self._term(kind, text)
+            elif kind == 'sign':
+                self._rhs_sign = -self._rhs_sign if text == '-' else self._rhs_sign
+            elif kind == 'number':
+                self._add_row(self._rhs_sign * _lp_number(text))
+            else:
+                raise ValueError(f'File {self._source}: right-hand side should be a number, found {text}.')
+
+    def _add_row(self, rhs: float):
+        model = self._model
+        self._n_constraints += 1
+        name = self._label if self._label is not None else f'c{self._n_constraints}'
+        i = model.add_row(name, self._sense)
+        model.rhs[i] = rhs - self._constant
+        for j, coefficient in self._terms.items():
+            if coefficient:
+                self._nonzero_rows.append(i)
+                self._nonzero_cols.append(j)
+                self._nonzero_values.append(coefficient)
+        self._reset_expression()
+
+    def _bound(self, tokens):
+        # x free | x sense value | value sense x | value sense x sense value, value may be signed
+        items = []
+        sign = 1.0
+        for kind, text in tokens:
+            if kind == 'sign':
+                sign = -sign if text == '-' else sign
+            elif kind == 'number':
+                items.append(('number', sign * _lp_number(text)))
+                sign = 1.0
+            else:
+                items.append((kind, text))
+        kinds = [kind for kind, _ in items]
+        if kinds == ['name', 'name'] and items[1][1].upper() == 'FREE':
+            j = self._col(items[0][1])
+            self._model.lower[j], self._model.upper[j] = -INF, INF
+        elif kinds == ['name', 'sense', 'number']:
+            self._set_bound(self._col(items[0][1]), items[1][1], items[2][1])
+        elif kinds == ['number', 'sense', 'name']:
+            self._set_bound(self._col(items[2][1]), _LpReader._reversed(items[1][1]), items[0][1])
+        elif kinds == ['number', 'sense', 'name', 'sense', 'number']:
+            j = self._col(items[2][1])
+            self._set_bound(j, _LpReader._reversed(items[1][1]), items[0][1])
+            self._set_bound(j, items[3][1], items[4][1])
+        else:
+            raise ValueError(f'File {self._source}: bound {" ".join(str(item) for _, item in items)} is not supported.')
+
+    @staticmethod
+    def _reversed(sense: str) -> str:
+        # value <= x is x >= value
+        return {'L': '>=', 'G': '<=', 'E': '='}[_LpReader.SENSES[sense]]
+
+    def _set_bound(self, j: int, sense: str, value: float):
+        sense = _LpReader.SENSES[sense]
+        if sense in ['L', 'E']:
+            self._model.upper[j] = value
+        if sense in ['G', 'E']:
+            self._model.lower[j] = value
+
+    def _names(self, tokens, section: str):
+        # the lines of GENERAL and BINARY sections are variable names only
+        for kind, text in tokens:
+            if kind != 'name':
+                raise ValueError(f'File {self._source}: {text} in {section} section is not a variable name.')
+            yield text
+
+    def _general(self, tokens):
+        for name in self._names(tokens, 'GENERAL'):
+            self._model.is_integer[self._col(name)] = 1
+
+    def _binary(self, tokens):
+        model = self._model
+        for name in self._names(tokens, 'BINARY'):
+            j = self._col(name)
+            model.is_integer[j] = 1
+            model.lower[j], model.upper[j] = 0.0, 1.0
+
+    def _to_columns(self):
+        # counting sort of the nonzeros by column, rows stay in order within the column
+        model = self._model
+        n_cols = model.n_cols
+        col_starts = array('q', bytes(8 * (n_cols + 1)))
+        for j in self._nonzero_cols:
+            col_starts[j + 1] += 1
+        for j in range(n_cols):
+            col_starts[j + 1] += col_starts[j]
+        next_position = array('q', col_starts[:-1])
+        n_nonzeros = len(self._nonzero_values)
+        row_indices = array('q', bytes(8 * n_nonzeros))
+        values = array('d', bytes(8 * n_nonzeros))
+        for j, i, value in zip(self._nonzero_cols, self._nonzero_rows, self._nonzero_values):
+            position = next_position[j]
+            row_indices[position] = i
+            values[position] = value
+            next_position[j] = position + 1
+        model.col_starts = col_starts[:-1] if n_cols else array('q', [0])
+        model.row_indices = row_indices
+        model.values = values
+
+
+def _lp_number(text: str) -> float:
+    # 'inf' and 'infinity' are understood by float() as well
+    return float(text)
+
+
+@contextmanager
+def _open(file, mode: str):
+    # Path is opened (and decompressed / compressed according to its suffix, e.g., .mps.gz) and closed, a stream is used as is
+    if isinstance(file, Path):
+        with open_file(file, mode + 't') as f:
+            yield f
+    else:
+        yield file
+
+
+def _num(value: float) -> str:
+    if value == INF:
+        return '+inf'
+    if value == -INF:
+        return '-inf'
+    if value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+def _write_lp_expression(out, label: str, terms: list, tail: str, line_width: int = 72):
+    # lines are wrapped, continuation lines start with the sign of the next term
+    line = label
+    for coefficient, name in terms:
+        sign = '-' if coefficient < 0 else '+'
+        coefficient = abs(coefficient)
+        if not name:
+            term = f' {sign} {_num(coefficient)}'
+        elif coefficient == 1:
+            term = f' {sign} {name}'
+        else:
+            term = f' {sign} {_num(coefficient)} {name}'
+        if len(line) + len(term) > line_width and line != label:
+            out.write(line + '\n')
+            line = '    '
+        line += term
+    if line == label:
+        line += ' 0'
+    out.write(line + tail + '\n')
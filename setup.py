@@ -6,6 +6,7 @@ INSTALL_REQUIRES.append('scipy') # for mplpy
 INSTALL_REQUIRES.append('matplotlib') # for mplpy
 INSTALL_REQUIRES.append('wxPython') # for mplpy
 INSTALL_REQUIRES.append('mplpy') # for optconvert
+INSTALL_REQUIRES.append('numpy') # for optconvert
 INSTALL_REQUIRES.append('mplpy')
 
 version = '0.0.1'
@@ -0,0 +1,455 @@
+"""
+Benchmarks of the conversion stages on synthetic instances.
+
+Every stage is timed (best of repeat runs) and its peak Python memory is measured with tracemalloc in a separate run.
+Results are appended to a JSON lines file, one record per stage, so the results of two releases can be compared:
+
+    python benchmarks.py --rows 100000 --cols 100000 --out results_0.0.2.jsonl
+    python benchmarks.py --rows 100000 --cols 100000 --baseline results_0.0.2.jsonl
+
+The soak run converts many files in one process, reports the memory and the number of MPL models kept by the engine
+and fails (exit code 1) if they grow:
+
+    python benchmarks.py --soak 10000
+
+The speed check of the LP translation fails (exit code 1) if a 1 GB .lp file is translated slower than the minimum:
+
+    python benchmarks.py --lp-speed 1024 --min-lines-per-s 100000
+
+The memory check of the LP translation fails (exit code 1) if its peak Python memory is above the maximum,
+the translation streams the file, so the peak does not depend on the file size:
+
+    python benchmarks.py --lp-memory 1024 --max-lp-memory-mb 2
+
+The peak RSS of a new interpreter that translates the .lp file to a .mpl file (Unix only) fails (exit code 1)
+if it is above the maximum, it includes the interpreter itself:
+
+    python benchmarks.py --lp-rss 1024 --max-rss-mb 100
+
+The binary fix of the engine's .lp output fails (exit code 1) if the binaries are fixed slower than the maximum:
+
+    python benchmarks.py --lp-binaries 500000 --max-lp-binaries-s 10
+
+The round trip of a sparse .dat file (write and parse) fails (exit code 1) if it is slower than the maximum:
+
+    python benchmarks.py --dat-round-trip 5000000 --max-dat-round-trip-s 60
+
+The import check fails if import optconvert (without the engine) takes longer than the maximum:
+
+    python benchmarks.py --import-time --max-import-s 0.5
+
+If mplpy is not installed, the engine stages of the command line run against engine_stand_in. The import of the module
+(e.g., by the unit tests) does not change the engine.
+"""
+
+from pathlib import Path
+import argparse
+import gc
+import json
+import math
+import platform
+import random
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+import optconvert
+from optconvert import Converter, Model
+from optconvert.sparse_model import SparseModel
+from optconvert.mpl_with_ext_data import _DataItem
+from optconvert.model import _ENGINE_POOL
+
+
+def _engine() -> str:
+    # the engine of the records, 'stand-in' if the command line installed engine_stand_in
+    return 'stand-in' if getattr(sys.modules.get('mplpy'), '__name__', None) == 'engine_stand_in' else 'mplpy'
+
+
+def synthetic_model(rows: int, cols: int, density: float, integer_share: float = 0.0, seed: int = 0) -> SparseModel:
+    """Returns a random model with rows x cols constraint matrix of the given density.
+
+    integer_share of the variables is integer, half of them binary.
+    """
+
+    rng = random.Random(seed)
+    model = SparseModel(f'synthetic_{rows}x{cols}')
+    for i in range(rows):
+        i = model.add_row(f'c{i}', rng.choice('LGE'))
+        model.rhs[i] = rng.randint(0, 100)
+    nonzeros_per_col = max(1, round(density * rows))
+    for j in range(cols):
+        is_integer = rng.random() < integer_share
+        j = model.add_col(f'x{j}', is_integer)
+        model.objective[j] = rng.randint(-10, 10)
+        if is_integer:
+            model.upper[j] = 1.0 if rng.random() < 0.5 else rng.randint(2, 100)
+        for i in sorted(rng.sample(range(rows), min(nonzeros_per_col, rows))):
+            model.add_nonzero(i, rng.randint(1, 1000) / 10)
+    return model
+
+
+def write_stochastic_mps(file: Path, model: SparseModel, scenarios: int, seed: int = 0):
+    """Writes the model as the core of a two-stage stochastic .mps with random right-hand sides of the last row."""
+
+    rng = random.Random(seed)
+    model.write_mps(file)
+    text = file.read_text()
+    with open(file, 'w') as out:
+        out.write(text[:text.rindex('ENDATA')])
+        out.write(f'TIME          {model.name}\nPERIODS       IMPLICIT\n')
+        out.write(f'    {model.col_names[0]:<8}  {model.row_names[0]:<8}                 Stage1\n')
+        out.write(f'    {model.col_names[-1]:<8}  {model.row_names[-1]:<8}                 Stage2\n')
+        out.write(f'*\nSTOCH         {model.name}\nSCENARIOS\n')
+        for s in range(scenarios):
+            parent = "'ROOT'" if s == 0 else 'Scen1'
+            out.write(f' SC Scen{s + 1:<5} {parent:<10} {1 / scenarios:>12.6f}   Stage{1 if s == 0 else 2}\n')
+            out.write(f'    RHS1      {model.row_names[-1]:<8}  {-rng.randint(0, 10000):>12}\n')
+        out.write('ENDATA\n')
+
+
+def write_dat(file: Path, name: str, rows: int, seed: int = 0):
+    """Writes the sparse vector name[i, j] with rows random values in the format of MplWithExtData."""
+
+    rng = random.Random(seed)
+    n = math.ceil(math.sqrt(rows))
+    lines = (f'{k // n + 1},{k % n + 1},{rng.randint(0, 10000) / 4}' for k in range(rows))
+    file.write_text(f'!{name}\n!I,J,value\n' + '\n'.join(lines))
+
+
+def write_large_lp(file: Path, size_mb: float):
+    """Writes a .lp file of about size_mb megabytes with two-line constraints."""
+
+    target_size = size_mb * 1024 * 1024
+    with open(file, 'w') as f:
+        f.write('MINIMIZE\n  obj: x0 + x1\nSUBJECT TO\n')
+        i = 0
+        while f.tell() < target_size:
+            f.write(f'  c{i}: x{i} + 2 x{i + 1}\n     - 3.5 x{i + 2}  <=  {i}\n')
+            i += 1
+        f.write('BOUNDS\n  x0 FREE\n  0 <= x1 <= +inf\nGENERAL\n  x1\nBINARY\n  x2\nEND\n')
+
+
+def measure(function, repeat: int = 1, memory: bool = True) -> dict:
+    """Returns the best wall time of repeat runs in seconds and the peak memory of one more traced run in bytes."""
+
+    seconds = math.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        seconds = min(seconds, time.perf_counter() - start)
+    peak = None
+    if memory:
+        tracemalloc.start()
+        try:
+            function()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    return {'seconds': seconds, 'peak_bytes': peak}
+
+
+class _NullWriter:
+    def write(self, text):
+        pass
+
+
+def run(rows: int = 2000, cols: int = 2000, density: float = 0.005, integer_share: float = 0.2,
+        scenarios: int = 100, dat_rows: int = 100000, repeat: int = 1, memory: bool = True, stages: list = None) -> list:
+    """Runs the benchmarks of the stages (all by default) and returns the list of result records."""
+
+    params = {'rows': rows, 'cols': cols, 'density': density, 'integer_share': integer_share,
+              'scenarios': scenarios, 'dat_rows': dat_rows}
+    results = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        folder = Path(temp_dir)
+        model = synthetic_model(rows, cols, density, integer_share)
+        lp_file, mps_file, smps_file = folder / 'synthetic.lp', folder / 'synthetic.mps', folder / 'synthetic_stoch.mps'
+        model.write_lp(lp_file)
+        model.write_mps(mps_file)
+        write_stochastic_mps(smps_file, model, scenarios)
+        binaries = [name for j, name in enumerate(model.col_names) if model._is_binary(j)]
+        lp_copy = folder / 'synthetic_copy.lp'
+        dat_model = SimpleNamespace(_file=folder / 'synthetic.mpl')
+        write_dat(folder / 'synthetic_Data.dat', 'Data', dat_rows)
+
+        def fix_lp_binaries():
+            shutil.copyfile(lp_file, lp_copy)
+            Model._fix_lp_binaries(lp_copy, binaries)
+
+        def parse_lp():
+            with open(lp_file) as lines:
+                Model._parse_lp(lines, _NullWriter())
+
+        def convert(file, out_format):
+            return lambda: Converter(str(file), out_format, str(folder / f'out_{file.stem}')).run()
+
+        benchmarks = {
+            'parse_lp': parse_lp,
+            'sparse_read_lp': lambda: SparseModel.read_lp(lp_file),
+            'sparse_read_mps': lambda: SparseModel.read_mps(mps_file),
+            'mps2three': lambda: Model.__new__(Model)._mps2three(smps_file, folder / 'out_three'), # uses no state of the model
+            'fix_lp_binaries': fix_lp_binaries,
+            'dat_parse': lambda: _DataItem(dat_model, 'Data', 'vector_sparse', 'synthetic_').columns,
+            'dat_serialize': lambda: str(_DataItem(dat_model, 'Data', 'vector_sparse', 'synthetic_')),
+            'convert_lp_mps': convert(lp_file, 'mps'),
+            'convert_mps_lp': convert(mps_file, 'lp'),
+            'convert_smps': convert(smps_file, 'mps'),
+        }
+        for stage, function in benchmarks.items():
+            if stages and stage not in stages:
+                continue
+            record = {'stage': stage, 'params': params, 'version': optconvert.__version__, 'engine': _engine(),
+                      'python': platform.python_version()}
+            record.update(measure(function, repeat, memory))
+            results.append(record)
+    return results
+
+
+def parse_lp_speed(size_mb: float = 2) -> float:
+    """Returns the lines per second of Model._parse_lp() on the .lp file of write_large_lp()."""
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        lp_file = Path(temp_dir) / 'synthetic.lp'
+        write_large_lp(lp_file, size_mb)
+        with open(lp_file) as lines:
+            n_lines = sum(1 for _ in lines)
+        start = time.perf_counter()
+        with open(lp_file) as lines:
+            Model._parse_lp(lines, _NullWriter())
+        return n_lines / (time.perf_counter() - start)
+
+
+def parse_lp_peak_memory(size_mb: float = 2) -> int:
+    """Returns the peak Python memory in bytes of Model._parse_lp() on the .lp file of write_large_lp()."""
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        lp_file = Path(temp_dir) / 'synthetic.lp'
+        write_large_lp(lp_file, size_mb)
+        tracemalloc.start()
+        try:
+            with open(lp_file) as lines:
+                Model._parse_lp(lines, _NullWriter())
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+
+def parse_lp_peak_rss(size_mb: float = 2) -> int:
+    """Returns the peak RSS in bytes of a new interpreter that translates the .lp file of write_large_lp() to a .mpl file
+    with Model._parse_lp(). Uses the resource module, so it runs only on Unix."""
+
+    code = ('import resource, sys; from optconvert import Model\n'
+            'with open(sys.argv[1]) as lines, open(sys.argv[2], "w") as out:\n'
+            '    Model._parse_lp(lines, out)\n'
+            'print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)')
+    with tempfile.TemporaryDirectory() as temp_dir:
+        lp_file = Path(temp_dir) / 'synthetic.lp'
+        write_large_lp(lp_file, size_mb)
+        max_rss = int(subprocess.run([sys.executable, '-c', code, str(lp_file), str(lp_file.with_suffix('.mpl'))],
+                                     env=_subprocess_env(), stdout=subprocess.PIPE, check=True).stdout)
+    return max_rss if sys.platform == 'darwin' else max_rss * 1024 # kilobytes on Linux
+
+
+def lp_binaries_time(n_binaries: int = 500000) -> float:
+    """Returns the seconds of Model._fix_lp_binaries() on a .lp file with n_binaries binary variables in INTEGERS."""
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        lp_file = Path(temp_dir) / 'binaries.lp'
+        bin_vars = [f'b{i}' for i in range(n_binaries)]
+        with open(lp_file, 'w') as f:
+            f.write('MINIMIZE\n obj: b0\nSUBJECT TO\n c1: b0 >= 0\nINTEGERS\n')
+            for var in bin_vars:
+                f.write(f'    {var}\n')
+            f.write('END\n')
+        start = time.perf_counter()
+        Model._fix_lp_binaries(lp_file, bin_vars)
+        return time.perf_counter() - start
+
+
+def dat_round_trip_time(rows: int = 5000000) -> float:
+    """Returns the seconds of the write of a sparse vector with rows rows by _DataItem.set() and of the parse of the file."""
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        dat_model = SimpleNamespace(_file=Path(temp_dir) / 'synthetic.mpl')
+        write_dat(Path(temp_dir) / 'synthetic_Data.dat', 'Data', rows)
+        columns = _DataItem(dat_model, 'Data', 'vector_sparse', 'synthetic_').columns
+        start = time.perf_counter()
+        _DataItem(dat_model, 'Data', 'vector_sparse', 'synthetic_').set(columns)
+        n_rows = len(_DataItem(dat_model, 'Data', 'vector_sparse', 'synthetic_').columns['value'])
+        seconds = time.perf_counter() - start
+        assert n_rows == rows
+        return seconds
+
+
+def import_time(repeat: int = 3) -> float:
+    """Returns the best time of import optconvert in a new interpreter in seconds."""
+
+    code = 'import time; start = time.perf_counter(); import optconvert; print(time.perf_counter() - start)'
+    return min(float(subprocess.run([sys.executable, '-c', code], env=_subprocess_env(), stdout=subprocess.PIPE,
+                                    check=True).stdout)
+               for _ in range(repeat))
+
+
+def _subprocess_env() -> dict:
+    # the new interpreter imports this optconvert, not an installed one
+    return dict(os.environ, PYTHONPATH=os.pathsep.join([str(Path(optconvert.__file__).parent.parent),
+                                                        os.environ.get('PYTHONPATH', '')]))
+
+
+def soak(files: int = 10000, out_format: str = 'gms', samples: int = 10) -> list:
+    """Converts files small .mps files with the MPL engine in this process.
+
+    The files get 100 different names, more than the engine pool keeps, so the MPL models are reused and deleted.
+    The memory is sampled with sys.getallocatedblocks() after a garbage collection, tracemalloc is not used because
+    it grows its own tables with the run.
+
+    Returns samples records {'files': files converted so far, 'allocated_blocks': memory blocks allocated by Python,
+    'gc_objects': objects tracked by the garbage collector, 'engine_models': MPL models kept by the engine},
+    the first one after the first conversion. The values should not grow with the files.
+    """
+
+    model = synthetic_model(20, 20, 0.2, integer_share=0.2)
+    sample_every = max(1, files // samples)
+    records = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        folder = Path(temp_dir)
+        template = folder / 'template.mps'
+        model.write_mps(template)
+        for i in range(files):
+            file = folder / f'soak_{i % 100}.mps'
+            shutil.copyfile(template, file)
+            Converter(str(file), out_format, str(folder / 'soak_out')).run()
+            file.unlink()
+            if i == 0 or (i + 1) % sample_every == 0:
+                gc.collect()
+                records.append({'files': i + 1, 'allocated_blocks': sys.getallocatedblocks(),
+                                'gc_objects': len(gc.get_objects()),
+                                'engine_models': _ENGINE_POOL.in_use + _ENGINE_POOL.free})
+    return records
+
+
+def soak_growth(records: list, max_blocks: int = 500, max_objects: int = 50) -> list:
+    """Returns messages for the values of soak records that grow after the first tenth of the files."""
+
+    problems = []
+    if max(record['engine_models'] for record in records) > _ENGINE_POOL.max_free:
+        problems.append(f'engine models: more than {_ENGINE_POOL.max_free}')
+    for key, limit in [('allocated_blocks', max_blocks), ('gc_objects', max_objects)]:
+        growth = records[-1][key] - records[1][key]
+        if growth >= limit:
+            problems.append(f'{key}: grew by {growth}, limit {limit}')
+    return problems
+
+
+def compare(results: list, baseline: list, tolerance: float = 1.25) -> list:
+    """Returns the stages that are slower than in the baseline (with the same params) by more than the tolerance factor."""
+
+    baseline = {(record['stage'], json.dumps(record['params'], sort_keys=True)): record for record in baseline}
+    regressions = []
+    for record in results:
+        old = baseline.get((record['stage'], json.dumps(record['params'], sort_keys=True)))
+        if old is not None and record['seconds'] > tolerance * old['seconds']:
+            regressions.append((record['stage'], old['seconds'], record['seconds']))
+    return regressions
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Benchmarks of optconvert on synthetic instances.')
+    parser.add_argument('--rows', type=int, default=2000)
+    parser.add_argument('--cols', type=int, default=2000)
+    parser.add_argument('--density', type=float, default=0.005)
+    parser.add_argument('--integer-share', type=float, default=0.2)
+    parser.add_argument('--scenarios', type=int, default=100)
+    parser.add_argument('--dat-rows', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--no-memory', action='store_true', help='do not measure the peak memory')
+    parser.add_argument('--stage', action='append', help='run only this stage, may be repeated')
+    parser.add_argument('--out', type=Path, help='append the results to this .jsonl file')
+    parser.add_argument('--baseline', type=Path, help='.jsonl file with the results to compare with')
+    parser.add_argument('--tolerance', type=float, default=1.25)
+    parser.add_argument('--soak', type=int, metavar='FILES', help='run only the soak run with this number of files')
+    parser.add_argument('--lp-speed', type=float, metavar='MB', help='run only the speed check of the LP translation on MB .lp file')
+    parser.add_argument('--min-lines-per-s', type=float, default=100000, help='minimum speed of the LP translation')
+    parser.add_argument('--lp-memory', type=float, metavar='MB', help='run only the memory check of the LP translation on MB .lp file')
+    parser.add_argument('--max-lp-memory-mb', type=float, default=2, help='maximum peak memory of the LP translation')
+    parser.add_argument('--lp-rss', type=float, metavar='MB', help='run only the peak RSS check of the LP translation on MB .lp file')
+    parser.add_argument('--max-rss-mb', type=float, default=100, help='maximum peak RSS of the LP translation')
+    parser.add_argument('--lp-binaries', type=int, metavar='N', help='run only the check of the binary fix with N binaries')
+    parser.add_argument('--max-lp-binaries-s', type=float, default=10, help='maximum time of the binary fix')
+    parser.add_argument('--dat-round-trip', type=int, metavar='ROWS', help='run only the check of the .dat round trip with ROWS rows')
+    parser.add_argument('--max-dat-round-trip-s', type=float, default=60, help='maximum time of the .dat round trip')
+    parser.add_argument('--import-time', action='store_true', help='run only the check of the import time')
+    parser.add_argument('--max-import-s', type=float, default=0.5, help='maximum time of import optconvert')
+    args = parser.parse_args(args)
+
+    if args.import_time:
+        seconds = import_time()
+        print(f'import optconvert: {seconds * 1000:.1f} ms (maximum {args.max_import_s * 1000:.0f} ms)')
+        return 1 if seconds > args.max_import_s else 0
+
+    if args.lp_memory is not None:
+        peak_mb = parse_lp_peak_memory(args.lp_memory) / 1024 ** 2
+        print(f'_parse_lp: {peak_mb:.2f} MiB peak (maximum {args.max_lp_memory_mb:.2f} MiB)')
+        return 1 if peak_mb > args.max_lp_memory_mb else 0
+
+    if args.lp_rss is not None:
+        peak_mb = parse_lp_peak_rss(args.lp_rss) / 1024 ** 2
+        print(f'_parse_lp: {peak_mb:.1f} MiB peak RSS (maximum {args.max_rss_mb:.1f} MiB)')
+        return 1 if peak_mb > args.max_rss_mb else 0
+
+    if args.lp_binaries is not None:
+        seconds = lp_binaries_time(args.lp_binaries)
+        print(f'_fix_lp_binaries: {seconds:.3f} s (maximum {args.max_lp_binaries_s:.3f} s)')
+        return 1 if seconds > args.max_lp_binaries_s else 0
+
+    if args.dat_round_trip is not None:
+        seconds = dat_round_trip_time(args.dat_round_trip)
+        print(f'.dat round trip: {seconds:.3f} s (maximum {args.max_dat_round_trip_s:.3f} s)')
+        return 1 if seconds > args.max_dat_round_trip_s else 0
+
+    if args.lp_speed is not None:
+        lines_per_second = parse_lp_speed(args.lp_speed)
+        print(f'_parse_lp: {lines_per_second:.0f} lines/s (minimum {args.min_lines_per_s:.0f})')
+        return 1 if lines_per_second < args.min_lines_per_s else 0
+
+    if args.soak is not None:
+        records = soak(args.soak)
+        for record in records:
+            print(f'{record["files"]:>8} files {record["allocated_blocks"]:>10} blocks {record["gc_objects"]:>8} objects '
+                  f'{record["engine_models"]:>6} engine models')
+        problems = soak_growth(records)
+        for problem in problems:
+            print(problem)
+        return 1 if problems else 0
+
+    results = run(args.rows, args.cols, args.density, args.integer_share, args.scenarios, args.dat_rows,
+                  args.repeat, not args.no_memory, args.stage)
+    for record in results:
+        peak = '' if record['peak_bytes'] is None else f'{record["peak_bytes"] / 1024 ** 2:10.1f} MiB'
+        print(f'{record["stage"]:<16} {record["seconds"]:10.3f} s {peak}')
+    if args.out is not None:
+        with open(args.out, 'a') as out:
+            for record in results:
+                out.write(json.dumps(record) + '\n')
+    if args.baseline is not None:
+        with open(args.baseline) as baseline_file:
+            baseline = [json.loads(line) for line in baseline_file if line.strip()]
+        regressions = compare(results, baseline, args.tolerance)
+        for stage, old_seconds, seconds in regressions:
+            print(f'REGRESSION {stage}: {old_seconds:.3f} s -> {seconds:.3f} s')
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    try:
+        import mplpy
+    except ImportError:
+        import engine_stand_in
+        sys.modules['mplpy'] = engine_stand_in
+    sys.exit(main())
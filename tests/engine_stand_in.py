@@ -0,0 +1,105 @@
+"""
+Stand-in for the mplpy module used by the benchmarks when the MPL engine is not installed.
+
+Only the part of the mplpy API used by optconvert is emulated. .mps and .lp files are read and written with
+SparseModel, .mpl models are only read as text. The time of the engine stages is therefore not representative,
+but the optconvert stages around the engine (translation, SMPS split, LP post-pass) are measured as with mplpy.
+"""
+
+from pathlib import Path
+from types import SimpleNamespace
+
+
+class ModelResultException(Exception):
+    pass
+
+
+class ResultType:
+    Success = 0
+
+
+class InputFileType:
+    Mps = 1; Cplex = 2; Xa = 3; TSimplex = 4; Mpl = 5; Gams = 6; Ampl = 7; OptML = 8; Matlab = 9; CDef = 10
+
+
+_EXTENSIONS = {InputFileType.Mps: '.mps', InputFileType.Cplex: '.lp', InputFileType.Mpl: '.mpl'}
+
+
+class _Options(dict):
+
+    def __missing__(self, name):
+        self[name] = SimpleNamespace(Value=None)
+        return self[name]
+
+
+class _Model:
+
+    def __init__(self, name):
+        self.Name = name
+        self.WorkingDirectory = '.'
+        self.Matrix = SimpleNamespace(ConStageCount=0)
+        self.Solution = SimpleNamespace(IsAvailable=False, ObjectValue=None)
+        self.VariableVectors = []
+        self.PlainVariables = []
+        self.DataConstants = []
+        self.DataStrings = []
+        self.DataVectors = []
+        self.IndexSets = []
+        self._sparse_model = None
+
+    @staticmethod
+    def _sparse_model_class():
+        # imported here because optconvert imports mplpy, i.e., this module
+        from optconvert.sparse_model import SparseModel
+        return SparseModel
+
+    def ReadModel(self, filename):
+        file = Path(self.WorkingDirectory) / filename
+        if not file.is_file():
+            raise ModelResultException(f'{file} not found')
+        self._sparse_model = None # the model is replaced, e.g., when the model is reused
+        self.PlainVariables = []
+        if file.suffix == '.mps':
+            self._sparse_model = self._sparse_model_class().read_mps(file)
+            self.PlainVariables = [SimpleNamespace(Name=name, IsBinary=bool(self._sparse_model._is_binary(j)))
+                                   for j, name in enumerate(self._sparse_model.col_names)]
+        else:
+            self.ParseModel(file.read_text())
+
+    def ParseModel(self, text):
+        self._text = text
+        self._sparse_model = None
+
+    def WriteInputFile(self, filename, file_type):
+        file = Path(filename)
+        if not file.suffix: # the extension is added by the engine
+            file = file.with_name(file.name + _EXTENSIONS.get(file_type, '.txt'))
+        if self._sparse_model is None:
+            self._sparse_model = self._sparse_model_class()(self.Name)
+        if file_type == InputFileType.Mps:
+            self._sparse_model.write_mps(file)
+        elif file_type == InputFileType.Cplex:
+            self._sparse_model.write_lp(file)
+        else:
+            file.write_text(f'! {self.Name}\n')
+
+    def Solve(self, solver):
+        raise ModelResultException('the stand-in engine does not solve models')
+
+
+class _Models(list):
+
+    def Add(self, name):
+        model = _Model(name)
+        self.append(model)
+        return model
+
+    def Delete(self, name):
+        for i, model in enumerate(self):
+            if model.Name == name:
+                del self[i]
+                return
+        raise ModelResultException(f'{name} not found')
+
+
+mpl = SimpleNamespace(Options=_Options(), Models=_Models(), Solvers={})
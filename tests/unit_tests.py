@@ -1,9 +1,35 @@
-from unittest import TestCase, TestLoader, TextTestRunner, skip
-from unittest.mock import patch
+from unittest import TestCase, TestLoader, TextTestRunner, skip, skipIf
+from unittest.mock import patch, MagicMock
 import sys
+import os
+import errno
 from pathlib import Path
 import shutil
-from optconvert import Converter, Model, MplWithExtData, parse_args, command_line, Messages, Solvers
+import subprocess
+import gzip
+import lzma
+import tempfile
+import io
+import json
+import time
+import gc
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import optconvert
+from optconvert import Converter, Model, MplWithExtData, Profile, parse_args, command_line, Messages, Numbers, Solvers
+from optconvert.sparse_model import SparseModel
+from optconvert.cache import ConversionCache, referenced_files
+from optconvert.mpl_with_ext_data import _DataItem, _ScalarData
+import optconvert.instances
+from optconvert.instances import generate_instances
+from optconvert.batch import Manifest, convert_directory
+from optconvert.compression import split_name, open_file, compress_file
+from optconvert.model import _ENGINE_POOL
+from optconvert import aio
+from optconvert.aio import AsyncConverter
+from types import SimpleNamespace
+import numpy as np
 
 
 class TestConverter(TestCase):
@@ -20,6 +46,90 @@ class TestConverter(TestCase):
         converter = Converter(filename, format, 'cap_test_5')
         self.assertTrue(converter.run())
 
+    def test_run_native(self):
+        filename = 'Dakota_det.mps'
+        for format in ['mps', 'lp']:
+            converter = Converter(filename, format, 'Dakota_det_native')
+            self.assertTrue(converter.run())
+            model = Model(Path(f'Dakota_det_native.{format}'))
+            self.assertAlmostEqual(model.solve(), -4169.0, 3)
+
+    def test_run_native_lp(self):
+        filename = 'Dakota_det.lp'
+        for format in ['mps', 'lp']:
+            converter = Converter(filename, format, 'Dakota_det_native_lp')
+            with patch('optconvert.converter.Model') as engine_model:
+                self.assertTrue(converter.run())
+                engine_model.assert_not_called()
+            model = Model(Path(f'Dakota_det_native_lp.{format}'))
+            self.assertAlmostEqual(model.solve(), -4169.0, 3)
+
+    def test_run_native_not_supported(self):
+        # the files that SparseModel does not read are converted by the engine
+        with tempfile.TemporaryDirectory() as temp_dir:
+            file = Path(temp_dir) / 'sos.lp'
+            file.write_text('Minimize\n obj: x + y\nSubject To\n c1: x + y >= 1\nSOS\n s1: S1:: x:1 y:2\nEnd\n')
+            converter = Converter(str(file), 'mps', str(Path(temp_dir) / 'sos'))
+            with patch('optconvert.converter.Model') as engine_model:
+                engine_model.return_value.__enter__.return_value.export_many.return_value = [[Path(temp_dir) / 'sos.mps']]
+                self.assertTrue(converter.run())
+                engine_model.assert_called_once_with(file, profile=None)
+            self.assertEqual(converter.exported_files, [Path(temp_dir) / 'sos.mps'])
+
+    def test_run_profile(self):
+        profile = Profile(memory=True)
+        self.assertTrue(Converter('Dakota_det.mps', 'lp', 'Dakota_det_native', profile=profile).run())
+        self.assertEqual([record.stage for record in profile.records], ['native_read', 'native_write'])
+        self.assertEqual(profile.records[0].bytes_read, Path('Dakota_det.mps').stat().st_size)
+        self.assertEqual(profile.records[1].bytes_written, Path('Dakota_det_native.lp').stat().st_size)
+        self.assertTrue(all(record.peak_memory > 0 for record in profile.records))
+        profile = Profile()
+        self.assertTrue(Converter('Dakota_det.lp', 'mpl', 'Dakota_det_converted', profile=profile).run())
+        self.assertEqual([record.stage for record in profile.records], ['parse_lp', 'read', 'detect_stochastic', 'write'])
+        self.assertIsNone(profile.records[0].peak_memory)
+        report = json.loads(profile.to_json(file='Dakota_det.lp'))
+        self.assertEqual(report['file'], 'Dakota_det.lp')
+        self.assertEqual(len(report['stages']), 4)
+
+    def test_profile_total_seconds(self):
+        profile = Profile()
+        with profile.stage('outer'):
+            with profile.stage('inner'):
+                time.sleep(0.01)
+        with profile.stage('next'):
+            pass
+        inner, outer, next_stage = profile.records # in the order of completion
+        self.assertAlmostEqual(profile.total_seconds, outer.seconds + next_stage.seconds)
+        self.assertLess(profile.total_seconds, outer.seconds + inner.seconds + next_stage.seconds)
+
+    def test_run_multiple_formats(self):
+        profile = Profile()
+        converter = Converter('Dakota_det.mps', 'mps,lp,gms', 'Dakota_det_multi', profile=profile)
+        self.assertTrue(converter.run())
+        self.assertEqual(converter.exported_files, [Path('Dakota_det_multi.mps').absolute(), Path('Dakota_det_multi.lp').absolute(),
+                                                    Path('Dakota_det_multi.gms').absolute()])
+        self.assertTrue(all(file.is_file() for file in converter.exported_files))
+        stages = [record.stage for record in profile.records]
+        self.assertEqual(stages.count('native_read'), 1) # mps and lp
+        self.assertEqual(stages.count('read'), 1) # gms
+        self.assertEqual(stages.count('native_write') + stages.count('write'), 3)
+
+    def test_run_compressed(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            folder = Path(temp_dir)
+            compress_file(Path('Dakota_det.mps'), folder / 'Dakota_det.mps.gz')
+            converter = Converter(str(folder / 'Dakota_det.mps.gz'), 'lp.gz,mps.xz,gms.gz')
+            self.assertTrue(converter.run())
+            self.assertEqual(converter.exported_files, [Path('Dakota_det.lp.gz').absolute(), Path('Dakota_det.mps.xz').absolute(),
+                                                        Path('Dakota_det.gms.gz').absolute()])
+            Converter('Dakota_det.mps', 'lp', str(folder / 'Dakota_det_plain')).run()
+            with gzip.open('Dakota_det.lp.gz', 'rt') as lp_file:
+                self.assertEqual(lp_file.read(), (folder / 'Dakota_det_plain.lp').read_text())
+            self.assertEqual(SparseModel.read_mps(Path('Dakota_det.mps.xz')).n_nonzeros,
+                             SparseModel.read_mps(Path('Dakota_det.mps')).n_nonzeros)
+            with gzip.open('Dakota_det.gms.gz', 'rt') as gms_file:
+                self.assertTrue(gms_file.read())
+
     def test_run_no_file(self):
         filename = 'instance_1.mps'
         format = 'mpl'
@@ -46,7 +156,10 @@ class TestConverter(TestCase):
 
     @classmethod
     def tearDownClass(cls):
-        temp_files = ['Dakota_det_converted.mpl', 'cap_test_5.cor', 'cap_test_5.STO', 'cap_test_5.TIM']
+        temp_files = ['Dakota_det_converted.mpl', 'cap_test_5.cor', 'cap_test_5.STO', 'cap_test_5.TIM',
+                      'Dakota_det_native.mps', 'Dakota_det_native.lp', 'Dakota_det_native_lp.mps', 'Dakota_det_native_lp.lp',
+                      'Dakota_det_multi.mps', 'Dakota_det_multi.lp', 'Dakota_det_multi.gms',
+                      'Dakota_det.lp.gz', 'Dakota_det.mps.xz', 'Dakota_det.gms.gz']
         for filename in temp_files:
             f = Path(filename)
             if f.is_file():
@@ -88,6 +201,46 @@ class TestModel(TestCase):
             Model(Path(f'{filename}.{format}'))
         self.assertEqual(str(e.exception), Messages.MSG_INPUT_FORMAT_NOT_SUPPORTED)
 
+    def test_from_string(self):
+        filename = 'Dakota_det'
+        for format in ['lp', 'mpl', 'mps']:
+            model = Model.from_string(Path(f'{filename}.{format}').read_text(), format, filename)
+            self.assertAlmostEqual(model.solve(), self.dakot_det_obj_value, 3)
+
+    def test_from_bytes_and_stream(self):
+        filename = 'Dakota_det'
+        cwd = Path.cwd()
+        model = Model.from_bytes(Path(f'{filename}.lp').read_bytes(), 'lp')
+        self.assertAlmostEqual(model.solve(), self.dakot_det_obj_value, 3)
+        with open(f'{filename}.mps', 'rb') as f:
+            model = Model.from_stream(f, 'mps')
+        self.assertAlmostEqual(model.solve(), self.dakot_det_obj_value, 3)
+        self.assertEqual(Path.cwd(), cwd)
+
+    def test_from_string_stochastic_mps(self):
+        with self.assertRaises(RuntimeError) as e:
+            Model.from_string(Path('SNDP_stochastic_MIP.mps').read_text(), 'mps')
+        self.assertEqual(str(e.exception), Messages.MSG_STOCH_NOT_IN_MEMORY)
+
+    def test_from_string_subclass(self):
+        class LpModel(Model):
+            pass
+        model = LpModel.from_string(Path('Dakota_det.lp').read_text(), 'lp', 'Dakota_det')
+        self.assertIsInstance(model, LpModel)
+        self.assertEqual(model.format, 'lp')
+        with self.assertRaises(TypeError):
+            Model()
+        with self.assertRaises(RuntimeError):
+            MplWithExtData.from_string(Path('SNDP_default.mpl').read_text(), 'mpl')
+
+    def test_to_bytes(self):
+        model = Model(Path('Dakota_det.mpl'))
+        for format in ['lp', 'mps', 'mpl']:
+            data = model.to_bytes(format)
+            model_new = Model.from_bytes(data, format)
+            self.assertAlmostEqual(model_new.solve(), self.dakot_det_obj_value, 3)
+        self.assertFalse(Path('model.lp').is_file())
+
     def test_solve_default(self):
         filename = 'Dakota_det'
         for format in ['lp', 'mpl', 'mps']:
@@ -125,6 +278,40 @@ class TestModel(TestCase):
                 model_new = Model(Path(f'{out_file}_converted.{out_format}'))
                 self.assertAlmostEqual(model_new.solve(), self.dakot_det_obj_value, 3)
 
+    def test_export_stochastic_subfolder(self):
+        model = Model(Path('SNDP_stochastic_MIP.mpl'))
+        model.export(Path('temp_subfolder/SNDP_stochastic_MIP_converted.mps'))
+        for extension in ['cor', 'tim', 'sto']:
+            self.assertTrue(Path(f'temp_subfolder/SNDP_stochastic_MIP_converted.{extension}').is_file())
+            self.assertFalse(Path(f'SNDP_stochastic_MIP_converted.{extension}').is_file())
+        self.assertFalse(Path('SNDP_stochastic_MIP_temp.mps').is_file())
+
+    def test_threads(self):
+        cwd = Path.cwd()
+        out_folder = Path('temp_subfolder/threads')
+        out_folder.mkdir(parents=True, exist_ok=True)
+        jobs = [(f'Dakota_det.{in_format}', f'Dakota_det_{i}_{in_format}.{out_format}')
+                for i in range(10) for in_format in ['mpl', 'mps', 'lp'] for out_format in ['mps', 'lp']]
+        jobs += [('SNDP_stochastic_MIP.mps', f'SNDP_stochastic_MIP_{i}.mps') for i in range(10)]
+
+        def convert(in_file, out_file):
+            model = Model(Path(in_file))
+            model.export(out_folder / out_file)
+            return model.is_stochastic
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(lambda job: convert(*job), jobs))
+
+        self.assertEqual(Path.cwd(), cwd)
+        for (in_file, out_file), is_stochastic in zip(jobs, results):
+            if is_stochastic:
+                for extension in ['cor', 'tim', 'sto']:
+                    self.assertTrue((out_folder / out_file).with_suffix(f'.{extension}').is_file())
+            else:
+                self.assertTrue((out_folder / out_file).is_file())
+                self.assertAlmostEqual(Model(out_folder / out_file).solve(), self.dakot_det_obj_value, 3)
+        self.assertEqual(list(Path().glob('Dakota_det_*_*.*')), [])
+
     def test_export_not_supported_out_format(self):
         filename = 'Dakota_det'
         format = 'mpl'
@@ -148,6 +335,82 @@ class TestModel(TestCase):
         model = Model(Path(f'{filename}.{in_format}'))
         model.export(Path(f'{filename}_converted.{out_format}'))
 
+    def test_is_stochastic_cached(self):
+        model = Model(Path('SNDP_stochastic_MIP.mps'))
+        self.assertTrue(model.is_stochastic)
+        self.assertEqual(list(model._smps_sections.keys()), ['TIME', 'STOCH', 'SCENARIOS'])
+        with patch.object(Model, '_scan_smps_sections') as scan:
+            self.assertTrue(model.is_stochastic)
+            model.export(Path('SNDP_stochastic_MIP_converted.mps'))
+            model.export(Path('SNDP_stochastic_MIP_converted.mps'))
+            scan.assert_not_called()
+        self.assertFalse(Model(Path('Dakota_det.mps')).is_stochastic)
+
+    def test_detect_stochastic_bytes_read(self):
+        profile = Profile()
+        self.assertTrue(Model(Path('SNDP_stochastic_MIP.mps'), profile=profile).is_stochastic)
+        record = [record for record in profile.records if record.stage == 'detect_stochastic'][-1] # the scan
+        with open('SNDP_stochastic_MIP.mps', 'rb') as mps_file: # the scan stops after the SCENARIOS line
+            text = mps_file.read()
+        self.assertEqual(record.bytes_read, text.index(b'\n', text.index(b'SCENARIOS')) + 1)
+        self.assertLess(record.bytes_read, len(text))
+
+    def test_scan_once_on_export(self):
+        with patch.object(Model, '_scan_smps_sections', return_value=None) as scan:
+            model = Model(Path('Dakota_det.mps'))
+            scan.assert_not_called()
+            with tempfile.TemporaryDirectory() as temp_dir:
+                model.export(Path(temp_dir) / 'Dakota_det.lp')
+                model.export(Path(temp_dir) / 'Dakota_det.mps')
+            scan.assert_called_once()
+
+    def test_export_stochastic_mps_to_lp(self):
+        # the fresh model is scanned for the SMPS sections also for the output formats other than mps
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with self.assertRaises(RuntimeError) as e:
+                Model(Path('SNDP_stochastic_MIP.mps')).export(Path(temp_dir) / 'SNDP_stochastic_MIP.lp')
+            self.assertEqual(str(e.exception), Messages.MSG_STOCH_ONLY_TO_MPS)
+            with self.assertRaises(RuntimeError) as e:
+                Model(Path('SNDP_stochastic_MIP.mps')).to_bytes('lp')
+            self.assertEqual(str(e.exception), Messages.MSG_STOCH_NOT_IN_MEMORY)
+
+    def test_export_stochastic_mps_changed(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            file = Path(temp_dir) / 'SNDP_stochastic_MIP.mps'
+            shutil.copy('SNDP_stochastic_MIP.mps', file)
+            model = Model(file)
+            self.assertTrue(model.is_stochastic)
+            with open(file, 'r+b') as f: # truncated in the core section
+                f.truncate(model._smps_sections['TIME'] // 2)
+            with self.assertRaises(RuntimeError) as e:
+                model.export(Path(temp_dir) / 'SNDP_converted.mps')
+            self.assertEqual(str(e.exception), Messages.MSG_MPS_CHANGED)
+            self.assertFalse(list(Path(temp_dir).glob('SNDP_converted.*')))
+
+    def test_export_stochastic_mps_compressed(self):
+        filename = 'SNDP_stochastic_MIP'
+        model = Model(Path(f'{filename}.mps'))
+        model.export(Path(f'{filename}_converted_gz.mps'), compress=True)
+        self.assertFalse(Path(f'{filename}_temp.mps').is_file())
+        for extension in ['cor', 'tim', 'sto']:
+            with gzip.open(f'{filename}_converted_gz.{extension}.gz', 'rt') as f:
+                self.assertIn('ENDATA', f.read())
+
+    def test_export_stochastic_mps_compressed_input(self):
+        filename = 'SNDP_stochastic_MIP'
+        with tempfile.TemporaryDirectory() as temp_dir:
+            compressed_file = Path(temp_dir) / f'{filename}.mps.gz'
+            compress_file(Path(f'{filename}.mps'), compressed_file)
+            model = Model(compressed_file)
+            self.assertEqual((model.format, model.compression), ('mps', 'gz'))
+            self.assertTrue(model.is_stochastic)
+            files = model.export(Path(temp_dir) / f'{filename}_converted.mps.xz')
+            Model(Path(f'{filename}.mps')).export(Path(temp_dir) / f'{filename}_plain.mps')
+            for extension, file in zip(['cor', 'tim', 'sto'], files):
+                self.assertEqual(file.name, f'{filename}_converted.{extension}.xz')
+                with lzma.open(file, 'rt') as f:
+                    self.assertEqual(f.read(), (Path(temp_dir) / f'{filename}_plain.{extension}').read_text())
+
     def test_export_not_supported_out_stoch_format(self):
         filename = 'SNDP_stochastic_MIP'
         format = 'mpl'
@@ -166,17 +429,660 @@ class TestModel(TestCase):
             self.assertEqual(model.solution['ProductionDes'], 150)
             self.assertEqual(model.solution['ProductionTab'], 125)
 
+    def test_solution_arrays(self):
+        model = Model(Path('Dakota_det.mpl'))
+        arrays = model.solution_arrays()
+        self.assertIs(model.solution_arrays(), arrays) # cached
+        self.assertEqual(len(arrays.var_names), len(arrays.activity))
+        self.assertEqual(len(arrays.con_names), len(arrays.dual))
+        self.assertEqual(arrays.activity[arrays.var_names.index('PurchaseFin')], 850)
+        self.assertTrue((arrays.activity >= arrays.lower_bound).all())
+        self.assertEqual(model.solution['ProductionDes'], 150)
+        model.solve()
+        self.assertIsNot(model.solution_arrays(), arrays) # reset by solve()
+
+    def test_solution_lazy(self):
+        reads = []
+        class Item:
+            def __init__(self, name):
+                self.name = name
+            def __getattr__(self, attribute):
+                reads.append(attribute)
+                return self.name if attribute == 'Name' else 1.0
+        model = Model(Path('Dakota_det.mps'))
+        model._mpl_model.Solution = SimpleNamespace(IsAvailable=True, ObjectValue=1.0)
+        model._mpl_model.Matrix = SimpleNamespace(Variables=[Item('x'), Item('y')], Constraints=[Item('c1')])
+        self.assertEqual(model.solution, {'x': 1.0, 'y': 1.0})
+        self.assertEqual(sorted(set(reads)), ['Activity', 'Name'])
+        reads.clear()
+        arrays = model.solution_arrays()
+        self.assertEqual(reads, [])
+        self.assertEqual(arrays.dual.tolist(), [1.0])
+        self.assertEqual(reads, ['ShadowPrice'])
+        arrays.dual
+        self.assertEqual(reads, ['ShadowPrice'])
+
+    def test_export_many(self):
+        files = [Path('Dakota_det_converted.mps'), Path('Dakota_det_converted.lp'), Path('Dakota_det_converted.mpl')]
+        with Model(Path('Dakota_det.mpl')) as model:
+            self.assertEqual(model.export_many(files), [[file.absolute()] for file in files])
+        self.assertTrue(all(file.is_file() for file in files))
+
+    def test_export_many_absolute_files(self):
+        # the threads get absolute files, the cwd may be changed by the engine call of another thread
+        exported = []
+        with Model(Path('Dakota_det.mps')) as model, \
+                patch.object(Model, 'export', autospec=True, side_effect=lambda model, file, compress: exported.append(file)):
+            model.export_many([Path('Dakota_det_converted.lp'), Path('Dakota_det_converted.gms')])
+        self.assertEqual(sorted(exported), [Path('Dakota_det_converted.gms').absolute(), Path('Dakota_det_converted.lp').absolute()])
+
+    def test_export_many_engine_reads(self):
+        files = [Path('Dakota_det_converted.lp'), Path('Dakota_det_converted.lp.gz'), Path('Dakota_det_converted.gms')]
+        binary_variables = Model._binary_variables
+        threads = [] # threads that read the binary variables from the engine
+
+        def read_binary_variables(model):
+            if model._bin_vars is None:
+                threads.append(threading.current_thread())
+            return binary_variables(model)
+
+        with Model(Path('Dakota_det.mps')) as model, patch.object(Model, '_binary_variables', read_binary_variables):
+            model.export_many(files)
+        self.assertEqual(threads, [threading.current_thread()])
+
+    def test_close(self):
+        in_use = _ENGINE_POOL.in_use
+        with Model(Path('Dakota_det.mps')) as model:
+            self.assertEqual(_ENGINE_POOL.in_use, in_use + 1)
+        self.assertEqual(_ENGINE_POOL.in_use, in_use)
+        with self.assertRaises(RuntimeError) as e:
+            model.export(Path('Dakota_det_converted.lp'))
+        self.assertEqual(str(e.exception), Messages.MSG_MODEL_CLOSED)
+        model.close() # the second close() does nothing
+        self.assertEqual(_ENGINE_POOL.in_use, in_use)
+
+    def test_close_reuses_mpl_model(self):
+        with Model(Path('Dakota_det.mps')) as model:
+            mpl_model = model._mpl_model
+        with Model(Path('Dakota_det.mps')) as model:
+            self.assertIs(model._mpl_model, mpl_model)
+
+    def test_finalizer(self):
+        in_use = _ENGINE_POOL.in_use
+        model = Model(Path('Dakota_det.mpl'))
+        self.assertEqual(_ENGINE_POOL.in_use, in_use + 1)
+        del model
+        gc.collect()
+        self.assertEqual(_ENGINE_POOL.in_use, in_use)
+
     @classmethod
     def tearDownClass(cls):
         for file in ['new_instance.lp', 'Dakota_det_converted.mpl', 'Dakota_det_converted.mps', 'Dakota_det_converted.lp',
+                     'Dakota_det_converted.lp.gz', 'Dakota_det_converted.gms',
                      'Dakota_det_converted_after_parse_file().mpl', 'Dakota_det_after_parse_file().mpl',
-                     'SNDP_stochastic_MIP_converted.cor', 'SNDP_stochastic_MIP_converted.sto', 'SNDP_stochastic_MIP_converted.tim']:
+                     'SNDP_stochastic_MIP_converted.cor', 'SNDP_stochastic_MIP_converted.sto', 'SNDP_stochastic_MIP_converted.tim',
+                     'SNDP_stochastic_MIP_converted_gz.cor.gz', 'SNDP_stochastic_MIP_converted_gz.sto.gz',
+                     'SNDP_stochastic_MIP_converted_gz.tim.gz']:
             f = Path(file)
             if f.is_file():
                 f.unlink()
         shutil.rmtree('temp_subfolder')
 
 
+class TestImport(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.env = dict(os.environ, PYTHONPATH=os.pathsep.join([str(Path(optconvert.__file__).parent.parent),
+                                                               os.environ.get('PYTHONPATH', '')]))
+
+    def _run(self, code):
+        return subprocess.run([sys.executable, '-c', code], env=self.env, stdout=subprocess.PIPE, check=True).stdout.decode()
+
+    def test_import_without_engine(self):
+        code = "import sys, optconvert; optconvert.parse_args(['--out_format', 'mps']); print('mplpy' in sys.modules, 'numpy' in sys.modules)"
+        self.assertEqual(self._run(code).split(), ['False', 'False'])
+
+    def test_engine_options(self):
+        Model(Path('Dakota_det.mps'))
+        for option, value in optconvert.model.ENGINE_OPTIONS.items():
+            self.assertEqual(optconvert.model.mpl.Options[option].Value, value)
+
+
+class TestAio(TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+
+    def test_convert(self):
+        self.assertTrue(self.loop.run_until_complete(aio.convert('Dakota_det.mps', 'lp', 'Dakota_det_aio')))
+        self.assertTrue(Path('Dakota_det_aio.lp').is_file())
+        with self.assertRaises(FileNotFoundError):
+            self.loop.run_until_complete(aio.convert('instance_1.mps', 'mpl'))
+
+    def test_load_export(self):
+        async def load_export():
+            model = await Model.aload(Path('Dakota_det.mps'))
+            return await model.aexport(Path('Dakota_det_aio.mpl'), timeout=60)
+        self.assertEqual(self.loop.run_until_complete(load_export()), [Path('Dakota_det_aio.mpl').absolute()])
+
+    def test_load_export_engine_lock(self):
+        converter = AsyncConverter(max_workers=2)
+        locked = []
+        model = SimpleNamespace(export=lambda file: locked.append(optconvert.model._ENGINE_LOCK._is_owned()))
+
+        async def export_all():
+            await asyncio.gather(*[converter.export(model, Path('Dakota_det_aio.mpl')) for _ in range(4)])
+        self.loop.run_until_complete(export_all())
+        converter.close()
+        self.assertEqual(locked, [True] * 4)
+
+    def test_concurrency_limit(self):
+        converter = AsyncConverter(max_workers=4, max_concurrency=2)
+        lock = threading.Lock()
+        running = [0, 0] # now, max
+
+        def work():
+            with lock:
+                running[0] += 1
+                running[1] = max(running)
+            time.sleep(0.05)
+            with lock:
+                running[0] -= 1
+
+        async def run_all():
+            await asyncio.gather(*[converter._run(converter._thread_pool(), None, work) for _ in range(6)])
+        self.loop.run_until_complete(run_all())
+        converter.close()
+        self.assertEqual(running[1], 2)
+
+    def test_timeout(self):
+        converter = AsyncConverter(max_workers=1)
+        with self.assertRaises(asyncio.TimeoutError):
+            self.loop.run_until_complete(converter._run(converter._thread_pool(), 0.05, time.sleep, 0.5))
+        # the timed out call keeps running, so it keeps its slot
+        start = time.perf_counter()
+        self.loop.run_until_complete(converter._run(converter._thread_pool(), None, time.sleep, 0))
+        self.assertGreater(time.perf_counter() - start, 0.3)
+        converter.close()
+
+    def test_cancel(self):
+        converter = AsyncConverter(max_workers=1, max_concurrency=2)
+        done = []
+
+        async def cancel_queued():
+            running = asyncio.ensure_future(converter._run(converter._thread_pool(), None, time.sleep, 0.2))
+            queued = asyncio.ensure_future(converter._run(converter._thread_pool(), None, done.append, 1))
+            await asyncio.sleep(0.05)
+            queued.cancel()
+            await running
+            with self.assertRaises(asyncio.CancelledError):
+                await queued
+
+        self.loop.run_until_complete(cancel_queued())
+        converter.close()
+        self.assertEqual(done, [])
+
+    def tearDown(self):
+        self.loop.close()
+
+    @classmethod
+    def tearDownClass(cls):
+        aio.configure() # shuts down the pools
+        for file in ['Dakota_det_aio.lp', 'Dakota_det_aio.mpl']:
+            if Path(file).is_file():
+                Path(file).unlink()
+
+
+class TestConversionCache(TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache = ConversionCache(Path(self.temp_dir.name))
+
+    def test_run_cached(self):
+        converter = Converter('Dakota_det.mpl', 'lp', 'Dakota_det_cached', cache=self.cache)
+        self.assertTrue(converter.run())
+        self.assertEqual((self.cache.hits, self.cache.misses), (0, 1))
+        expected = Path('Dakota_det_cached.lp').read_text()
+        Path('Dakota_det_cached.lp').unlink()
+        with patch.object(Model, 'export') as export:
+            self.assertTrue(converter.run())
+            export.assert_not_called()
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+        self.assertEqual(Path('Dakota_det_cached.lp').read_text(), expected)
+
+    def test_run_cached_stochastic(self):
+        converter = Converter('SNDP_stochastic_MIP.mps', 'mps', 'SNDP_stochastic_MIP_cached', cache=self.cache)
+        converter.run()
+        converter.run()
+        self.assertEqual(self.cache.hits, 1)
+        for extension in ['cor', 'tim', 'sto']:
+            self.assertTrue(Path(f'SNDP_stochastic_MIP_cached.{extension}').is_file())
+
+    def test_key(self):
+        key = self.cache.key(Path('SNDP_default.mpl'), 'mps')
+        self.assertEqual(key, self.cache.key(Path('SNDP_default.mpl'), 'mps'))
+        self.assertNotEqual(key, self.cache.key(Path('SNDP_default.mpl'), 'lp'))
+        referenced = [file.name for file in referenced_files(Path('SNDP_default.mpl'))]
+        self.assertIn('SNDP_default_Demand.dat', referenced)
+        self.assertIn('SNDP_default_ScalarData.dat', referenced)
+
+    def test_key_content_addressed(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            renamed = Path(temp_dir) / 'Dakota_renamed.mps'
+            shutil.copy('Dakota_det.mps', renamed)
+            self.assertEqual(self.cache.key(renamed, 'lp'), self.cache.key(Path('Dakota_det.mps'), 'lp'))
+            with open(renamed, 'a') as f:
+                f.write('* changed\n')
+            self.assertNotEqual(self.cache.key(renamed, 'lp'), self.cache.key(Path('Dakota_det.mps'), 'lp'))
+
+    def test_key_engine_options(self):
+        Model(Path('Dakota_det.mps')).close() # loads the engine
+        key = self.cache.key(Path('Dakota_det.mps'), 'lp')
+        option = optconvert.model.mpl.Options['MpsCreateAsMin']
+        value = option.Value
+        option.Value = 0
+        try:
+            self.assertNotEqual(self.cache.key(Path('Dakota_det.mps'), 'lp'), key)
+        finally:
+            option.Value = value
+
+    def test_put_error(self):
+        with patch('optconvert.cache.shutil.copyfile', side_effect=OSError(errno.ENOSPC, 'No space left on device')):
+            with self.assertRaises(OSError):
+                self.cache.put('key0', [Path('Dakota_det.mps')], 'Dakota_det')
+        self.assertEqual(list(self.cache.folder.iterdir()), [])
+        self.cache.put('key0', [Path('Dakota_det.mps')], 'Dakota_det')
+        self.cache.put('key0', [Path('Dakota_det.mps')], 'Dakota_det') # stored already
+        self.assertEqual([entry.name for entry in self.cache.folder.iterdir()], ['key0'])
+
+    def test_get_partial(self):
+        self.cache.put('key0', [Path('Dakota_det.lp'), Path('Dakota_det.mps')], 'Dakota_det')
+        restore = self.cache._restore
+
+        def restore_first(cached_file, out_file):
+            if cached_file.name == '.mps':
+                raise PermissionError(errno.EACCES, 'Permission denied')
+            restore(cached_file, out_file)
+
+        with patch.object(self.cache, '_restore', side_effect=restore_first):
+            with self.assertRaises(PermissionError):
+                self.cache.get('key0', 'Dakota_det_cached')
+        self.assertEqual(list(Path().glob('Dakota_det_cached.*')), [])
+
+    def test_evict(self):
+        file_size = Path('Dakota_det.mps').stat().st_size
+        cache = ConversionCache(Path(self.temp_dir.name), max_size=2 * file_size)
+        for i in range(2):
+            cache.put(f'key{i}', [Path('Dakota_det.mps')], 'Dakota_det')
+            os.utime(cache.folder / f'key{i}', (i, i))
+        cache.get('key0', 'Dakota_det_evicted') # key0 is used more recently than key1 now
+        cache.put('key2', [Path('Dakota_det.mps')], 'Dakota_det')
+        self.assertIsNone(cache.get('key1', 'Dakota_det_evicted'))
+        self.assertIsNotNone(cache.get('key0', 'Dakota_det_evicted'))
+        self.assertIsNotNone(cache.get('key2', 'Dakota_det_evicted'))
+        self.assertEqual(cache.size, 2 * file_size)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+        for file in Path().glob('*_cached.*'):
+            file.unlink()
+        for file in Path().glob('Dakota_det_evicted.*'):
+            file.unlink()
+
+
+class TestCompression(TestCase):
+
+    def test_split_name(self):
+        self.assertEqual(split_name('Dakota_det.mps.gz'), ('Dakota_det', 'mps', 'gz'))
+        self.assertEqual(split_name(Path('folder/Dakota_det.lp.xz')), ('Dakota_det', 'lp', 'xz'))
+        self.assertEqual(split_name('Dakota_det.mps'), ('Dakota_det', 'mps', None))
+        self.assertEqual(split_name('SNDP.v2.mpl'), ('SNDP.v2', 'mpl', None))
+
+    def test_open_file(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            for compression, codec in [('gz', gzip), ('xz', lzma)]:
+                file = Path(temp_dir) / f'Dakota_det.lp.{compression}'
+                with open_file(file, 'wt') as f:
+                    f.write('\\ comment\nEND')
+                with codec.open(file, 'rt') as f:
+                    self.assertEqual(f.read(), '\\ comment\nEND')
+                with open_file(file) as f:
+                    self.assertEqual(list(f), ['\\ comment\n', 'END'])
+
+    def test_open_file_zst(self):
+        try:
+            import zstandard
+        except ImportError:
+            with self.assertRaises(RuntimeError) as e:
+                open_file(Path('Dakota_det.mps.zst'), 'rt')
+            self.assertEqual(str(e.exception), Messages.MSG_ZSTD_NOT_INSTALLED)
+            return
+        with tempfile.TemporaryDirectory() as temp_dir:
+            file = Path(temp_dir) / 'Dakota_det.mps.zst'
+            compress_file(Path('Dakota_det.mps'), file)
+            self.assertEqual(SparseModel.read_mps(file).n_rows, SparseModel.read_mps(Path('Dakota_det.mps')).n_rows)
+
+
+class TestSparseModel(TestCase):
+
+    def test_read_mps(self):
+        model = SparseModel.read_mps(Path('Dakota_det.mps'))
+        self.assertEqual(model.obj_name, 'Profit')
+        self.assertEqual((model.n_rows, model.n_cols, model.n_nonzeros), (6, 10, 15))
+        self.assertEqual(sum(model.is_integer), 7)
+        self.assertEqual(model.upper[model.col_names.index('ProductionDes')], 160)
+        self.assertEqual(model.lower[model.col_names.index('PurchaseLum')], float('-inf'))
+        self.assertFalse(model.is_stochastic)
+
+    def test_read_lp(self):
+        model = SparseModel.read_lp(Path('Dakota_det.lp'))
+        self.assertEqual(model.obj_name, 'Profit')
+        self.assertEqual((model.n_rows, model.n_cols, model.n_nonzeros), (6, 10, 15))
+        self.assertEqual(sum(model.is_integer), 7)
+        self.assertEqual(model.row_names[1], 'c2')
+        self.assertEqual(model.upper[model.col_names.index('ProductionTab')], 130)
+        self.assertEqual(model.lower[model.col_names.index('PurchaseLum')], float('-inf'))
+        model_mps = SparseModel.read_mps(Path('Dakota_det.mps'))
+        self.assertEqual(sorted(model.values), sorted(model_mps.values))
+        self.assertEqual(sorted(model.objective), sorted(model_mps.objective))
+
+    def test_read_lp_write_lp(self):
+        model = SparseModel.read_lp(Path('Dakota_det.lp'))
+        model.write_lp(Path('Dakota_det_sparse.lp'))
+        model_new = SparseModel.read_lp(Path('Dakota_det_sparse.lp'))
+        self.assertEqual(model_new.col_names, model.col_names)
+        self.assertEqual(model_new.row_indices, model.row_indices)
+        self.assertEqual(model_new.values, model.values)
+        self.assertEqual(model_new.lower, model.lower)
+        self.assertEqual(model_new.upper, model.upper)
+
+    def test_read_lp_not_supported(self):
+        with self.assertRaises(ValueError):
+            SparseModel.read_lp(io.StringIO('MINIMIZE\n obj: [ x ^ 2 ]\nEND\n'))
+
+    def test_read_lp_unknown_section(self):
+        for lp in ['MINIMIZE\n obj: x + y\nSUBJECT TO\n c1: x + y >= 1\nBINARY\n x\nSEMI-CONTINUOUS\n y\nEND\n',
+                   'MINIMIZE\n obj: x + y\nSUBJECT TO\n c1: x + y >= 1\nGENERAL\n x\nSOS\n s1: S1:: x:1 y:2\nEND\n']:
+            with self.assertRaises(ValueError) as e:
+                SparseModel.read_lp(io.StringIO(lp))
+            self.assertIn('is not supported', str(e.exception))
+
+    def test_read_lp_binary_not_name(self):
+        for section in ['BINARY', 'GENERAL']:
+            with self.assertRaises(ValueError) as e:
+                SparseModel.read_lp(io.StringIO(f'MINIMIZE\n obj: x\nSUBJECT TO\n c1: x >= 1\n{section}\n x <= 1\nEND\n'))
+            self.assertIn('is not a variable name', str(e.exception))
+
+    def test_read_mps_stochastic(self):
+        model = SparseModel.read_mps(Path('SNDP_stochastic_MIP.mps'))
+        self.assertTrue(model.is_stochastic)
+
+    def test_read_mps_not_existing_file(self):
+        with self.assertRaises(FileNotFoundError) as e:
+            SparseModel.read_mps(Path('mps_instance_na.mps'))
+        self.assertEqual(str(e.exception), Messages.MSG_INSTANCE_FILE_NOT_FOUND)
+
+    def test_write_mps(self):
+        model = SparseModel.read_mps(Path('Dakota_det.mps'))
+        model.write_mps(Path('Dakota_det_sparse.mps'))
+        model_new = SparseModel.read_mps(Path('Dakota_det_sparse.mps'))
+        self.assertEqual(model_new.col_names, model.col_names)
+        self.assertEqual(model_new.row_indices, model.row_indices)
+        self.assertEqual(model_new.values, model.values)
+        self.assertEqual(model_new.upper, model.upper)
+        self.assertEqual(model_new.is_integer, model.is_integer)
+
+    def test_write_lp(self):
+        model = SparseModel.read_mps(Path('Dakota_det.mps'))
+        model.write_lp(Path('Dakota_det_sparse.lp'))
+        text = Path('Dakota_det_sparse.lp').read_text()
+        self.assertIn('PurchaseLum FREE', text)
+        self.assertIn('\nBINARY\n', text)
+        self.assertTrue(text.endswith('END\n'))
+
+    def test_write_lp_empty_row(self):
+        model = SparseModel.read_lp(io.StringIO('MINIMIZE\n obj: x\nSUBJECT TO\n c1: x <= 3\n c2: 0 z >= 5\nEND\n'))
+        out = io.StringIO()
+        model.write_lp(out)
+        self.assertIn('c2: + 0 x  >=  5', out.getvalue())
+        model_new = SparseModel.read_lp(io.StringIO(out.getvalue()))
+        self.assertEqual(model_new.row_names, ['c1', 'c2'])
+        self.assertEqual(model_new.rhs[1], 5)
+
+    def test_read_mps_unknown_row(self):
+        mps = 'NAME test\nROWS\n N obj\n L c1\nCOLUMNS\n    x obj 1 c2 1\nRHS\n    RHS1 c1 1\nENDATA\n'
+        with self.assertRaises(ValueError) as e:
+            SparseModel.read_mps(io.StringIO(mps))
+        self.assertIn('row c2', str(e.exception))
+
+    @classmethod
+    def tearDownClass(cls):
+        for filename in ['Dakota_det_sparse.mps', 'Dakota_det_sparse.lp']:
+            f = Path(filename)
+            if f.is_file():
+                f.unlink()
+
+
+class TestLpTranslation(TestCase):
+
+    def test_parse_lp_dakota(self):
+        class Writer:
+            def __init__(self):
+                self.text = ''
+            def write(self, text):
+                self.text += text
+        out = Writer()
+        with open('Dakota_det.lp') as lp_file:
+            Model._parse_lp(lp_file, out)
+        self.assertIn('c2:   - PurchaseFin + 4 ProductionDes + 2 ProductionTab', out.text)
+        self.assertIn('\n\nFREE\n\nPurchaseLum;\n', out.text)
+        self.assertIn('\n\nBINARY\n\nBinVecDes;\nBinVecTab;\nBinVecCha;\nBinaryVar;\n', out.text)
+        self.assertTrue(out.text.endswith('\nEND\n'))
+
+    def test_parse_lp_sections(self):
+        out = io.StringIO()
+        lp = ['\\ comment\n', 'MAX\n', ' obj: x + y\n', 'ST\n', ' x + y\n', ' <= 4\n', ' c: x - y = 0\n',
+              'BOUND\n', ' -Infinity <= x <= +INF\n', ' y free\n', 'END\n']
+        Model._parse_lp(lp, out)
+        big_number = str(Numbers.INT_BIG_NUMBER)
+        self.assertEqual(out.getvalue(), '!  comment\n\n\nMAXIMIZE\n\n obj = x + y\n\n\nSUBJECT TO\n\nc1:  x + y\n <= 4 ;\n'
+                                         f' c: x - y = 0 ;\n\n\nBOUNDS\n\n -{big_number} <= x <= +{big_number} ;\n'
+                                         '\n\nFREE\n\ny;\n\n\n! FREE var y moved from BOUNDS in lp to FREE block in mpl\n'
+                                         '! infinity was substituted with a big number in BOUNDS\n\nEND\n')
+
+    def test_parse_lp_infinity_in_names(self):
+        out = io.StringIO()
+        lp = ['MIN\n', ' obj: x_inf1 + info\n', 'ST\n', ' c: x_inf1 + info >= 1\n',
+              'BOUNDS\n', ' -inf <= x_inf1 <= 5\n', ' -5 <= info <= +infinity\n', 'END\n']
+        Model._parse_lp(lp, out)
+        big_number = str(Numbers.INT_BIG_NUMBER)
+        self.assertIn(f'\n -{big_number} <= x_inf1 <= 5 ;\n -5 <= info <= +{big_number} ;\n', out.getvalue())
+
+
+class TestLpBinaries(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.temp_dir = tempfile.TemporaryDirectory()
+
+    def test_fix_lp_binaries(self):
+        file = Path(self.temp_dir.name) / 'binaries.lp'
+        file.write_text('MINIMIZE\n obj: x + b1 + b2\nSUBJECT TO\n c1: x + b1 + b2 >= 1\nINTEGERS\n    x\n    b1\n    b2\n\nEND\n')
+        Model._fix_lp_binaries(file, ['b1', 'b2'])
+        self.assertEqual(file.read_text(), 'MINIMIZE\n obj: x + b1 + b2\nSUBJECT TO\n c1: x + b1 + b2 >= 1\nINTEGERS\n    x\n\nBINARY\nb1\nb2\n\nEND')
+
+    def test_fix_lp_binaries_no_end(self):
+        file = Path(self.temp_dir.name) / 'binaries_no_end.lp'
+        file.write_text('MINIMIZE\n obj: x + b1\nSUBJECT TO\n c1: x + b1 >= 1\nINTEGERS\n    x\n    b1\n')
+        Model._fix_lp_binaries(file, ['b1'])
+        self.assertEqual(file.read_text(), 'MINIMIZE\n obj: x + b1\nSUBJECT TO\n c1: x + b1 >= 1\nINTEGERS\n    x\nBINARY\nb1\n\nEND')
+
+    def test_fix_lp_binaries_many(self):
+        # the time is checked with benchmarks.py --lp-binaries
+        file = Path(self.temp_dir.name) / 'binaries_many.lp'
+        bin_vars = [f'b{i}' for i in range(1000)]
+        file.write_text('MINIMIZE\n obj: b0\nSUBJECT TO\n c1: b0 >= 0\nINTEGERS\n    x\n'
+                        + ''.join(f'    {var}\n' for var in bin_vars) + 'END\n')
+        Model._fix_lp_binaries(file, bin_vars)
+        self.assertEqual(file.read_text(), 'MINIMIZE\n obj: b0\nSUBJECT TO\n c1: b0 >= 0\nINTEGERS\n    x\nBINARY\n'
+                         + ''.join(f'{var}\n' for var in bin_vars) + '\nEND')
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.temp_dir.cleanup()
+
+
+class TestDataItem(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.n_rows = 1000 # the time of a large round trip is checked with benchmarks.py --dat-round-trip
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        for file in Path().glob('SNDP_default*'):
+            shutil.copy(file, self.temp_dir.name)
+        # _DataItem needs only the location of the model file
+        self.model = SimpleNamespace(_file=Path(self.temp_dir.name) / 'SNDP_default.mpl')
+
+    def test_read_write(self):
+        for name in ['Prob', 'Demand', 'ArcProduct', 'arc']:
+            data_item = _DataItem(self.model, name, 'vector_sparse', 'SNDP_default_')
+            self.assertEqual(str(data_item), Path(f'SNDP_default_{name}.dat').read_text())
+        data_item = _DataItem(self.model, 'Prob', 'vector_sparse', 'SNDP_default_')
+        self.assertEqual(list(data_item.columns['SCEN']), ['1', '2', '3'])
+        self.assertEqual(list(data_item.columns['value']), [0.25, 0.5, 0.25])
+
+    def test_labels_verbatim(self):
+        data_item = _DataItem(self.model, 'Demand', 'vector_sparse', 'SNDP_default_')
+        data_item.set([{'SCEN': '02139', 'value': 1}, {'SCEN': '1.0', 'value': 2.5}])
+        self.assertEqual(data_item.file.read_text(), '!Demand\n!SCEN,value\n02139,1\n1.0,2.5')
+        data_item = _DataItem(self.model, 'Demand', 'vector_sparse', 'SNDP_default_')
+        self.assertEqual(data_item.columns['SCEN'], ['02139', '1.0'])
+
+    def test_ragged_rows(self):
+        data_item = _DataItem(self.model, 'Demand', 'vector_sparse', 'SNDP_default_')
+        data_item.file.write_text('!Demand\n!SCEN,value\n1,1050\n2\n')
+        with self.assertRaises(ValueError) as e:
+            data_item.columns
+        self.assertIn('line 4', str(e.exception))
+        with self.assertRaises(ValueError):
+            data_item.set({'SCEN': [1, 2], 'value': [1050]})
+
+    def test_set(self):
+        data_item = _DataItem(self.model, 'Demand', 'vector_sparse', 'SNDP_default_')
+        expected = '!Demand\n!SCEN,value\n1,1050\n2,0.5'
+        for new_value in [[{'SCEN': 1, 'value': 1050}, {'SCEN': 2, 'value': 0.5}],
+                          {'SCEN': np.array([1, 2]), 'value': np.array([1050, 0.5])},
+                          np.array([[1, 1050], [2, 0.5]])]:
+            data_item.set(new_value)
+            self.assertEqual(data_item.file.read_text(), expected)
+
+    def test_lazy_load(self):
+        with patch.object(_DataItem, '_read_sparse') as read_sparse:
+            data_item = _DataItem(self.model, 'Demand', 'vector_sparse', 'SNDP_default_')
+            data_item.set({'SCEN': [1], 'value': [1050]})
+            read_sparse.assert_not_called()
+        data_item = _DataItem(self.model, 'Demand', 'vector_sparse', 'SNDP_default_')
+        self.assertEqual(list(data_item.columns['value']), [1050])
+        data_item.file.write_text('!Demand\n!SCEN,value\n1,1050\n2,2100') # changed outside of _DataItem
+        self.assertEqual(list(data_item.columns['value']), [1050, 2100])
+
+    def test_export_copies_file(self):
+        data_item = _DataItem(self.model, 'Demand', 'vector_sparse', 'SNDP_default_')
+        text = '!Demand\n!SCEN,value\n1,2000.0\n2,5e3\n'
+        data_item.file.write_text(text)
+        with patch.object(_DataItem, '_read_sparse') as read_sparse:
+            out_file = data_item.export('SNDP_copy_')
+            read_sparse.assert_not_called()
+        self.assertEqual(out_file.read_text(), text)
+
+    def test_scalar_data(self):
+        store = _ScalarData(Path(self.temp_dir.name) / 'SNDP_default_ScalarData.dat')
+        read_text = Path.read_text
+        with patch.object(Path, 'read_text', autospec=True, side_effect=read_text) as read, \
+                patch('optconvert.mpl_with_ext_data.os.replace', wraps=os.replace) as replace:
+            data_items = [_DataItem(self.model, name, 'scalar', 'SNDP_default_', store) for name in store.names]
+            self.assertEqual([data_item.value for data_item in data_items], ['3', '4', '3', '13', '2000', '5000'])
+            store.set({'NrOfScen': 1, 'PlantCost': 12.5})
+            self.assertEqual(read.call_count, 1)
+            replace.assert_called_once()
+        expected = Path('SNDP_default_ScalarData.dat').read_text().replace('!NrOfScen\n3', '!NrOfScen\n1').replace('!PlantCost\n2000', '!PlantCost\n12.5')
+        self.assertEqual(store.file.read_text(), expected)
+        self.assertEqual(data_items[0].value, '1')
+
+    def test_round_trip(self):
+        data_item = _DataItem(self.model, 'Demand', 'vector_sparse', 'SNDP_default_')
+        data_item.set({'SCEN': np.arange(1, self.n_rows + 1), 'value': np.arange(self.n_rows) * 0.5})
+        data_item.export()
+        data_item_new = _DataItem(self.model, 'Demand', 'vector_sparse', 'SNDP_default_')
+        self.assertEqual(data_item_new.columns['SCEN'][:2], ['1', '2'])
+        self.assertEqual(len(data_item_new.columns['value']), self.n_rows)
+        self.assertEqual(data_item_new.columns['value'][-1], (self.n_rows - 1) * 0.5)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+
+class TestBenchmarks(TestCase):
+
+    def test_run(self):
+        import benchmarks
+        results = benchmarks.run(rows=50, cols=40, density=0.1, integer_share=0.5, scenarios=3, dat_rows=100)
+        self.assertEqual([record['stage'] for record in results],
+                         ['parse_lp', 'sparse_read_lp', 'sparse_read_mps', 'mps2three', 'fix_lp_binaries',
+                          'dat_parse', 'dat_serialize', 'convert_lp_mps', 'convert_mps_lp', 'convert_smps'])
+        for record in results:
+            self.assertGreater(record['seconds'], 0)
+            self.assertGreater(record['peak_bytes'], 0)
+        slower = [dict(record, seconds=2 * record['seconds']) for record in results]
+        self.assertEqual(len(benchmarks.compare(slower, results)), len(results))
+        self.assertEqual(benchmarks.compare(results, slower), [])
+
+    def test_soak(self):
+        # a short run, the long one is benchmarks.py --soak 10000 or OPTCONVERT_SOAK_FILES
+        import benchmarks
+        records = benchmarks.soak(int(os.environ.get('OPTCONVERT_SOAK_FILES', 200)))
+        self.assertEqual(benchmarks.soak_growth(records), [])
+
+    def test_parse_lp_speed(self):
+        # the speed is checked with benchmarks.py --lp-speed, timing asserts do not belong to the unit tests
+        import benchmarks
+        self.assertGreater(benchmarks.parse_lp_speed(0.1), 0)
+
+    def test_parse_lp_peak_memory(self):
+        # the peak is checked with benchmarks.py --lp-memory
+        import benchmarks
+        self.assertGreater(benchmarks.parse_lp_peak_memory(0.1), 0)
+
+    @skipIf(sys.platform == 'win32', 'resource module is Unix only')
+    def test_parse_lp_peak_rss(self):
+        # the peak is checked with benchmarks.py --lp-rss
+        import benchmarks
+        self.assertGreater(benchmarks.parse_lp_peak_rss(0.1), 0)
+
+    def test_lp_binaries_time(self):
+        import benchmarks
+        self.assertGreater(benchmarks.lp_binaries_time(100), 0)
+
+    def test_dat_round_trip_time(self):
+        import benchmarks
+        self.assertGreater(benchmarks.dat_round_trip_time(100), 0)
+
+    def test_import_time(self):
+        # the time is checked with benchmarks.py --import-time
+        import benchmarks
+        self.assertGreater(benchmarks.import_time(repeat=1), 0)
+
+    def test_synthetic_model(self):
+        import benchmarks
+        model = benchmarks.synthetic_model(100, 200, 0.05, integer_share=0.25)
+        self.assertEqual((model.n_rows, model.n_cols, model.n_nonzeros), (100, 200, 1000))
+        self.assertTrue(0 < sum(model.is_integer) < 200)
+
+
 class TestMplWithExtData(TestCase):
 
     @classmethod
@@ -201,6 +1107,15 @@ class TestMplWithExtData(TestCase):
         model.set_ext_data(old_data)
         self.assertAlmostEqual(self.sndp_default_solution, solution, delta=0.01)
 
+    def test_set_ext_data_reuses_mpl_model(self):
+        filename = 'SNDP_default.mpl'
+        in_use = _ENGINE_POOL.in_use
+        with MplWithExtData(Path(filename)) as model:
+            for _ in range(3):
+                model.set_ext_data({'NrOfScen': 3}, reload=True)
+                self.assertEqual(_ENGINE_POOL.in_use, in_use + 1) # the reload returns the old MPL model to the pool
+        self.assertEqual(_ENGINE_POOL.in_use, in_use)
+
     def test_export(self):
         filename = 'SNDP_default.mpl'
         old_data = {'NrOfScen': 3,
@@ -219,6 +1134,85 @@ class TestMplWithExtData(TestCase):
         solution = one_scen_model.solve()
         self.assertAlmostEqual(self.sndp_default_solution, solution, delta=0.01)
 
+    def test_set_ext_data_no_reload_for_mpl_export(self):
+        filename = 'SNDP_default.mpl'
+        model = MplWithExtData(Path(filename))
+        with patch.object(MplWithExtData, '_read_file') as read_file:
+            for i, demand in enumerate([1000, 2000, 3000]):
+                model.set_ext_data({'Demand': [{'SCEN': 1, 'value': demand}, {'SCEN': 2, 'value': demand}, {'SCEN': 3, 'value': demand}]})
+                model.export(Path(f'SNDP_one_scen_{i}.mpl'))
+            read_file.assert_not_called()
+        self.assertIn('3,2000', Path('SNDP_one_scen_1_Demand.dat').read_text())
+        model.set_ext_data({'Demand': [{'SCEN': 1, 'value': 2000}, {'SCEN': 2, 'value': 5000}, {'SCEN': 3, 'value': 8000}]})
+        self.assertTrue(model._needs_reload)
+        model.solve()
+        self.assertFalse(model._needs_reload)
+
+    def test_formulation_with_data(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            scalar_file = Path(temp_dir) / 'model_ScalarData.dat'
+            scalar_file.write_text('!First\n1\n!Second\n2\n')
+            model = MplWithExtData.__new__(MplWithExtData)
+            model._scalar_data = _ScalarData(scalar_file)
+            model._formulation = ('First := DATAFILE("model_ScalarData.dat");\n'
+                                  'Second := DATAFILE( "model_ScalarData.dat" );\n'
+                                  'Demand[SCEN] := DATAFILE("model_Demand.dat");\n')
+            model._scalar_data.set({'Second': 5}) # the first scalar keeps its value
+            self.assertEqual(model._formulation_with_data(), 'First := 1;\nSecond := 5;\n'
+                                                             'Demand[SCEN] := DATAFILE("model_Demand.dat");\n')
+
+    def test_set_ext_data_reparse_from_memory(self):
+        model = MplWithExtData(Path('SNDP_default.mpl'))
+        with patch.object(MplWithExtData, '_read_file') as read_file:
+            model.set_ext_data({'NrOfScen': 1}, reload=True)
+            read_file.assert_not_called()
+        self.assertIn('NrOfScen := 1;', model._formulation_with_data())
+        model.set_ext_data({'NrOfScen': 3})
+        with patch.object(MplWithExtData, '_reparse', side_effect=RuntimeError('parse error')):
+            with self.assertRaises(RuntimeError):
+                model.solve()
+        self.assertTrue(model._needs_reload) # the failed reparse is retried
+        model.solve()
+        self.assertFalse(model._needs_reload)
+
+    def test_generate_instances(self):
+        template_demand = Path('SNDP_default_Demand.dat').read_text()
+        data = [{'NrOfScen': 1, 'Prob': [{'SCEN': 1, 'value': 1}], 'Demand': [{'SCEN': 1, 'value': 1050}]},
+                {},
+                {'Demand': [{'SCEN': 1, 'value': 1050}, {'SCEN': 2, 'value': 1050}, {'SCEN': 3, 'value': 1050}]}]
+        results = dict(generate_instances(Path('SNDP_default.mpl'), iter(data), name='SNDP_one_scen', jobs=2))
+        self.assertEqual(sorted(results), [0, 1, 2])
+        for result in results.values():
+            self.assertIsInstance(result, list)
+            self.assertTrue(all(file.is_file() for file in result))
+        self.assertEqual(Path('SNDP_default_Demand.dat').read_text(), template_demand)
+        # data not in the dict is taken from the template, even if the worker changed it for another instance
+        self.assertEqual(Path('SNDP_one_scen_1_Demand.dat').read_text(), template_demand)
+        solution = MplWithExtData(Path('SNDP_one_scen_0.mpl')).solve()
+        self.assertAlmostEqual(self.sndp_default_solution, solution, delta=0.01)
+
+    def test_generate_restores_data_in_subfolder(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            template_folder, worker_folder = Path(temp_dir) / 'template', Path(temp_dir) / 'worker'
+            for folder in [template_folder, worker_folder]:
+                (folder / 'data').mkdir(parents=True)
+                (folder / 'data/model_Demand.dat').write_text('!Demand\n!SCEN,value\n1,1050')
+            model = MagicMock()
+            model.ext_data_files.return_value = {'Demand': worker_folder / 'data/model_Demand.dat'}
+            model.set_ext_data.side_effect = lambda data: data and (worker_folder / 'data/model_Demand.dat').write_text('changed')
+            with patch.dict(optconvert.instances._worker, model=model, folder=worker_folder,
+                            template_folder=template_folder, changed=set()):
+                optconvert.instances._generate(None, None, {'Demand': []}, None)
+                self.assertEqual((worker_folder / 'data/model_Demand.dat').read_text(), 'changed')
+                optconvert.instances._generate(None, None, {}, None) # the previous instance changed Demand
+            self.assertEqual((worker_folder / 'data/model_Demand.dat').read_text(), '!Demand\n!SCEN,value\n1,1050')
+
+    def test_generate_instances_mps(self):
+        data = ({'Demand': [{'SCEN': 1, 'value': demand}, {'SCEN': 2, 'value': demand}, {'SCEN': 3, 'value': demand}]}
+                for demand in [1000, 2000])
+        for i, result in generate_instances(Path('SNDP_default.mpl'), data, 'mps', name='SNDP_one_scen'):
+            self.assertEqual(result, [Path(f'SNDP_one_scen_{i}.mps').absolute()])
+
     @classmethod
     def tearDownClass(cls):
         for file in Path().glob("SNDP_one_scen*"):
@@ -230,7 +1224,8 @@ class TestCommandLine(TestCase):
     @classmethod
     def setUpClass(cls):
         cls.temp_files = ['Dakota_det.sim', 'Dakota_det_after_parse_file().mpl',
-                       'SNDP_stochastic_MIP.cor', 'SNDP_stochastic_MIP.tim', 'SNDP_stochastic_MIP.sto']
+                       'SNDP_stochastic_MIP.cor', 'SNDP_stochastic_MIP.tim', 'SNDP_stochastic_MIP.sto',
+                       'Dakota_det_mpl.sim', 'Dakota_det_lp.sim', 'Dakota_det_profile.jsonl']
         cls.initial_argv = sys.argv
 
     def test_parse_args(self):
@@ -256,6 +1251,94 @@ class TestCommandLine(TestCase):
         parsed = parse_args([])
         self.assertEqual(parsed.files, [])
         self.assertIs(parsed.out_format, None)
+        self.assertIs(parsed.jobs, None)
+
+    def test_parse_args_jobs(self):
+        parsed = parse_args(['--out_format', 'sim', '--jobs', '4'])
+        self.assertEqual(parsed.jobs, 4)
+
+    def test_parse_args_profile(self):
+        self.assertIsNone(parse_args(['--out_format', 'sim']).profile)
+        self.assertEqual(parse_args(['--out_format', 'sim', '--profile']).profile, '-')
+        self.assertEqual(parse_args(['--profile', 'profile.jsonl', '--out_format', 'sim']).profile, 'profile.jsonl')
+
+    def test_parse_args_out_formats(self):
+        self.assertEqual(parse_args(['--out_format', 'mps,lp,gms']).out_format, 'mps,lp,gms')
+        with patch('sys.stderr'):
+            for out_format in ['mps,trk', 'mps,mps', 'mps,']:
+                with self.assertRaises(SystemExit):
+                    parse_args(['--out_format', out_format])
+
+    def test_parse_args_input_dir(self):
+        parsed = parse_args(['--input-dir', 'instances', '--glob', '*.mps', '--recursive', '--out_format', 'lp', '--resume'])
+        self.assertEqual(parsed.input_dir, Path('instances'))
+        self.assertEqual(parsed.glob, '*.mps')
+        self.assertTrue(parsed.recursive and parsed.resume)
+        self.assertIsNone(parsed.output_dir)
+        with patch('sys.stderr'):
+            for args in [['--input-dir', 'instances'], ['--input-dir', 'instances', '--file', 'Dakota_det.mps', '--out_format', 'lp'],
+                         ['--out_format', 'lp', '--resume']]:
+                with self.assertRaises(SystemExit):
+                    parse_args(args)
+
+    @patch('builtins.input', side_effect=[])
+    def test_command_line_input_dir_resume(self, input):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            input_dir, output_dir = Path(temp_dir) / 'in', Path(temp_dir) / 'out'
+            (input_dir / 'sub').mkdir(parents=True)
+            for file in ['Dakota_det.mps', 'Dakota_det.lp', 'sub/Dakota_det.mps']:
+                shutil.copyfile(Path(file).name, input_dir / file)
+            sys.argv = sys.argv + ['--input-dir', str(input_dir), '--recursive', '--output-dir', str(output_dir), '--out_format', 'lp']
+            self.assertTrue(command_line())
+            for file in ['Dakota_det_mps.lp', 'Dakota_det_lp.lp', 'sub/Dakota_det.lp']:
+                self.assertTrue((output_dir / file).is_file())
+            manifest = Manifest(output_dir / 'optconvert_manifest.jsonl')
+            self.assertEqual(sorted(manifest.records), ['Dakota_det.lp', 'Dakota_det.mps', 'sub/Dakota_det.mps'])
+            self.assertEqual(manifest.records['sub/Dakota_det.mps']['outputs'], ['sub/Dakota_det.lp'])
+
+            # the changed file and the file with the deleted output are converted again
+            with open(input_dir / 'Dakota_det.lp', 'a') as lp_file:
+                lp_file.write('\n\\ changed\n')
+            (output_dir / 'sub/Dakota_det.lp').unlink()
+            records = convert_directory(input_dir, 'lp', output_dir, recursive=True, resume=True, jobs=2)
+            statuses = {record['file']: record['status'] for record in records}
+            self.assertEqual(statuses, {'Dakota_det.lp': Manifest.STR_CONVERTED, 'Dakota_det.mps': Manifest.STR_SKIPPED,
+                                        'sub/Dakota_det.mps': Manifest.STR_CONVERTED})
+            self.assertEqual(len((output_dir / 'optconvert_manifest.jsonl').read_text().splitlines()), 5)
+            self.assertTrue((output_dir / 'sub/Dakota_det.lp').is_file())
+
+    def test_convert_directory_outputs_not_inputs(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            input_dir = Path(temp_dir)
+            shutil.copyfile('Dakota_det.mps', input_dir / 'Dakota_det.mps')
+            for _ in range(2): # the default output folder is not searched by the second run
+                records = list(convert_directory(input_dir, 'lp', recursive=True))
+                self.assertEqual([record['file'] for record in records], ['Dakota_det.mps'])
+            self.assertTrue((input_dir / 'converted/Dakota_det.lp').is_file())
+            for _ in range(2): # the outputs in input_dir recorded in the manifest are not converted
+                records = list(convert_directory(input_dir, 'lp', input_dir))
+                self.assertEqual([record['file'] for record in records], ['Dakota_det.mps'])
+            self.assertEqual(Manifest(input_dir / 'optconvert_manifest.jsonl').records['Dakota_det.mps']['outputs'],
+                             ['Dakota_det.lp'])
+
+    def test_convert_directory_input_changed(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            input_dir = Path(temp_dir)
+            file = input_dir / 'Dakota_det.mps'
+            shutil.copyfile('Dakota_det.mps', file)
+            convert_file = optconvert.batch._convert_file
+
+            def convert_and_change(*args):
+                result = convert_file(*args)
+                with open(file, 'a') as mps_file: # changed during the conversion
+                    mps_file.write('* changed\n')
+                return result
+
+            with patch('optconvert.batch._convert_file', side_effect=convert_and_change):
+                records = list(convert_directory(input_dir, 'lp'))
+            self.assertEqual(records[0]['input_hash'], ConversionCache.key(Path('Dakota_det.mps'), 'lp'))
+            records = list(convert_directory(input_dir, 'lp', resume=True))
+            self.assertEqual(records[0]['status'], Manifest.STR_CONVERTED)
 
     @skip
     def test_command_line_manual_enter(self):
@@ -268,6 +1351,47 @@ class TestCommandLine(TestCase):
         sys.argv = sys.argv + ['--file', filename, '--out_format', format]
         self.assertTrue(command_line())
 
+    @patch('builtins.input', side_effect=['y'])
+    def test_command_line_same_stem(self, input):
+        format = 'sim'
+        sys.argv = sys.argv + ['--file', 'Dakota_det.mpl', '--file', 'Dakota_det.lp', '--out_format', format]
+        self.assertTrue(command_line())
+        self.assertTrue(Path('Dakota_det_mpl.sim').is_file())
+        self.assertTrue(Path('Dakota_det_lp.sim').is_file())
+
+    @patch('builtins.input', side_effect=[])
+    def test_command_line_jobs(self, input):
+        format = 'sim'
+        sys.argv = sys.argv + ['--file', 'Dakota_det.mpl', '--file', 'Dakota_det.lp', '--out_format', format, '--jobs', '2']
+        self.assertTrue(command_line())
+        self.assertTrue(Path('Dakota_det_mpl.sim').is_file())
+        self.assertTrue(Path('Dakota_det_lp.sim').is_file())
+
+    @patch('builtins.input', side_effect=[])
+    def test_command_line_jobs_profile(self, input):
+        format = 'sim'
+        sys.argv = sys.argv + ['--file', 'Dakota_det.mpl', '--file', 'Dakota_det.lp', '--out_format', format, '--jobs', '2',
+                               '--profile', 'Dakota_det_profile.jsonl']
+        self.assertTrue(command_line())
+        reports = [json.loads(line) for line in Path('Dakota_det_profile.jsonl').read_text().splitlines()]
+        self.assertEqual(sorted(report['file'] for report in reports), ['Dakota_det.lp', 'Dakota_det.mpl'])
+        self.assertTrue(all(report['stages'] for report in reports))
+
+    @patch('builtins.input', side_effect=['y'])
+    def test_command_line_profile_stderr(self, input):
+        sys.argv = sys.argv + ['--file', 'Dakota_det.mpl', '--out_format', 'sim', '--profile']
+        with patch('sys.stdout', new_callable=io.StringIO) as stdout, patch('sys.stderr', new_callable=io.StringIO) as stderr:
+            self.assertTrue(command_line())
+        self.assertEqual(json.loads(stderr.getvalue())['file'], 'Dakota_det.mpl')
+        self.assertNotIn('"stages"', stdout.getvalue())
+
+    @patch('builtins.input', side_effect=[])
+    def test_command_line_jobs_file_not_exists(self, input):
+        filename = 'instance_na.mps'
+        format = 'mpl'
+        sys.argv = sys.argv + ['--file', filename, '--out_format', format, '--jobs', '2']
+        self.assertEqual(str(command_line()), Messages.MSG_INSTANCE_FILE_NOT_FOUND)
+
     @patch('builtins.input', side_effect=['y'])
     def test_command_line_file_not_exists(self, input):
         filename = 'instance_na.mps'
@@ -294,6 +1418,21 @@ class TestCommandLine(TestCase):
         sys.argv = sys.argv + ['--out_format', format]
         self.assertTrue(command_line())
 
+    @patch('builtins.input', side_effect=['0', 'y'])
+    def test_command_line_no_file_compressed(self, input):
+        sys.argv = sys.argv + ['--out_format', 'lp']
+        cwd = Path.cwd()
+        with tempfile.TemporaryDirectory() as temp_dir:
+            compress_file(Path('Dakota_det.mps'), Path(temp_dir) / 'Dakota_det.mps.gz')
+            os.chdir(temp_dir)
+            try:
+                with patch('sys.stdout', new_callable=io.StringIO) as stdout:
+                    self.assertTrue(command_line())
+            finally:
+                os.chdir(cwd)
+            self.assertIn('0 - Dakota_det.mps.gz\n1 - all files mps\n', stdout.getvalue())
+            self.assertTrue((Path(temp_dir) / 'Dakota_det.lp').is_file())
+
     @patch('builtins.input', side_effect=['y'])
     def test_command_line_not_supported_in_format(self, input):
         filename = 'Dakota_det.trk'